@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+EC2 Inventory Collector
+
+This script generates the same CSV inventory as AWS-EC2-inventory.sh, but
+collects it with batched API calls instead of four extra calls per instance:
+
+- Instances, tags and launch times come from a single paginated
+  describe_instances pass
+- Volume sizes come from one paginated describe_volumes pass and are joined
+  to instances by attachment instance ID
+- Memory information is fetched once per distinct instance type
+
+The number of API calls grows with the number of result pages, not with the
+number of instances.
+
+Usage:
+    python ec2_inventory.py --region REGION [--output FILE] [--profile PROFILE]
+
+Options:
+    -r, --region    AWS region (required)
+    -o, --output    Output file (default: aws-ec2-inventory_REGION_TIMESTAMP.csv)
+    --format        csv, jsonl, parquet or sqlite (default: from the output file extension)
+    --profile       AWS profile name to use
+    --help          Show this help message and exit
+"""
+
+import argparse
+import logging
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+import boto3
+from botocore.exceptions import ClientError
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', '..', 'common'))
+from inventory_writer import FORMAT_EXTENSIONS, write_rows
+
+logger = logging.getLogger(__name__)
+
+CSV_HEADER = [
+    'Instance ID', 'Name', 'Instance Type', 'State', 'Private IP', 'Public IP',
+    'VPC ID', 'Subnet ID', 'Platform', 'CPU Count', 'Memory (GiB)',
+    'Total Volume Size', 'Tags', 'Launch Time'
+]
+
+# describe_instance_types accepts at most 100 instance types per request
+INSTANCE_TYPE_BATCH_SIZE = 100
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Generate AWS EC2 instance inventory for specified region')
+    parser.add_argument('-r', '--region', required=True, help='AWS region')
+    parser.add_argument('-o', '--output', help='Output file (default: aws-ec2-inventory_REGION_TIMESTAMP.csv)')
+    parser.add_argument('--format', choices=list(FORMAT_EXTENSIONS),
+                        help='Output format (default: from the output file extension, else csv)')
+    parser.add_argument('--profile', help='AWS profile to use')
+    return parser.parse_args()
+
+
+def get_ec2_client(profile=None, region='eu-west-1'):
+    """
+    Initialize and return an EC2 client
+
+    Args:
+        profile (str): AWS profile name
+        region (str): AWS region
+
+    Returns:
+        boto3.client: EC2 client
+    """
+    try:
+        if profile:
+            session = boto3.Session(profile_name=profile, region_name=region)
+        else:
+            session = boto3.Session(region_name=region)
+
+        return session.client('ec2')
+    except Exception as e:
+        logger.error(f"Failed to initialize EC2 client: {str(e)}")
+        sys.exit(1)
+
+
+def get_instances(ec2_client):
+    """
+    Get all EC2 instances in the region with a single paginated pass
+
+    Args:
+        ec2_client (boto3.client): EC2 client
+
+    Returns:
+        list: List of EC2 instance dictionaries
+    """
+    instances = []
+    pages = 0
+
+    paginator = ec2_client.get_paginator('describe_instances')
+    for page in paginator.paginate(PaginationConfig={'PageSize': 1000}):
+        pages += 1
+        for reservation in page['Reservations']:
+            instances.extend(reservation['Instances'])
+
+    logger.info(f"Found {len(instances)} instances in {pages} describe_instances page(s)")
+    return instances
+
+
+def get_volume_sizes(ec2_client):
+    """
+    Get the total attached volume size for every instance in the region
+
+    Volumes are listed once and joined to instances by attachment instance ID,
+    so a multi-attached volume counts towards every instance it is attached to.
+
+    Args:
+        ec2_client (boto3.client): EC2 client
+
+    Returns:
+        dict: Mapping of instance ID to total volume size in GiB
+    """
+    volume_sizes = defaultdict(int)
+    pages = 0
+
+    paginator = ec2_client.get_paginator('describe_volumes')
+    filters = [{'Name': 'attachment.status', 'Values': ['attached', 'attaching']}]
+    for page in paginator.paginate(Filters=filters, PaginationConfig={'PageSize': 500}):
+        pages += 1
+        for volume in page['Volumes']:
+            for attachment in volume.get('Attachments', []):
+                volume_sizes[attachment['InstanceId']] += volume['Size']
+
+    logger.info(f"Collected volume sizes for {len(volume_sizes)} instances in {pages} describe_volumes page(s)")
+    return volume_sizes
+
+
+def describe_instance_type_memory(ec2_client, instance_types):
+    """
+    Describe a batch of instance types and return their memory in MiB
+
+    Args:
+        ec2_client (boto3.client): EC2 client
+        instance_types (list): Instance type names, at most 100
+
+    Returns:
+        dict: Mapping of instance type to memory in MiB
+    """
+    memory = {}
+    paginator = ec2_client.get_paginator('describe_instance_types')
+    for page in paginator.paginate(InstanceTypes=instance_types):
+        for instance_type in page['InstanceTypes']:
+            memory[instance_type['InstanceType']] = instance_type['MemoryInfo']['SizeInMiB']
+    return memory
+
+
+def get_instance_type_memory(ec2_client, instance_types):
+    """
+    Get memory in GiB for each distinct instance type
+
+    Types are described in batches. If a batch is rejected (for example
+    because it contains a retired type), its types are retried one by one so
+    that a single bad type does not hide the memory of the others.
+
+    Args:
+        ec2_client (boto3.client): EC2 client
+        instance_types (iterable): Instance type names
+
+    Returns:
+        dict: Mapping of instance type to memory formatted as GiB, or N/A
+    """
+    distinct_types = sorted({t for t in instance_types if t and t != 'None'})
+    memory_mib = {}
+
+    for i in range(0, len(distinct_types), INSTANCE_TYPE_BATCH_SIZE):
+        batch = distinct_types[i:i + INSTANCE_TYPE_BATCH_SIZE]
+        try:
+            memory_mib.update(describe_instance_type_memory(ec2_client, batch))
+        except ClientError as e:
+            logger.warning(f"Batch instance type lookup failed, retrying individually: {str(e)}")
+            for instance_type in batch:
+                try:
+                    memory_mib.update(describe_instance_type_memory(ec2_client, [instance_type]))
+                except ClientError as e:
+                    logger.warning(f"Unable to describe instance type {instance_type}: {str(e)}")
+
+    logger.info(f"Resolved memory for {len(memory_mib)} of {len(distinct_types)} distinct instance types")
+    return {
+        instance_type: f"{memory_mib[instance_type] / 1024:.1f}" if instance_type in memory_mib else 'N/A'
+        for instance_type in distinct_types
+    }
+
+
+def format_tags(tags):
+    """
+    Format an EC2 tag list as comma-separated Key=Value pairs
+
+    Args:
+        tags (list): List of {'Key': ..., 'Value': ...} dictionaries
+
+    Returns:
+        str: Formatted tags
+    """
+    return ','.join(f"{tag['Key']}={tag['Value']}" for tag in tags or [])
+
+
+def build_row(instance, volume_sizes, type_memory):
+    """
+    Build a CSV row for an instance
+
+    Args:
+        instance (dict): EC2 instance dictionary
+        volume_sizes (dict): Mapping of instance ID to total volume size
+        type_memory (dict): Mapping of instance type to memory in GiB
+
+    Returns:
+        list: CSV row matching CSV_HEADER
+    """
+    instance_id = instance['InstanceId']
+    instance_type = instance.get('InstanceType')
+    tags = instance.get('Tags', [])
+    name = next((tag['Value'] for tag in tags if tag['Key'] == 'Name'), None)
+    launch_time = instance.get('LaunchTime')
+
+    if not instance_type:
+        logger.warning(f"Invalid instance type for instance {instance_id}, skipping memory info")
+
+    return [
+        instance_id,
+        name or 'N/A',
+        instance_type or '',
+        instance['State']['Name'],
+        instance.get('PrivateIpAddress', ''),
+        instance.get('PublicIpAddress') or 'N/A',
+        instance.get('VpcId', ''),
+        instance.get('SubnetId', ''),
+        instance.get('Platform') or 'linux',
+        instance.get('CpuOptions', {}).get('CoreCount', ''),
+        type_memory.get(instance_type, 'N/A'),
+        volume_sizes.get(instance_id, 0),
+        format_tags(tags),
+        launch_time.isoformat() if launch_time else ''
+    ]
+
+
+def collect_ec2_inventory(ec2_client):
+    """
+    Collect EC2 inventory rows for the client's region
+
+    Args:
+        ec2_client (boto3.client): EC2 client
+
+    Returns:
+        list: CSV rows matching CSV_HEADER
+    """
+    instances = get_instances(ec2_client)
+    if not instances:
+        return []
+
+    volume_sizes = get_volume_sizes(ec2_client)
+    type_memory = get_instance_type_memory(ec2_client, (i.get('InstanceType') for i in instances))
+
+    return [build_row(instance, volume_sizes, type_memory) for instance in instances]
+
+
+def write_output(rows, output_file, fmt=None):
+    """
+    Write inventory rows to a CSV, JSONL, Parquet or SQLite file
+
+    Args:
+        rows (list): Rows matching CSV_HEADER
+        output_file (str): Output file path
+        fmt (str): Output format, detected from the file extension if None
+
+    Returns:
+        int: Number of rows written
+    """
+    return write_rows(rows, output_file, CSV_HEADER, fmt)
+
+
+def setup_logging():
+    """Log to the console and to a timestamped log file"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(f"ec2_inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+        ]
+    )
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    setup_logging()
+    extension = FORMAT_EXTENSIONS[args.format or 'csv']
+    output_file = args.output or f"aws-ec2-inventory_{args.region}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
+
+    logger.info(f"Starting EC2 inventory for region: {args.region}")
+    ec2_client = get_ec2_client(args.profile, args.region)
+
+    try:
+        rows = collect_ec2_inventory(ec2_client)
+    except ClientError as e:
+        logger.error(f"Error collecting EC2 inventory: {str(e)}")
+        return 1
+
+    write_output(rows, output_file, args.format)
+    logger.info(f"Inventory complete! {len(rows)} instances saved to: {output_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
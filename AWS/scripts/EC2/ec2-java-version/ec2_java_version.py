@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+EC2 Java Version Scanner
+
+This script generates the same CSV inventory as AWS-EC2-java-version.sh for a
+whole region in a few minutes instead of processing instances one at a time:
+
+- SSM-managed instances are scanned with one multi-instance SSM command per
+  50 instances, and results are collected in bulk by the shared SSM poller
+- Only instances that are not SSM-managed fall back to SSH, and those checks
+  run in a bounded concurrent pool
+- Rows are written to the CSV as results arrive
+
+Usage:
+    python ec2_java_version.py [--region REGION] [--output FILE] [--key FILE] [--user USER]
+
+Options:
+    -r, --region    AWS region (default: eu-west-1)
+    -o, --output    Output file (default: ec2-java-versions_TIMESTAMP.csv)
+    --format        csv, jsonl, parquet or sqlite (default: from the output file extension)
+    -k, --key       SSH private key file for instances without SSM
+    -u, --user      SSH user (default: ec2-user)
+    --profile       AWS profile name to use
+    --parallel      Number of SSH checks to run in parallel (default: 16)
+    --timeout       Seconds to wait for SSM results (default: 300)
+    --metrics-json  Write per-operation API call metrics to a JSON file
+    --metrics-prom  Write per-operation API call metrics to a Prometheus textfile
+    --help          Show this help message and exit
+"""
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import boto3
+from botocore.exceptions import ClientError
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', '..', 'common'))
+from api_metrics import ApiMetrics
+from inventory_writer import FORMAT_EXTENSIONS, InventoryWriter
+from ssm_poller import SSMCommandPoller
+
+logger = logging.getLogger(__name__)
+
+CSV_HEADER = [
+    'Instance ID', 'Name', 'Instance Type', 'State', 'Private IP', 'Public IP',
+    'Java Version', 'Java Vendor', 'Access Method'
+]
+
+# send_command accepts at most 50 instance IDs per call
+MAX_INSTANCES_PER_COMMAND = 50
+
+# Prints "version|vendor", or "Java not installed". SSH runs it with sudo
+JAVA_CHECK_SCRIPT = [
+    'if ! {sudo}which java >/dev/null 2>&1; then',
+    '    echo "Java not installed"',
+    '    exit 0',
+    'fi',
+    'version=$({sudo}java -version 2>&1 | head -n 1)',
+    'vendor=$({sudo}java -XshowSettings:properties -version 2>&1 | grep "java.specification.vendor" || echo "Vendor not found")',
+    'echo "$version|$vendor"'
+]
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Generate inventory of Java versions installed on EC2 instances')
+    parser.add_argument('-r', '--region', default='eu-west-1', help='AWS region')
+    parser.add_argument('-o', '--output', help='Output file (default: ec2-java-versions_TIMESTAMP.csv)')
+    parser.add_argument('-k', '--key', help='SSH private key file')
+    parser.add_argument('-u', '--user', default='ec2-user', help='SSH user')
+    parser.add_argument('--format', choices=list(FORMAT_EXTENSIONS),
+                        help='Output format (default: from the output file extension, else csv)')
+    parser.add_argument('--profile', help='AWS profile to use')
+    parser.add_argument('--parallel', type=int, default=16, help='Number of SSH checks to run in parallel')
+    parser.add_argument('--timeout', type=int, default=300, help='Seconds to wait for SSM results')
+    parser.add_argument('--metrics-json', help='Write per-operation API call metrics to a JSON file')
+    parser.add_argument('--metrics-prom', help='Write per-operation API call metrics to a Prometheus textfile')
+    return parser.parse_args()
+
+
+def setup_logging():
+    """Log to the console and to a timestamped log file"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(f"ec2_java_version_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+        ]
+    )
+
+
+def get_instances(ec2_client):
+    """
+    Get all EC2 instances in the region
+
+    Args:
+        ec2_client (boto3.client): EC2 client
+
+    Returns:
+        list: List of EC2 instance dictionaries
+    """
+    instances = []
+    paginator = ec2_client.get_paginator('describe_instances')
+    for page in paginator.paginate():
+        for reservation in page['Reservations']:
+            instances.extend(reservation['Instances'])
+
+    logger.info(f"Found {len(instances)} instances")
+    return instances
+
+
+def get_ssm_managed_instances(ssm_client):
+    """
+    Get the IDs of instances whose SSM agent is online
+
+    Args:
+        ssm_client (boto3.client): SSM client
+
+    Returns:
+        set: Instance IDs
+    """
+    managed = set()
+    paginator = ssm_client.get_paginator('describe_instance_information')
+    filters = [{'Key': 'PingStatus', 'Values': ['Online']}]
+    for page in paginator.paginate(Filters=filters):
+        managed.update(info['InstanceId'] for info in page['InstanceInformationList'])
+
+    logger.info(f"Found {len(managed)} SSM-managed instances")
+    return managed
+
+
+def java_check_script(sudo=False):
+    """Return the Java check script lines, optionally running java with sudo"""
+    return [line.format(sudo='sudo ' if sudo else '') for line in JAVA_CHECK_SCRIPT]
+
+
+def parse_java_info(java_info):
+    """
+    Split the output of the Java check into version and vendor
+
+    Args:
+        java_info (str): "version|vendor", "Java not installed" or a failure message
+
+    Returns:
+        tuple: (version, vendor)
+    """
+    version, _, vendor = java_info.strip().partition('|')
+    return version.replace('"', '').strip(), vendor.replace('"', '').strip()
+
+
+def build_row(instance, java_info, access_method):
+    """
+    Build a CSV row for an instance
+
+    Args:
+        instance (dict): EC2 instance dictionary
+        java_info (str): Output of the Java check
+        access_method (str): SSM, SSH or empty if the check failed
+
+    Returns:
+        list: CSV row matching CSV_HEADER
+    """
+    name = next((tag['Value'] for tag in instance.get('Tags', []) if tag['Key'] == 'Name'), '')
+    java_version, java_vendor = parse_java_info(java_info)
+    return [
+        instance['InstanceId'],
+        name,
+        instance.get('InstanceType', ''),
+        instance['State']['Name'],
+        instance.get('PrivateIpAddress', ''),
+        instance.get('PublicIpAddress', ''),
+        java_version,
+        java_vendor,
+        access_method
+    ]
+
+
+def check_java_via_ssh(ip, key, user):
+    """
+    Run the Java check over SSH
+
+    Args:
+        ip (str): Instance IP address
+        key (str): SSH private key file
+        user (str): SSH user
+
+    Returns:
+        tuple: (java_info, access_method)
+    """
+    command = [
+        'ssh', '-i', key,
+        '-o', 'StrictHostKeyChecking=no',
+        '-o', 'ConnectTimeout=5',
+        '-o', 'BatchMode=yes',
+        f"{user}@{ip}",
+        '\n'.join(java_check_script(sudo=True))
+    ]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=60)
+    except subprocess.TimeoutExpired:
+        return 'SSH Failed', ''
+    except OSError as e:
+        # ssh missing from PATH or not executable; fail this instance, not the scan
+        logger.error(f"Failed to run ssh for {ip}: {str(e)}")
+        return 'SSH Failed', ''
+    if completed.returncode != 0:
+        return 'SSH Failed', ''
+    return completed.stdout, 'SSH'
+
+
+def send_java_check(ssm_client, instance_ids):
+    """
+    Send the Java check to a batch of instances with one SSM command
+
+    Args:
+        ssm_client (boto3.client): SSM client
+        instance_ids (list): Instance IDs, at most 50
+
+    Returns:
+        str: SSM command ID
+    """
+    response = ssm_client.send_command(
+        InstanceIds=instance_ids,
+        DocumentName='AWS-RunShellScript',
+        Parameters={'commands': java_check_script(), 'executionTimeout': ['600']},
+        TimeoutSeconds=600,
+        MaxConcurrency='100%',
+        MaxErrors='100%'
+    )
+    return response['Command']['CommandId']
+
+
+def scan_java_versions(ec2_client, ssm_client, writer, key=None, user='ec2-user', parallel=16, timeout=300):
+    """
+    Scan all instances in the region and write a row for each as it finishes
+
+    Args:
+        ec2_client (boto3.client): EC2 client
+        ssm_client (boto3.client): SSM client
+        writer (InventoryWriter): Writer rows are written to
+        key (str): SSH private key file, or None to skip SSH
+        user (str): SSH user
+        parallel (int): Number of SSH checks to run in parallel
+        timeout (int): Seconds to wait for SSM results
+
+    Returns:
+        int: Number of rows written
+    """
+    instances = {instance['InstanceId']: instance for instance in get_instances(ec2_client)}
+    managed = get_ssm_managed_instances(ssm_client)
+    written = 0
+
+    def write(instance_id, java_info, access_method):
+        nonlocal written
+        writer.write(build_row(instances[instance_id], java_info, access_method))
+        written += 1
+        logger.info(f"Processed instance: {instance_id} ({access_method or 'no access'})")
+
+    ssm_targets = []
+    ssh_targets = []
+    for instance_id, instance in instances.items():
+        if instance['State']['Name'] != 'running':
+            write(instance_id, f"Not checked: instance is {instance['State']['Name']}", '')
+        elif instance_id in managed:
+            ssm_targets.append(instance_id)
+        elif key and instance.get('PublicIpAddress'):
+            ssh_targets.append(instance_id)
+        else:
+            write(instance_id, 'SSM Failed: instance is not SSM-managed', '')
+
+    def on_ssm_result(result):
+        if result['Status'] == 'Success':
+            write(result['InstanceId'], result['Output'], 'SSM')
+        elif result['Status'] == 'TimedOut' and result['Error']:
+            write(result['InstanceId'], f"SSM Failed: TimedOut ({result['Error']})", '')
+        else:
+            write(result['InstanceId'], f"SSM Failed: {result['Status']}", '')
+
+    poller = SSMCommandPoller(ssm_client, on_result=on_ssm_result, initial_delay=2)
+    for i in range(0, len(ssm_targets), MAX_INSTANCES_PER_COMMAND):
+        batch = ssm_targets[i:i + MAX_INSTANCES_PER_COMMAND]
+        try:
+            poller.track(send_java_check(ssm_client, batch), batch)
+        except ClientError as e:
+            logger.error(f"Failed to send SSM command to {len(batch)} instances: {str(e)}")
+            for instance_id in batch:
+                write(instance_id, 'SSM Failed: Could not send command', '')
+
+    logger.info(f"Checking {len(ssm_targets)} instances via SSM and {len(ssh_targets)} via SSH")
+
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        ssh_futures = {
+            executor.submit(check_java_via_ssh, instances[instance_id]['PublicIpAddress'], key, user): instance_id
+            for instance_id in ssh_targets
+        }
+
+        # Write SSH results while waiting for the next SSM poll, and SSM results after each poll
+        pending_ssh = set(ssh_futures)
+        deadline = time.monotonic() + timeout
+        while pending_ssh or poller.outstanding:
+            if pending_ssh:
+                done, pending_ssh = wait(pending_ssh, timeout=poller.delay, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write(ssh_futures[future], *future.result())
+            else:
+                time.sleep(poller.delay)
+            if poller.outstanding:
+                if time.monotonic() >= deadline:
+                    poller.expire(timeout)
+                else:
+                    try:
+                        poller.poll_once()
+                    except ClientError as e:
+                        # Outstanding instances stay tracked and are polled again on the next tick
+                        logger.warning(f"Failed to poll SSM results, retrying: {str(e)}")
+
+    return written
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    setup_logging()
+    extension = FORMAT_EXTENSIONS[args.format or 'csv']
+    output_file = args.output or f"ec2-java-versions_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
+
+    logger.info(f"Starting EC2 Java version inventory for region: {args.region}")
+    session = boto3.Session(profile_name=args.profile, region_name=args.region)
+    metrics = ApiMetrics('ec2_java_version')
+    metrics.attach(session)
+
+    with InventoryWriter(output_file, CSV_HEADER, args.format) as writer:
+        try:
+            count = scan_java_versions(
+                session.client('ec2'), session.client('ssm'), writer,
+                args.key, args.user, args.parallel, args.timeout
+            )
+        except ClientError as e:
+            logger.error(f"Error scanning Java versions: {str(e)}")
+            return 1
+        finally:
+            metrics.log_summary()
+            metrics.write(args.metrics_json, args.metrics_prom)
+
+    logger.info(f"Java version inventory complete! {count} instances saved to: {output_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
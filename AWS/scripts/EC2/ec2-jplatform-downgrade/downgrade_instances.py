@@ -7,27 +7,53 @@ EC2 Instance Type Downgrade Script
 This script identifies EC2 instances with the tag 'Category: Jplatform' and 
 downgrades their instance types from r5a.xlarge or r5a.2xlarge to r5a.large.
 It specifically targets instances with names from jplatform-isbasi-61 to jplatform-isbasi-134.
+The target instances and types can be changed with --selector and --target-type.
 
 Usage:
-    python downgrade_instances.py [--dry-run] [--profile PROFILE] [--region REGION]
+    python downgrade_instances.py [--dry-run] [--profile PROFILE] [--region REGION] [--selector SELECTOR]
 
 Options:
     --dry-run       Run in dry-run mode without making any changes
+    --selector      Instances to downgrade, as an instance selector expression
+                    with a required type= condition
+                    (default: tag:Category=Jplatform name=jplatform-isbasi-{61..134}
+                    type=r5a.xlarge,r5a.2xlarge state=running,stopped)
+    --target-type   Instance type to downgrade to (default: r5a.large)
+    --journal       Record the progress of every instance in a SQLite file or
+                    s3://bucket/key and resume an interrupted run from it
+    --fresh         Discard the progress recorded in the journal and start over
     --profile       AWS profile name to use
     --region        AWS region to use (default: eu-west-1)
-    --parallel      Number of instances to process in parallel (default: 40)
+    --account       Downgrade instances in another account by assuming a role there
+    --role-name     Role assumed with --account (default: OrganizationAccountAccessRole)
+    --mode          batch (default) stops, modifies and starts instances in groups
+                    and tracks them with one describe_instances poll per tick;
+                    threaded processes each instance in its own thread
+    --parallel      Number of instances to process in parallel in threaded mode (default: 40)
+    --batch-size    Number of instances per stop/start call in batch mode (default: 100)
+    --rate          Maximum EC2 requests per second per API; calls back off
+                    automatically when EC2 throttles (default: 20)
+    --metrics-json  Write per-operation API call metrics to a JSON file
+    --metrics-prom  Write per-operation API call metrics to a Prometheus textfile
     --help          Show this help message and exit
 """
 
 import argparse
 import boto3
 import logging
-import re
+import os
 import sys
 import time
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from botocore.exceptions import ClientError
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', '..', 'common'))
+from api_metrics import ApiMetrics
+from aws_accounts import DEFAULT_ROLE_NAME, AccountSessionPool
+from aws_clients import ClientFactory
+from instance_selector import InstanceSelector, get_tag
+from run_journal import DONE, FAILED, MODIFIED, OPEN_STATES, STARTED, STOPPED, open_journal
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -39,22 +65,51 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Instances downgraded by default: r5a.xlarge and r5a.2xlarge Jplatform
+# instances named jplatform-isbasi-61 to jplatform-isbasi-134
+DEFAULT_SELECTOR = ('tag:Category=Jplatform name=jplatform-isbasi-{61..134} '
+                    'type=r5a.xlarge,r5a.2xlarge state=running,stopped')
+DEFAULT_TARGET_TYPE = 'r5a.large'
+
 def parse_arguments():
     """Parse command line arguments"""
     parser = argparse.ArgumentParser(description='Downgrade EC2 instance types for jplatform-isbasi instances')
     parser.add_argument('--dry-run', action='store_true', help='Perform a dry run without making any changes')
     parser.add_argument('--profile', help='AWS profile to use')
     parser.add_argument('--region', default='eu-west-1', help='AWS region to use')
-    parser.add_argument('--parallel', type=int, default=40, help='Number of instances to process in parallel')
+    parser.add_argument('--account', help='Account to downgrade instances in, by assuming a role there')
+    parser.add_argument('--role-name', default=DEFAULT_ROLE_NAME, help='Role assumed with --account')
+    parser.add_argument('--selector', default=DEFAULT_SELECTOR, help='Instances to downgrade, as an instance selector expression')
+    parser.add_argument('--target-type', default=DEFAULT_TARGET_TYPE, help='Instance type to downgrade to')
+    parser.add_argument('--journal', help='SQLite file or s3://bucket/key recording the progress of the run')
+    parser.add_argument('--fresh', action='store_true', help='Discard the progress recorded in the journal and start over')
+    parser.add_argument('--mode', choices=['batch', 'threaded'], default='batch', help='Processing mode')
+    parser.add_argument('--parallel', type=int, default=40, help='Number of instances to process in parallel in threaded mode')
+    parser.add_argument('--batch-size', type=int, default=100, help='Number of instances per stop/start call in batch mode')
+    parser.add_argument('--rate', type=float, default=20, help='Maximum EC2 requests per second per API')
+    parser.add_argument('--metrics-json', help='Write per-operation API call metrics to a JSON file')
+    parser.add_argument('--metrics-prom', help='Write per-operation API call metrics to a Prometheus textfile')
     return parser.parse_args()
 
-def get_ec2_client(profile=None, region='eu-west-1'):
+def get_ec2_client(profile=None, region='eu-west-1', rate=20, max_pool_connections=40, metrics=None,
+                   account=None, role_name=DEFAULT_ROLE_NAME):
     """
-    Initialize and return an EC2 client
+    Initialize and return a rate-limited EC2 client
+    
+    The client comes from the shared client factory: every EC2 API is held to
+    the given rate, throttled calls are retried with adaptive backoff and
+    lower the rate, so many threads can share the client safely. With an
+    account, the client uses a role assumed in that account, whose
+    credentials are refreshed before they expire.
     
     Args:
         profile (str): AWS profile name
         region (str): AWS region
+        rate (float): Maximum requests per second per EC2 API
+        max_pool_connections (int): Connection pool size
+        metrics (ApiMetrics): Recorder measuring every call, or None
+        account (str): AWS account ID to assume the role in, or None for the profile's account
+        role_name (str): Role assumed in the account
         
     Returns:
         boto3.client: EC2 client
@@ -65,91 +120,87 @@ def get_ec2_client(profile=None, region='eu-west-1'):
         else:
             session = boto3.Session(region_name=region)
         
-        return session.client('ec2')
+        if account:
+            pool = AccountSessionPool(session, role_name=role_name, rates={'ec2': rate},
+                                      max_pool_connections=max_pool_connections, metrics=metrics)
+            return pool.client(account, 'ec2')
+        
+        factory = ClientFactory(session, rates={'ec2': rate}, max_pool_connections=max_pool_connections,
+                                metrics=metrics)
+        return factory.client('ec2')
     except Exception as e:
         logger.error(f"Failed to initialize EC2 client: {str(e)}")
         sys.exit(1)
 
-def get_jplatform_instances(ec2_client):
+def get_target_instances(ec2_client, selector):
     """
-    Get all EC2 instances with the tag Category=Jplatform
+    Get the EC2 instances matched by an instance selector
+    
+    The selector is compiled into describe_instances filters, so EC2 returns
+    only the matching instances instead of every Jplatform instance.
     
     Args:
         ec2_client (boto3.client): EC2 client
+        selector (InstanceSelector): Instances to select
         
     Returns:
         list: List of EC2 instance dictionaries
     """
-    instances = []
     try:
-        # Define filter for instances with the tag Category=Jplatform
-        filters = [
-            {
-                'Name': 'tag:Category', 
-                'Values': ['Jplatform']
-            },
-            {
-                'Name': 'instance-state-name',
-                'Values': ['running', 'stopped']
-            }
-        ]
-        
-        # Use paginator for handling large lists of instances
-        paginator = ec2_client.get_paginator('describe_instances')
-        for page in paginator.paginate(Filters=filters):
-            for reservation in page['Reservations']:
-                instances.extend(reservation['Instances'])
-                
-        logger.info(f"Found {len(instances)} instances with tag Category=Jplatform")
-        return instances
+        instances = selector.describe(ec2_client)
     except ClientError as e:
         logger.error(f"Error getting instances: {str(e)}")
         return []
+    
+    for instance in instances:
+        # Add instance name for better logging
+        instance['NameTag'] = get_tag(instance, 'Name') or instance['InstanceId']
+        
+    logger.info(f"Found {len(instances)} target instances matching {selector}")
+    return instances
 
-def filter_target_instances(instances):
+def get_resumed_instances(ec2_client, journal, known_ids):
     """
-    Filter instances by name pattern jplatform-isbasi-61 to jplatform-isbasi-134
+    Get the unfinished instances of an interrupted run that the selector did not return
+    
+    An instance that was already modified has the target type and no longer
+    matches the selector, but may still have to be started. Instances that
+    no longer exist are recorded as failed in the journal.
     
     Args:
-        instances (list): List of EC2 instance dictionaries
+        ec2_client (boto3.client): EC2 client
+        journal (RunJournal): Journal of the interrupted run
+        known_ids (set): IDs of the instances the selector returned
         
     Returns:
-        list: Filtered list of EC2 instance dictionaries
+        list: List of EC2 instance dictionaries
     """
-    filtered_instances = []
-    pattern = re.compile(r'jplatform-isbasi-(\d+)')
+    unfinished = [instance_id for instance_id in journal.ids(*OPEN_STATES) if instance_id not in known_ids]
+    if not unfinished:
+        return []
     
+    instances = get_instances_by_id(ec2_client, unfinished)
+    found = {instance['InstanceId'] for instance in instances}
+    for instance_id in unfinished:
+        if instance_id not in found:
+            logger.warning(f"Instance {instance_id} from the journal no longer exists")
+            journal.record(instance_id, FAILED, error='Instance no longer exists')
     for instance in instances:
-        # Get the Name tag
-        instance_name = None
-        for tag in instance.get('Tags', []):
-            if tag['Key'] == 'Name':
-                instance_name = tag['Value']
-                break
-        
-        if not instance_name:
-            continue
-            
-        # Check if it follows the pattern
-        match = pattern.match(instance_name)
-        if match:
-            instance_number = int(match.group(1))
-            
-            # Include only instances from 61 to 134
-            if 61 <= instance_number <= 134 and instance_number != 135:
-                # Add instance name for better logging
-                instance['NameTag'] = instance_name
-                filtered_instances.append(instance)
-                
-    logger.info(f"Filtered to {len(filtered_instances)} target instances in the range jplatform-isbasi-61 to jplatform-isbasi-134")
-    return filtered_instances
-
-def needs_downgrade(instance):
+        instance['NameTag'] = get_tag(instance, 'Name') or instance['InstanceId']
+    
+    logger.info(f"Resuming {len(instances)} instances from the journal that no longer match the selector")
+    return instances
+
+def needs_downgrade(instance, target_type=DEFAULT_TARGET_TYPE):
     """
     Check if the instance needs to be downgraded
     
+    Which instance types are downgraded is decided by the selector's required
+    type condition; this only skips instances that already have the target type.
+    
     Args:
         instance (dict): EC2 instance dictionary
+        target_type (str): Instance type to downgrade to
         
     Returns:
         bool: True if instance needs downgrade, False otherwise
@@ -157,28 +208,28 @@ def needs_downgrade(instance):
     instance_type = instance['InstanceType']
     instance_name = instance.get('NameTag', instance['InstanceId'])
     
-    # Skip instances that are already r5a.large
-    if instance_type == 'r5a.large':
-        logger.info(f"Instance {instance_name} ({instance['InstanceId']}) is already r5a.large, skipping")
+    # Skip instances that already have the target type
+    if instance_type == target_type:
+        logger.info(f"Instance {instance_name} ({instance['InstanceId']}) is already {target_type}, skipping")
         return False
         
-    # Only downgrade r5a.xlarge or r5a.2xlarge
-    if instance_type in ['r5a.xlarge', 'r5a.2xlarge']:
-        logger.info(f"Instance {instance_name} ({instance['InstanceId']}) is {instance_type}, will be downgraded to r5a.large")
-        return True
-        
-    # Skip other instance types
-    logger.info(f"Instance {instance_name} ({instance['InstanceId']}) is {instance_type}, which is not a target for downgrade")
-    return False
+    logger.info(f"Instance {instance_name} ({instance['InstanceId']}) is {instance_type}, will be downgraded to {target_type}")
+    return True
 
-def downgrade_instance(ec2_client, instance, dry_run=False):
+def downgrade_instance(ec2_client, instance, dry_run=False, target_type=DEFAULT_TARGET_TYPE, journal=None):
     """
-    Downgrade an instance to r5a.large
+    Downgrade an instance to the target type
+    
+    An instance resumed from the journal continues where the interrupted run
+    left it: it is only stopped and modified if it does not have the target
+    type yet, and only started if it was running before the first run.
     
     Args:
         ec2_client (boto3.client): EC2 client
         instance (dict): EC2 instance dictionary
         dry_run (bool): If True, don't make any changes
+        target_type (str): Instance type to downgrade to
+        journal (RunJournal): Journal recording the progress, or None
         
     Returns:
         dict: Result of the operation
@@ -186,12 +237,12 @@ def downgrade_instance(ec2_client, instance, dry_run=False):
     instance_id = instance['InstanceId']
     instance_name = instance.get('NameTag', instance_id)
     current_type = instance['InstanceType']
-    target_type = 'r5a.large'
+    entry = journal.get(instance_id) if journal else None
     
     result = {
         'instance_id': instance_id,
         'instance_name': instance_name,
-        'original_type': current_type,
+        'original_type': entry['original_type'] if entry else current_type,
         'target_type': target_type,
         'success': False,
         'error': None
@@ -202,7 +253,8 @@ def downgrade_instance(ec2_client, instance, dry_run=False):
         
         # Check current state
         current_state = instance['State']['Name']
-        was_running = current_state == 'running'
+        was_running = entry['was_running'] if entry else current_state == 'running'
+        needs_modify = current_type != target_type
         
         if dry_run:
             logger.info(f"DRY RUN: Would stop instance {instance_name} ({instance_id})")
@@ -213,27 +265,37 @@ def downgrade_instance(ec2_client, instance, dry_run=False):
             return result
             
         # Stop the instance if it's running
-        if current_state == 'running':
-            logger.info(f"Stopping instance {instance_name} ({instance_id})...")
-            ec2_client.stop_instances(InstanceIds=[instance_id])
+        if current_state == 'stopping' or (needs_modify and current_state != 'stopped'):
+            if current_state != 'stopping':
+                logger.info(f"Stopping instance {instance_name} ({instance_id})...")
+                ec2_client.stop_instances(InstanceIds=[instance_id])
             
             # Wait for the instance to stop
             waiter = ec2_client.get_waiter('instance_stopped')
             waiter.wait(InstanceIds=[instance_id])
             logger.info(f"Instance {instance_name} ({instance_id}) stopped successfully")
+            current_state = 'stopped'
+            if journal:
+                journal.record(instance_id, STOPPED)
             
         # Modify instance type
-        logger.info(f"Modifying instance {instance_name} ({instance_id}) from {current_type} to {target_type}...")
-        ec2_client.modify_instance_attribute(
-            InstanceId=instance_id,
-            InstanceType={'Value': target_type}
-        )
-        logger.info(f"Instance {instance_name} ({instance_id}) type modified to {target_type}")
+        if needs_modify:
+            logger.info(f"Modifying instance {instance_name} ({instance_id}) from {current_type} to {target_type}...")
+            ec2_client.modify_instance_attribute(
+                InstanceId=instance_id,
+                InstanceType={'Value': target_type}
+            )
+            logger.info(f"Instance {instance_name} ({instance_id}) type modified to {target_type}")
+            if journal:
+                journal.record(instance_id, MODIFIED)
         
         # Start the instance if it was previously running
-        if was_running:
-            logger.info(f"Starting instance {instance_name} ({instance_id})...")
-            ec2_client.start_instances(InstanceIds=[instance_id])
+        if was_running and current_state != 'running':
+            if current_state != 'pending':
+                logger.info(f"Starting instance {instance_name} ({instance_id})...")
+                ec2_client.start_instances(InstanceIds=[instance_id])
+                if journal:
+                    journal.record(instance_id, STARTED)
             
             # Wait for the instance to start
             waiter = ec2_client.get_waiter('instance_running')
@@ -241,23 +303,262 @@ def downgrade_instance(ec2_client, instance, dry_run=False):
             logger.info(f"Instance {instance_name} ({instance_id}) started successfully")
             
         result['success'] = True
+        if journal:
+            journal.record(instance_id, DONE)
         return result
         
     except Exception as e:
         error_msg = f"Error downgrading instance {instance_name} ({instance_id}): {str(e)}"
         logger.error(error_msg)
         result['error'] = str(e)
+        if journal:
+            journal.record(instance_id, FAILED, error=str(e))
         return result
 
-def process_instances(ec2_client, instances, dry_run=False, parallel=40):
+def _call_in_batches(action, instance_ids, batch_size):
+    """
+    Call stop_instances or start_instances for groups of instance IDs
+
+    If a group is rejected, its instances are retried one by one so that a
+    single bad instance does not fail the whole group.
+
+    Args:
+        action (callable): ec2_client.stop_instances or ec2_client.start_instances
+        instance_ids (list): Instance IDs
+        batch_size (int): Number of instance IDs per call
+
+    Returns:
+        dict: Mapping of instance ID to error message for the instances that failed
+    """
+    errors = {}
+    for i in range(0, len(instance_ids), batch_size):
+        batch = instance_ids[i:i + batch_size]
+        try:
+            action(InstanceIds=batch)
+        except ClientError:
+            for instance_id in batch:
+                try:
+                    action(InstanceIds=[instance_id])
+                except ClientError as e:
+                    errors[instance_id] = str(e)
+    return errors
+
+def get_instances_by_id(ec2_client, instance_ids):
+    """
+    Describe many instances by ID with one paginated call per 200 IDs
+
+    Instances that no longer exist are left out instead of failing the call.
+
+    Args:
+        ec2_client (boto3.client): EC2 client
+        instance_ids (list): Instance IDs
+
+    Returns:
+        list: List of EC2 instance dictionaries
+    """
+    instances = []
+    paginator = ec2_client.get_paginator('describe_instances')
+    # The instance-id filter accepts at most 200 values
+    for i in range(0, len(instance_ids), 200):
+        filters = [{'Name': 'instance-id', 'Values': instance_ids[i:i + 200]}]
+        for page in paginator.paginate(Filters=filters):
+            for reservation in page['Reservations']:
+                instances.extend(reservation['Instances'])
+    return instances
+
+def _describe_states(ec2_client, instance_ids):
+    """
+    Get the current state of many instances with one paginated poll
+
+    Args:
+        ec2_client (boto3.client): EC2 client
+        instance_ids (list): Instance IDs
+
+    Returns:
+        dict: Mapping of instance ID to its State and StateReason
+    """
+    return {
+        instance['InstanceId']: {
+            'state': instance['State']['Name'],
+            'reason': instance.get('StateReason', {})
+        }
+        for instance in get_instances_by_id(ec2_client, instance_ids)
+    }
+
+def downgrade_instances_batched(ec2_client, instances, dry_run=False, batch_size=100, poll_interval=5, timeout=1800,
+                                target_type=DEFAULT_TARGET_TYPE, journal=None):
+    """
+    Downgrade many instances to the target type as one batch
+
+    Instead of one thread and one pair of waiters per instance, stop and start
+    requests are sent for groups of instances and every instance is tracked
+    with a single describe_instances poll per tick. Each instance is modified
+    as soon as it reaches stopped and started again in the next group.
+
+    Every step is recorded in the journal, if one is given. Instances resumed
+    from it continue where the interrupted run left them, as in
+    downgrade_instance().
+
+    Args:
+        ec2_client (boto3.client): EC2 client
+        instances (list): List of EC2 instance dictionaries
+        dry_run (bool): If True, don't make any changes
+        batch_size (int): Number of instances per stop/start call
+        poll_interval (int): Seconds between state polls
+        timeout (int): Seconds to wait before failing instances that have not finished
+        target_type (str): Instance type to downgrade to
+        journal (RunJournal): Journal recording the progress, or None
+
+    Yields:
+        dict: Result of the operation for each instance, as soon as it finishes
+    """
+    tracked = {}
+    for instance in instances:
+        instance_id = instance['InstanceId']
+        entry = journal.get(instance_id) if journal else None
+        state = instance['State']['Name']
+        needs_modify = instance['InstanceType'] != target_type
+        if state == 'stopping' or (needs_modify and state != 'stopped'):
+            phase = 'stopping'
+        elif state in ('pending', 'running'):
+            phase = 'starting'
+        elif needs_modify:
+            phase = 'stopped'
+        else:
+            phase = 'modified'
+        tracked[instance_id] = {
+            'result': {
+                'instance_id': instance_id,
+                'instance_name': instance.get('NameTag', instance_id),
+                'original_type': entry['original_type'] if entry else instance['InstanceType'],
+                'target_type': target_type,
+                'success': False,
+                'error': None
+            },
+            'was_running': entry['was_running'] if entry else state == 'running',
+            'needs_modify': needs_modify,
+            'phase': phase
+        }
+
+    def label(instance_id):
+        return f"{tracked[instance_id]['result']['instance_name']} ({instance_id})"
+
+    def finish(instance_id, error=None):
+        if error:
+            logger.error(f"Error downgrading instance {label(instance_id)}: {error}")
+        result = tracked.pop(instance_id)['result']
+        result['success'] = error is None
+        result['error'] = error
+        if journal and not dry_run:
+            journal.record(instance_id, FAILED if error else DONE, error=error)
+        return result
+
+    if dry_run:
+        for instance_id in list(tracked):
+            logger.info(f"DRY RUN: Would stop instance {label(instance_id)}")
+            logger.info(f"DRY RUN: Would modify {label(instance_id)} from "
+                        f"{tracked[instance_id]['result']['original_type']} to {target_type}")
+            if tracked[instance_id]['was_running']:
+                logger.info(f"DRY RUN: Would start instance {label(instance_id)}")
+            yield finish(instance_id)
+        return
+
+    to_stop = [instance_id for instance_id, entry in tracked.items() if entry['phase'] == 'stopping']
+    logger.info(f"Stopping {len(to_stop)} instances in groups of {batch_size}...")
+    for instance_id, error in _call_in_batches(ec2_client.stop_instances, to_stop, batch_size).items():
+        yield finish(instance_id, error)
+
+    deadline = time.monotonic() + timeout
+    first_tick = True
+    while tracked:
+        # Instances that were already stopped are modified without waiting for a poll
+        if not first_tick:
+            time.sleep(poll_interval)
+        first_tick = False
+
+        transitioning = [instance_id for instance_id, entry in tracked.items() if entry['phase'] in ('stopping', 'starting')]
+        try:
+            states = _describe_states(ec2_client, transitioning) if transitioning else {}
+        except ClientError as e:
+            logger.warning(f"Unable to poll instance states, retrying: {str(e)}")
+            states = {}
+
+        to_start = []
+        for instance_id in list(tracked):
+            entry = tracked[instance_id]
+            state = states.get(instance_id, {}).get('state')
+            if state in ('shutting-down', 'terminated'):
+                yield finish(instance_id, f"Instance is {state}")
+                continue
+
+            if entry['phase'] == 'stopping' and state == 'stopped':
+                logger.info(f"Instance {label(instance_id)} stopped successfully")
+                entry['phase'] = 'stopped'
+                if journal:
+                    journal.record(instance_id, STOPPED)
+
+            if entry['phase'] == 'stopped' and entry['needs_modify']:
+                logger.info(f"Modifying instance {label(instance_id)} from "
+                            f"{entry['result']['original_type']} to {target_type}...")
+                try:
+                    ec2_client.modify_instance_attribute(InstanceId=instance_id, InstanceType={'Value': target_type})
+                except ClientError as e:
+                    yield finish(instance_id, str(e))
+                    continue
+                logger.info(f"Instance {label(instance_id)} type modified to {target_type}")
+                entry['phase'] = 'modified'
+                if journal:
+                    journal.record(instance_id, MODIFIED)
+
+            if entry['phase'] in ('stopped', 'modified'):
+                if entry['was_running']:
+                    entry['phase'] = 'starting'
+                    to_start.append(instance_id)
+                else:
+                    yield finish(instance_id)
+
+            elif entry['phase'] == 'starting' and state == 'running':
+                logger.info(f"Instance {label(instance_id)} started successfully")
+                yield finish(instance_id)
+
+            elif entry['phase'] == 'starting' and state == 'stopped':
+                # A start that the instance could not complete, e.g. insufficient capacity
+                reason = states[instance_id]['reason']
+                if reason.get('Code', '').startswith('Server.'):
+                    yield finish(instance_id, f"Instance failed to start: {reason.get('Message', reason['Code'])}")
+
+        if to_start:
+            logger.info(f"Starting {len(to_start)} instances...")
+            errors = _call_in_batches(ec2_client.start_instances, to_start, batch_size)
+            for instance_id in to_start:
+                if instance_id in errors:
+                    yield finish(instance_id, errors[instance_id])
+                elif journal:
+                    journal.record(instance_id, STARTED)
+
+        if tracked and time.monotonic() >= deadline:
+            for instance_id in list(tracked):
+                yield finish(instance_id, f"Timed out after {timeout} seconds while {tracked[instance_id]['phase']}")
+
+def process_instances(ec2_client, instances, dry_run=False, parallel=40, mode='batch', batch_size=100,
+                      target_type=DEFAULT_TARGET_TYPE, journal=None):
     """
     Process instances for downgrading
     
+    With a journal, instances that are unfinished in it are processed even if
+    they already have the target type, instances that were downgraded earlier
+    in the run are skipped, and instances that failed earlier in the run are
+    reported as failed again with their recorded error.
+    
     Args:
         ec2_client (boto3.client): EC2 client
         instances (list): List of EC2 instance dictionaries
         dry_run (bool): If True, don't make any changes
-        parallel (int): Number of instances to process in parallel
+        parallel (int): Number of instances to process in parallel in threaded mode
+        mode (str): 'batch' or 'threaded'
+        batch_size (int): Number of instances per stop/start call in batch mode
+        target_type (str): Instance type to downgrade to
+        journal (RunJournal): Journal recording the progress, or None
         
     Returns:
         dict: Results of the operations
@@ -274,41 +575,83 @@ def process_instances(ec2_client, instances, dry_run=False, parallel=40):
         }
     }
     
+    # Instances that failed earlier in the run stay failed, so a resumed run
+    # is not reported as clean. They may no longer match the selector.
+    failed_earlier = journal.ids(FAILED) if journal else []
+    known = {instance['InstanceId']: instance for instance in instances}
+    for instance_id in failed_earlier:
+        entry = journal.get(instance_id)
+        instance = known.get(instance_id, {})
+        if instance_id not in known:
+            results['total'] += 1
+        results['failed'] += 1
+        results['details']['failed'].append({
+            'instance_id': instance_id,
+            'instance_name': instance.get('NameTag', instance_id),
+            'original_type': entry.get('original_type', instance.get('InstanceType')),
+            'target_type': target_type,
+            'success': False,
+            'error': f"Failed earlier in this run: {entry.get('error')}"
+        })
+        logger.warning(f"Instance {instance.get('NameTag', instance_id)} ({instance_id}) failed earlier in this run: "
+                       f"{entry.get('error')}")
+    
     # Filter for instances that need downgrading
     to_downgrade = []
     for instance in instances:
-        if needs_downgrade(instance):
+        instance_name = instance.get('NameTag', instance['InstanceId'])
+        if instance['InstanceId'] in failed_earlier:
+            continue
+        entry = journal.get(instance['InstanceId']) if journal else None
+        if entry and entry['state'] in OPEN_STATES:
+            logger.info(f"Instance {instance_name} ({instance['InstanceId']}) was {entry['state']} "
+                        f"when the previous run stopped, resuming")
+            to_downgrade.append(instance)
+        elif not entry and needs_downgrade(instance, target_type):
             to_downgrade.append(instance)
         else:
-            instance_name = instance.get('NameTag', instance['InstanceId'])
             results['skipped'] += 1
             results['details']['skipped'].append({
                 'instance_id': instance['InstanceId'],
                 'instance_name': instance_name,
                 'instance_type': instance['InstanceType'],
-                'reason': 'Already r5a.large or not a target type'
+                'reason': f"Already {entry['state']} earlier in this run" if entry else f'Already {target_type}'
             })
     
     logger.info(f"Found {len(to_downgrade)} instances that need downgrading")
     
     if not to_downgrade:
         return results
+    
+    if journal and not dry_run:
+        for instance in to_downgrade:
+            journal.add(instance['InstanceId'], was_running=instance['State']['Name'] == 'running',
+                        original_type=instance['InstanceType'])
+        journal.flush()
         
-    # Process instances in parallel
+    def record(result):
+        status = 'downgraded' if result['success'] else 'failed'
+        results[status] += 1
+        results['details'][status].append(result)
+        logger.info(f"Finished {result['instance_name']} ({result['instance_id']}): {status} "
+                    f"[{results['downgraded'] + results['failed']}/{len(to_downgrade)}]")
+
+    if mode == 'batch':
+        for result in downgrade_instances_batched(ec2_client, to_downgrade, dry_run, batch_size,
+                                                  target_type=target_type, journal=journal):
+            record(result)
+        return results
+
+    # Process instances in parallel, reporting each one as it finishes
     with ThreadPoolExecutor(max_workers=parallel) as executor:
-        future_to_instance = {
-            executor.submit(downgrade_instance, ec2_client, instance, dry_run): instance
+        futures = [
+            executor.submit(downgrade_instance, ec2_client, instance, dry_run, target_type,
+                            journal if not dry_run else None)
             for instance in to_downgrade
-        }
+        ]
         
-        for future in future_to_instance:
-            result = future.result()
-            if result['success']:
-                results['downgraded'] += 1
-                results['details']['downgraded'].append(result)
-            else:
-                results['failed'] += 1
-                results['details']['failed'].append(result)
+        for future in as_completed(futures):
+            record(future.result())
     
     return results
 
@@ -320,23 +663,58 @@ def main():
     if args.dry_run:
         logger.info("Running in DRY RUN mode - no changes will be made")
     
+    try:
+        selector = InstanceSelector.parse(args.selector)
+    except ValueError as e:
+        logger.error(f"Invalid selector: {str(e)}")
+        return 1
+    
+    # Without a type condition every selected instance would be resized, including smaller ones
+    if not selector.has_key('type'):
+        logger.error("The selector must have a type= condition naming the instance types to downgrade")
+        return 1
+    
     # Initialize EC2 client
-    ec2_client = get_ec2_client(args.profile, args.region)
+    metrics = ApiMetrics('downgrade_instances')
+    ec2_client = get_ec2_client(args.profile, args.region, args.rate, max(10, args.parallel), metrics,
+                                args.account, args.role_name)
     
-    # Get jplatform instances
-    all_instances = get_jplatform_instances(ec2_client)
-    if not all_instances:
-        logger.warning("No instances found with tag Category=Jplatform")
-        return
-        
-    # Filter target instances
-    target_instances = filter_target_instances(all_instances)
-    if not target_instances:
-        logger.warning("No instances found matching the required name pattern")
-        return
+    # Open the journal of an interrupted run, or start a new one
+    journal = None
+    if args.journal:
+        try:
+            s3_client = boto3.Session(profile_name=args.profile).client('s3') if args.journal.startswith('s3://') else None
+            params = {'selector': str(selector), 'target_type': args.target_type, 'region': args.region}
+            if args.account:
+                params['account'] = args.account
+            journal = open_journal(args.journal, 'downgrade_instances', params, s3_client=s3_client)
+            if args.fresh and journal.resumed and not args.dry_run:
+                logger.info("Discarding the progress recorded in the journal")
+                journal.complete()
+        except Exception as e:
+            logger.error(f"Failed to open journal {args.journal}: {str(e)}")
+            return 1
+    
+    try:
+        # Get the target instances
+        target_instances = get_target_instances(ec2_client, selector)
+        if journal and journal.resumed:
+            target_instances += get_resumed_instances(ec2_client, journal, {i['InstanceId'] for i in target_instances})
+        if not target_instances and not (journal and journal.ids(FAILED)):
+            logger.warning(f"No instances found matching {selector}")
+            return
+            
+        # Process instances
+        results = process_instances(ec2_client, target_instances, args.dry_run, args.parallel, args.mode,
+                                    args.batch_size, args.target_type, journal)
         
-    # Process instances
-    results = process_instances(ec2_client, target_instances, args.dry_run, args.parallel)
+        # Clear the journal once every instance has finished; failed instances
+        # are reported below and not retried by the next run
+        if journal and not args.dry_run and not journal.ids(*OPEN_STATES):
+            journal.complete()
+    finally:
+        if journal:
+            journal.close()
     
     # Display summary
     logger.info("\n" + "="*50)
@@ -347,6 +725,8 @@ def main():
     logger.info(f"Instances skipped: {results['skipped']}")
     logger.info(f"Instances failed: {results['failed']}")
     logger.info("="*50)
+    metrics.log_summary()
+    metrics.write(args.metrics_json, args.metrics_prom)
     
     if results['failed'] > 0:
         logger.warning("Some instance downgrades failed. See log for details.")
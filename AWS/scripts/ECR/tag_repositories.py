@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ECR Repository Bulk Tagger
+
+This script adds the CostCenter tag to every ECR repository that does not
+have one, like tag-repository.sh, without two CLI calls per repository:
+
+- Repositories are listed with describe_repositories, 1000 per page
+- Repositories that already have a CostCenter tag are found with one
+  paginated Resource Groups Tagging API get_resources pass, 100 per page
+- The remaining repositories are tagged with tag_resources calls of up to
+  20 ARNs each, in a small pool limited to --rate calls per second by the
+  shared client factory, which also backs off when the API throttles
+
+The log file and its SUCCESS/SKIPPED/ERROR lines and summary match
+tag-repository.sh.
+
+Usage:
+    python tag_repositories.py [--region REGION] [--value VALUE] [--dry-run]
+
+Options:
+    --region        AWS region (default: eu-west-1)
+    --value         CostCenter tag value (default: BT)
+    --profile       AWS profile name to use
+    --parallel      Number of tag_resources calls in flight (default: 4)
+    --rate          Maximum tag_resources calls per second (default: 5)
+    -d, --dry-run   Log what would be tagged without tagging
+    --help          Show this help message and exit
+"""
+
+import argparse
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'common'))
+from aws_clients import ClientFactory
+
+logger = logging.getLogger(__name__)
+
+TAG_KEY = 'CostCenter'
+
+# tag_resources accepts at most 20 ARNs per call
+MAX_ARNS_PER_CALL = 20
+
+# get_resources returns at most 100 resources per page
+RESOURCES_PER_PAGE = 100
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Add the CostCenter tag to untagged ECR repositories')
+    parser.add_argument('--region', default='eu-west-1', help='AWS region')
+    parser.add_argument('--value', default='BT', help='CostCenter tag value')
+    parser.add_argument('--profile', help='AWS profile to use')
+    parser.add_argument('--parallel', type=int, default=4, help='Number of tag_resources calls in flight')
+    parser.add_argument('--rate', type=float, default=5, help='Maximum tag_resources calls per second')
+    parser.add_argument('-d', '--dry-run', action='store_true', help='Log what would be tagged without tagging')
+    return parser.parse_args()
+
+
+def setup_logging():
+    """Log to the console and to a timestamped log file"""
+    log_file = f"ecr_tagging_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(log_file)
+        ]
+    )
+    return log_file
+
+
+def repository_name(repo_arn):
+    """Get the repository name from its ARN"""
+    return repo_arn.split(':repository/', 1)[-1]
+
+
+def list_repository_arns(ecr_client):
+    """
+    List the ARNs of all repositories in the region
+
+    Args:
+        ecr_client (boto3.client): ECR client
+
+    Returns:
+        list: Repository ARNs
+    """
+    arns = []
+    for page in ecr_client.get_paginator('describe_repositories').paginate(PaginationConfig={'PageSize': 1000}):
+        arns.extend(repo['repositoryArn'] for repo in page['repositories'])
+    return arns
+
+
+def list_tagged_arns(tagging_client):
+    """
+    Find the repositories that already have a CostCenter tag
+
+    get_resources only returns resources that have tags, so it is used to find
+    the tagged repositories rather than the untagged ones.
+
+    Args:
+        tagging_client (boto3.client): Resource Groups Tagging API client
+
+    Returns:
+        set: ARNs of repositories with a CostCenter tag
+    """
+    tagged = set()
+    paginator = tagging_client.get_paginator('get_resources')
+    for page in paginator.paginate(ResourceTypeFilters=['ecr:repository'], TagFilters=[{'Key': TAG_KEY}],
+                                   ResourcesPerPage=RESOURCES_PER_PAGE):
+        tagged.update(mapping['ResourceARN'] for mapping in page['ResourceTagMappingList'])
+    return tagged
+
+
+def tag_batch(tagging_client, repo_arns, value):
+    """
+    Tag up to 20 repositories with one tag_resources call
+
+    Args:
+        tagging_client (boto3.client): Resource Groups Tagging API client
+        repo_arns (list): Repository ARNs
+        value (str): CostCenter tag value
+
+    Returns:
+        dict: Mapping of failed ARN to its error message
+    """
+    try:
+        response = tagging_client.tag_resources(ResourceARNList=repo_arns, Tags={TAG_KEY: value})
+    except (ClientError, BotoCoreError) as e:
+        return {arn: str(e) for arn in repo_arns}
+    return {
+        arn: f"{failure.get('ErrorCode', '')}: {failure.get('ErrorMessage', '')}"
+        for arn, failure in response.get('FailedResourcesMap', {}).items()
+    }
+
+
+def tag_repositories(ecr_client, tagging_client, value, parallel=4, dry_run=False):
+    """
+    Add the CostCenter tag to every repository that does not have one
+
+    Args:
+        ecr_client (boto3.client): ECR client
+        tagging_client (boto3.client): Resource Groups Tagging API client
+        value (str): CostCenter tag value
+        parallel (int): Number of tag_resources calls in flight
+        dry_run (bool): Log what would be tagged without tagging
+
+    Returns:
+        dict: Counts with keys total, tagged, skipped and errors
+    """
+    logger.info("Retrieving list of ECR repositories...")
+    repo_arns = list_repository_arns(ecr_client)
+    counts = {'total': len(repo_arns), 'tagged': 0, 'skipped': 0, 'errors': 0}
+    if not repo_arns:
+        return counts
+
+    tagged_arns = list_tagged_arns(tagging_client)
+    untagged = []
+    for repo_arn in repo_arns:
+        if repo_arn in tagged_arns:
+            logger.info(f"SKIPPED: Repository already has {TAG_KEY} tag: {repository_name(repo_arn)}")
+            counts['skipped'] += 1
+        else:
+            untagged.append(repo_arn)
+
+    if dry_run:
+        for repo_arn in untagged:
+            logger.info(f"[DRY RUN] Would add {TAG_KEY}:{value} tag to repository: {repository_name(repo_arn)}")
+        counts['tagged'] = len(untagged)
+        return counts
+
+    batches = [untagged[i:i + MAX_ARNS_PER_CALL] for i in range(0, len(untagged), MAX_ARNS_PER_CALL)]
+    logger.info(f"Tagging {len(untagged)} repositories in {len(batches)} batches")
+
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        future_to_batch = {executor.submit(tag_batch, tagging_client, batch, value): batch for batch in batches}
+        for future in as_completed(future_to_batch):
+            failures = future.result()
+            for repo_arn in future_to_batch[future]:
+                if repo_arn in failures:
+                    logger.error(f"ERROR: Failed to tag repository: {repository_name(repo_arn)}")
+                    logger.error(f"ERROR: {failures[repo_arn]}")
+                    counts['errors'] += 1
+                else:
+                    logger.info(f"SUCCESS: Added {TAG_KEY}:{value} tag to repository: {repository_name(repo_arn)}")
+                    counts['tagged'] += 1
+    return counts
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    log_file = setup_logging()
+    logger.info(f"Starting ECR repository tagging script in {args.region}...")
+
+    session = boto3.Session(profile_name=args.profile, region_name=args.region)
+    factory = ClientFactory(session, rates={'resourcegroupstaggingapi.TagResources': args.rate},
+                            max_pool_connections=max(10, args.parallel))
+    ecr_client = factory.client('ecr')
+    tagging_client = factory.client('resourcegroupstaggingapi')
+
+    try:
+        factory.client('sts').get_caller_identity()
+        counts = tag_repositories(ecr_client, tagging_client, args.value, args.parallel, args.dry_run)
+    except (ClientError, BotoCoreError) as e:
+        logger.error(f"ERROR: {str(e)}")
+        return 1
+
+    if counts['total'] == 0:
+        logger.info(f"No repositories found in {args.region}")
+        return 0
+
+    logger.info("===== Summary =====")
+    logger.info(f"Total repositories processed: {counts['total']}")
+    logger.info(f"{'Would tag' if args.dry_run else 'Successfully tagged'}: {counts['tagged']}")
+    logger.info(f"Skipped (already tagged): {counts['skipped']}")
+    logger.info(f"Errors encountered: {counts['errors']}")
+    logger.info(f"Log file: {log_file}")
+    return 1 if counts['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
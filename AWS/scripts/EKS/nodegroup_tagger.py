@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+EKS NodeGroup Resource Tagger
+
+This script tags the resources of many EKS nodegroups at once, like
+AWS-NodeGroup-Tag.sh does for a single nodegroup:
+
+- Several clusters and nodegroups are handled in one run, nodegroups are
+  processed concurrently and share one rate-limited EC2 client
+- Volumes and network interfaces are found with one filtered
+  describe_volumes / describe_network_interfaces call per 200 instance IDs
+  instead of one describe-volumes call per instance
+- The nodegroup's launch template is tagged along with its resources
+- Resources that already carry the tag value are skipped, and create_tags
+  is called in chunks of 1000 resource IDs
+
+Usage:
+    python nodegroup_tagger.py -c CLUSTER [CLUSTER ...] [-n NODEGROUP ...] -t TAG_VALUE [-d]
+
+Options:
+    -c, --cluster       One or more EKS cluster names
+    -n, --nodegroup     Nodegroup names (default: every nodegroup of the clusters)
+    -t, --tag-value     CostCenter tag value
+    --tag-key           Tag key (default: CostCenter)
+    -r, --region        AWS region (default: from the AWS configuration)
+    --profile           AWS profile name to use
+    --parallel          Number of nodegroups processed in parallel (default: 8)
+    -d, --dry-run       Log what would be tagged without tagging
+    --help              Show this help message and exit
+"""
+
+import argparse
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'common'))
+from aws_clients import ClientFactory
+
+logger = logging.getLogger(__name__)
+
+# Filter values accepted per describe call
+MAX_FILTER_VALUES = 200
+
+# Resource IDs accepted per create_tags call
+MAX_TAG_RESOURCES = 1000
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Tag the resources of EKS nodegroups with a CostCenter tag')
+    parser.add_argument('-c', '--cluster', nargs='+', required=True, help='EKS cluster name(s)')
+    parser.add_argument('-n', '--nodegroup', nargs='+', help='Nodegroup name(s) (default: all nodegroups)')
+    parser.add_argument('-t', '--tag-value', required=True, help='CostCenter tag value')
+    parser.add_argument('--tag-key', default='CostCenter', help='Tag key')
+    parser.add_argument('-r', '--region', help='AWS region')
+    parser.add_argument('--profile', help='AWS profile to use')
+    parser.add_argument('--parallel', type=int, default=8, help='Number of nodegroups processed in parallel')
+    parser.add_argument('-d', '--dry-run', action='store_true', help='Log what would be tagged without tagging')
+    return parser.parse_args()
+
+
+def setup_logging():
+    """Log to the console with timestamps, like AWS-NodeGroup-Tag.sh"""
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+
+def chunks(items, size):
+    """Split a list into lists of at most size items"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def has_tag(resource, key, value, tags_field='Tags'):
+    """Check whether a described resource already carries the tag value"""
+    return any(tag['Key'] == key and tag['Value'] == value for tag in resource.get(tags_field) or [])
+
+
+def list_nodegroups(eks_client, clusters, names=None):
+    """
+    Resolve the nodegroups to tag
+
+    Args:
+        eks_client (boto3.client): EKS client
+        clusters (list): Cluster names
+        names (list): Nodegroup names to keep, or None for all
+
+    Returns:
+        list: (cluster, nodegroup) tuples
+    """
+    nodegroups = []
+    found = set()
+    for cluster in clusters:
+        for page in eks_client.get_paginator('list_nodegroups').paginate(clusterName=cluster):
+            for nodegroup in page['nodegroups']:
+                if names is None or nodegroup in names:
+                    nodegroups.append((cluster, nodegroup))
+                    found.add(nodegroup)
+    for name in sorted(set(names or []) - found):
+        logger.warning(f"NodeGroup {name} not found in clusters: {', '.join(clusters)}")
+    return nodegroups
+
+
+def get_nodegroup_resources(ec2_client, eks_client, cluster, nodegroup, key, value):
+    """
+    Find the resources of a nodegroup that do not carry the tag value yet
+
+    Args:
+        ec2_client (boto3.client): EC2 client
+        eks_client (boto3.client): EKS client
+        cluster (str): Cluster name
+        nodegroup (str): Nodegroup name
+        key (str): Tag key
+        value (str): Tag value
+
+    Returns:
+        dict: Mapping of resource type to a list of untagged resource IDs
+    """
+    instances = []
+    paginator = ec2_client.get_paginator('describe_instances')
+    for page in paginator.paginate(Filters=[
+        {'Name': 'tag:eks:cluster-name', 'Values': [cluster]},
+        {'Name': 'tag:eks:nodegroup-name', 'Values': [nodegroup]},
+        {'Name': 'instance-state-name', 'Values': ['pending', 'running', 'stopping', 'stopped']}
+    ]):
+        for reservation in page['Reservations']:
+            instances.extend(reservation['Instances'])
+    instance_ids = [instance['InstanceId'] for instance in instances]
+
+    volumes = []
+    interfaces = []
+    for batch in chunks(instance_ids, MAX_FILTER_VALUES):
+        attached = [{'Name': 'attachment.instance-id', 'Values': batch}]
+        for page in ec2_client.get_paginator('describe_volumes').paginate(Filters=attached):
+            volumes.extend(page['Volumes'])
+        for page in ec2_client.get_paginator('describe_network_interfaces').paginate(Filters=attached):
+            interfaces.extend(page['NetworkInterfaces'])
+
+    resources = {
+        'Instance': [i['InstanceId'] for i in instances if not has_tag(i, key, value)],
+        'Volume': [v['VolumeId'] for v in volumes if not has_tag(v, key, value)],
+        'NetworkInterface': [n['NetworkInterfaceId'] for n in interfaces if not has_tag(n, key, value, 'TagSet')],
+        'LaunchTemplate': []
+    }
+
+    launch_template = eks_client.describe_nodegroup(clusterName=cluster, nodegroupName=nodegroup)['nodegroup'].get('launchTemplate')
+    if launch_template and launch_template.get('id'):
+        templates = ec2_client.describe_launch_templates(LaunchTemplateIds=[launch_template['id']])['LaunchTemplates']
+        resources['LaunchTemplate'] = [t['LaunchTemplateId'] for t in templates if not has_tag(t, key, value)]
+
+    return resources
+
+
+def tag_nodegroup(ec2_client, eks_client, cluster, nodegroup, key, value, dry_run=False):
+    """
+    Tag all resources of one nodegroup
+
+    Args:
+        ec2_client (boto3.client): EC2 client
+        eks_client (boto3.client): EKS client
+        cluster (str): Cluster name
+        nodegroup (str): Nodegroup name
+        key (str): Tag key
+        value (str): Tag value
+        dry_run (bool): Log what would be tagged without tagging
+
+    Returns:
+        dict: Mapping of resource type to the number of resources tagged
+    """
+    label = f"{cluster}/{nodegroup}"
+    resources = get_nodegroup_resources(ec2_client, eks_client, cluster, nodegroup, key, value)
+    if not any(resources.values()):
+        logger.info(f"{label}: all resources already tagged with {key}={value}")
+        return {resource_type: 0 for resource_type in resources}
+
+    for resource_type, resource_ids in resources.items():
+        if not resource_ids:
+            continue
+        if dry_run:
+            logger.info(f"[DRY RUN] {label}: would tag {len(resource_ids)} {resource_type} resources with {key}={value}")
+            continue
+        for batch in chunks(resource_ids, MAX_TAG_RESOURCES):
+            ec2_client.create_tags(Resources=batch, Tags=[{'Key': key, 'Value': value}])
+        logger.info(f"{label}: tagged {len(resource_ids)} {resource_type} resources")
+
+    return {resource_type: len(resource_ids) for resource_type, resource_ids in resources.items()}
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    setup_logging()
+
+    session = boto3.Session(profile_name=args.profile, region_name=args.region)
+    factory = ClientFactory(session, max_pool_connections=max(10, args.parallel))
+    ec2_client = factory.client('ec2')
+    eks_client = factory.client('eks')
+
+    try:
+        nodegroups = list_nodegroups(eks_client, args.cluster, args.nodegroup)
+    except (ClientError, BotoCoreError) as e:
+        logger.error(f"Error: Failed to list nodegroups: {str(e)}")
+        return 1
+    if not nodegroups:
+        logger.error("Error: No nodegroups found")
+        return 1
+    logger.info(f"Starting tagging process for {len(nodegroups)} nodegroups with {args.tag_key}={args.tag_value}")
+
+    totals = {}
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.parallel) as executor:
+        future_to_nodegroup = {
+            executor.submit(tag_nodegroup, ec2_client, eks_client, cluster, nodegroup,
+                            args.tag_key, args.tag_value, args.dry_run): f"{cluster}/{nodegroup}"
+            for cluster, nodegroup in nodegroups
+        }
+        for future in as_completed(future_to_nodegroup):
+            try:
+                counts = future.result()
+            except (ClientError, BotoCoreError) as e:
+                logger.error(f"Error: Failed to tag {future_to_nodegroup[future]}: {str(e)}")
+                failed += 1
+                continue
+            for resource_type, count in counts.items():
+                totals[resource_type] = totals.get(resource_type, 0) + count
+
+    action = 'Would tag' if args.dry_run else 'Tagged'
+    for resource_type, count in totals.items():
+        logger.info(f"{action} {count} {resource_type} resources")
+    if failed:
+        logger.error(f"Tagging failed for {failed} of {len(nodegroups)} nodegroups")
+        return 1
+    logger.info("Tagging process completed successfully")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ELB Inventory Collector
+
+This script generates the same CSV inventory as AWS-ELB-inventory.sh with far
+fewer API calls:
+
+- ARNs and security groups are kept from the paginated describe_load_balancers
+  listing instead of describing every load balancer again by name
+- Tags are fetched with describe_tags in batches of 20 ARNs
+- Target groups are fetched in a single paginated pass and joined to load
+  balancers by ARN
+- Only the listener lookups remain per load balancer, and they run
+  concurrently
+- With --snapshot-db, tags, target groups and listeners are only fetched for
+  new load balancers and load balancers whose listing changed; the rows of
+  every other load balancer come from the snapshot store
+
+Usage:
+    python elb_inventory.py --region REGION [--output FILE] [--profile PROFILE] [--parallel N]
+
+Options:
+    -r, --region        AWS region (required)
+    -o, --output        Output file (default: aws-elb-inventory_REGION_TIMESTAMP.csv)
+    --format            csv, jsonl, parquet or sqlite (default: from the output file extension)
+    --profile           AWS profile name to use
+    --parallel          Number of listener lookups to run in parallel (default: 8)
+    --snapshot-db       SQLite snapshot store enabling incremental runs
+    --refresh-after     Hours after which unchanged load balancers are fetched again (default: 168)
+    --help              Show this help message and exit
+"""
+
+import argparse
+import logging
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'common'))
+from inventory_writer import FORMAT_EXTENSIONS, write_rows
+from snapshot_store import SnapshotStore, fingerprint
+
+logger = logging.getLogger(__name__)
+
+CSV_HEADER = [
+    'Load Balancer Name', 'Type', 'Scheme', 'VPC ID', 'State', 'DNS Name',
+    'Created Time', 'AZ Count', 'Security Groups', 'Listeners', 'Target Groups', 'Tags'
+]
+
+# describe_tags accepts at most 20 resource ARNs per request
+TAG_BATCH_SIZE = 20
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Generate AWS Elastic Load Balancer inventory for specified region')
+    parser.add_argument('-r', '--region', required=True, help='AWS region')
+    parser.add_argument('-o', '--output', help='Output file (default: aws-elb-inventory_REGION_TIMESTAMP.csv)')
+    parser.add_argument('--format', choices=list(FORMAT_EXTENSIONS),
+                        help='Output format (default: from the output file extension, else csv)')
+    parser.add_argument('--profile', help='AWS profile to use')
+    parser.add_argument('--parallel', type=int, default=8, help='Number of listener lookups to run in parallel')
+    parser.add_argument('--snapshot-db', help='SQLite snapshot store enabling incremental runs')
+    parser.add_argument('--refresh-after', type=float, default=168,
+                        help='Hours after which unchanged load balancers are fetched again')
+    return parser.parse_args()
+
+
+def setup_logging():
+    """Log to the console and to a timestamped log file"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(f"elb_inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+        ]
+    )
+
+
+def get_load_balancers(elb_client):
+    """
+    Get all load balancers in the region
+
+    Args:
+        elb_client (boto3.client): ELBv2 client
+
+    Returns:
+        list: Load balancer dictionaries
+    """
+    load_balancers = []
+    paginator = elb_client.get_paginator('describe_load_balancers')
+    for page in paginator.paginate():
+        load_balancers.extend(page['LoadBalancers'])
+
+    logger.info(f"Found {len(load_balancers)} load balancers")
+    return load_balancers
+
+
+def get_tags(elb_client, arns):
+    """
+    Get tags for load balancers in batches of 20 ARNs
+
+    Args:
+        elb_client (boto3.client): ELBv2 client
+        arns (list): Load balancer ARNs
+
+    Returns:
+        dict: Mapping of ARN to formatted tags
+    """
+    tags = {}
+    for i in range(0, len(arns), TAG_BATCH_SIZE):
+        batch = arns[i:i + TAG_BATCH_SIZE]
+        try:
+            response = elb_client.describe_tags(ResourceArns=batch)
+        except ClientError as e:
+            logger.warning(f"Unable to get tags for {len(batch)} load balancers: {str(e)}")
+            continue
+        for description in response['TagDescriptions']:
+            tags[description['ResourceArn']] = ','.join(
+                f"{tag['Key']}={tag['Value']}" for tag in description.get('Tags', [])
+            )
+    return tags
+
+
+def get_target_groups(elb_client):
+    """
+    Get target group names for every load balancer with one paginated pass
+
+    Args:
+        elb_client (boto3.client): ELBv2 client
+
+    Returns:
+        dict: Mapping of load balancer ARN to a list of target group names
+    """
+    target_groups = defaultdict(list)
+    paginator = elb_client.get_paginator('describe_target_groups')
+    for page in paginator.paginate():
+        for target_group in page['TargetGroups']:
+            for lb_arn in target_group.get('LoadBalancerArns', []):
+                target_groups[lb_arn].append(target_group['TargetGroupName'])
+    return target_groups
+
+
+def get_listeners(elb_client, lb_arn):
+    """
+    Get the listeners of a load balancer formatted as PROTOCOL:PORT
+
+    Args:
+        elb_client (boto3.client): ELBv2 client
+        lb_arn (str): Load balancer ARN
+
+    Returns:
+        str: Comma-separated listeners, or 'None' if the lookup failed
+    """
+    try:
+        listeners = []
+        paginator = elb_client.get_paginator('describe_listeners')
+        for page in paginator.paginate(LoadBalancerArn=lb_arn):
+            listeners.extend(f"{listener['Protocol']}:{listener['Port']}" for listener in page['Listeners'])
+        return ','.join(listeners)
+    except ClientError as e:
+        logger.warning(f"Unable to get listeners for {lb_arn}: {str(e)}")
+        return 'None'
+
+
+def build_row(load_balancer, listeners, target_groups, tags):
+    """
+    Build a CSV row for a load balancer
+
+    Args:
+        load_balancer (dict): Load balancer dictionary
+        listeners (str): Formatted listeners
+        target_groups (list): Target group names
+        tags (str): Formatted tags
+
+    Returns:
+        list: CSV row matching CSV_HEADER
+    """
+    security_groups = 'N/A'
+    if load_balancer['Type'] == 'application':
+        security_groups = ','.join(load_balancer.get('SecurityGroups', []))
+
+    created_time = load_balancer.get('CreatedTime')
+    return [
+        load_balancer['LoadBalancerName'],
+        load_balancer['Type'],
+        load_balancer.get('Scheme') or 'N/A',
+        load_balancer.get('VpcId') or 'N/A',
+        load_balancer.get('State', {}).get('Code', ''),
+        load_balancer.get('DNSName', ''),
+        created_time.isoformat() if created_time else '',
+        len(load_balancer.get('AvailabilityZones', [])),
+        security_groups,
+        listeners,
+        ','.join(target_groups),
+        tags
+    ]
+
+
+def collect_elb_inventory(elb_client, parallel=8, store=None):
+    """
+    Collect ELB inventory rows for the client's region
+
+    Args:
+        elb_client (boto3.client): ELBv2 client
+        parallel (int): Number of listener lookups to run in parallel
+        store (SnapshotStore): Snapshot store for incremental runs, or None
+
+    Returns:
+        list: CSV rows matching CSV_HEADER
+    """
+    load_balancers = get_load_balancers(elb_client)
+
+    rows = []
+    if store is not None:
+        scope = elb_client.meta.region_name
+        fingerprints = {lb['LoadBalancerArn']: fingerprint(lb) for lb in load_balancers}
+        stale = store.stale('elb', scope, fingerprints)
+        rows = store.rows('elb', scope, [arn for arn in fingerprints if arn not in stale])
+        store.prune('elb', scope, fingerprints)
+        load_balancers = [lb for lb in load_balancers if lb['LoadBalancerArn'] in stale]
+
+    if not load_balancers:
+        return rows
+
+    arns = [lb['LoadBalancerArn'] for lb in load_balancers]
+    tags = get_tags(elb_client, arns)
+    target_groups = get_target_groups(elb_client)
+
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        listeners = list(executor.map(lambda arn: get_listeners(elb_client, arn), arns))
+
+    for lb, lb_listeners in zip(load_balancers, listeners):
+        arn = lb['LoadBalancerArn']
+        row = build_row(lb, lb_listeners, target_groups.get(arn, []), tags.get(arn, ''))
+        if store is not None:
+            store.save('elb', scope, arn, fingerprints[arn], [row])
+        rows.append(row)
+    return rows
+
+
+def write_output(rows, output_file, fmt=None):
+    """
+    Write inventory rows to a CSV, JSONL, Parquet or SQLite file
+
+    Args:
+        rows (list): Rows matching CSV_HEADER
+        output_file (str): Output file path
+        fmt (str): Output format, detected from the file extension if None
+
+    Returns:
+        int: Number of rows written
+    """
+    return write_rows(rows, output_file, CSV_HEADER, fmt)
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    setup_logging()
+    extension = FORMAT_EXTENSIONS[args.format or 'csv']
+    output_file = args.output or f"aws-elb-inventory_{args.region}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
+
+    logger.info(f"Starting ELB inventory for region: {args.region}")
+    store = SnapshotStore(args.snapshot_db, args.refresh_after * 3600) if args.snapshot_db else None
+    try:
+        session = boto3.Session(profile_name=args.profile, region_name=args.region)
+        elb_client = session.client('elbv2', config=Config(max_pool_connections=max(10, args.parallel)))
+        rows = collect_elb_inventory(elb_client, args.parallel, store)
+    except ClientError as e:
+        logger.error(f"Error collecting ELB inventory: {str(e)}")
+        return 1
+    finally:
+        if store is not None:
+            store.close()
+
+    write_output(rows, output_file, args.format)
+    logger.info(f"Inventory complete! {len(rows)} load balancers saved to: {output_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
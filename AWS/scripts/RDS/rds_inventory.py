@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+RDS Inventory Collector
+
+This script generates the same CSV inventory as AWS-RDS-inventory.sh using a
+single paginated describe_db_instances pass. Backup retention and tags are
+read from that response instead of being fetched again for every instance.
+
+Usage:
+    python rds_inventory.py --region REGION [--output FILE] [--profile PROFILE]
+
+Options:
+    -r, --region    AWS region (required)
+    -o, --output    Output file (default: aws-rds-inventory_REGION_TIMESTAMP.csv)
+    --format        csv, jsonl, parquet or sqlite (default: from the output file extension)
+    --profile       AWS profile name to use
+    --help          Show this help message and exit
+"""
+
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime
+
+import boto3
+from botocore.exceptions import ClientError
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'common'))
+from inventory_writer import FORMAT_EXTENSIONS, write_rows
+
+logger = logging.getLogger(__name__)
+
+CSV_HEADER = [
+    'DB Instance ID', 'DB Instance Class', 'Engine', 'Engine Version', 'Status',
+    'Storage Type', 'Storage Size (GB)', 'Multi-AZ', 'Publicly Accessible',
+    'Endpoint', 'Port', 'Creation Time', 'Backup Retention', 'Tags'
+]
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Generate AWS RDS instance inventory for specified region')
+    parser.add_argument('-r', '--region', required=True, help='AWS region')
+    parser.add_argument('-o', '--output', help='Output file (default: aws-rds-inventory_REGION_TIMESTAMP.csv)')
+    parser.add_argument('--format', choices=list(FORMAT_EXTENSIONS),
+                        help='Output format (default: from the output file extension, else csv)')
+    parser.add_argument('--profile', help='AWS profile to use')
+    return parser.parse_args()
+
+
+def setup_logging():
+    """Log to the console and to a timestamped log file"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(f"rds_inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+        ]
+    )
+
+
+def build_row(db_instance):
+    """
+    Build a CSV row for a DB instance
+
+    Args:
+        db_instance (dict): RDS DB instance dictionary
+
+    Returns:
+        list: CSV row matching CSV_HEADER
+    """
+    endpoint = db_instance.get('Endpoint', {})
+    creation_time = db_instance.get('InstanceCreateTime')
+    tags = ','.join(f"{tag['Key']}={tag['Value']}" for tag in db_instance.get('TagList', []))
+
+    return [
+        db_instance['DBInstanceIdentifier'],
+        db_instance.get('DBInstanceClass', ''),
+        db_instance.get('Engine', ''),
+        db_instance.get('EngineVersion', ''),
+        db_instance.get('DBInstanceStatus', ''),
+        db_instance.get('StorageType', ''),
+        db_instance.get('AllocatedStorage', ''),
+        str(db_instance.get('MultiAZ', False)).lower(),
+        str(db_instance.get('PubliclyAccessible', False)).lower(),
+        endpoint.get('Address') or 'N/A',
+        endpoint.get('Port') or 'N/A',
+        creation_time.isoformat() if creation_time else '',
+        db_instance.get('BackupRetentionPeriod', ''),
+        tags
+    ]
+
+
+def collect_rds_inventory(rds_client):
+    """
+    Collect RDS inventory rows for the client's region
+
+    Args:
+        rds_client (boto3.client): RDS client
+
+    Returns:
+        list: CSV rows matching CSV_HEADER
+    """
+    rows = []
+    paginator = rds_client.get_paginator('describe_db_instances')
+    for page in paginator.paginate():
+        rows.extend(build_row(db_instance) for db_instance in page['DBInstances'])
+
+    logger.info(f"Found {len(rows)} RDS instances")
+    return rows
+
+
+def write_output(rows, output_file, fmt=None):
+    """
+    Write inventory rows to a CSV, JSONL, Parquet or SQLite file
+
+    Args:
+        rows (list): Rows matching CSV_HEADER
+        output_file (str): Output file path
+        fmt (str): Output format, detected from the file extension if None
+
+    Returns:
+        int: Number of rows written
+    """
+    return write_rows(rows, output_file, CSV_HEADER, fmt)
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    setup_logging()
+    extension = FORMAT_EXTENSIONS[args.format or 'csv']
+    output_file = args.output or f"aws-rds-inventory_{args.region}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
+
+    logger.info(f"Starting RDS inventory for region: {args.region}")
+    try:
+        session = boto3.Session(profile_name=args.profile, region_name=args.region)
+        rows = collect_rds_inventory(session.client('rds'))
+    except ClientError as e:
+        logger.error(f"Error collecting RDS inventory: {str(e)}")
+        return 1
+
+    write_output(rows, output_file, args.format)
+    logger.info(f"Inventory complete! Output saved to: {output_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Route53 Inventory Collector
+
+This script generates the same CSV inventory as AWS-Route53-inventory.sh while
+staying within the Route53 limit of 5 requests per second per account:
+
+- Each zone's record sets are read once, as a streaming paginated generator,
+  and the NS records, SOA record and (with --details) every record come from
+  that single pass. Without --details the pass stops as soon as the apex NS
+  and SOA records have been seen
+- Tags are fetched with list_tags_for_resources, 10 zones per call
+- Zones are processed concurrently on a client from the shared client
+  factory, whose token bucket keeps all Route53 calls under --rate and backs
+  off on throttling, and rows are streamed to the output file as they are
+  produced
+- With --snapshot-db, record sets are only read for new zones and zones whose
+  listing (including record count) or tags changed; the rows of every other
+  zone come from the snapshot store
+
+Usage:
+    python route53_inventory.py [--output FILE] [--details] [--profile PROFILE]
+
+Options:
+    -o, --output        Output file (default: aws-route53-inventory_TIMESTAMP.csv)
+    --format            csv, jsonl, parquet or sqlite (default: from the output file extension)
+    -d, --details       Include one row per record
+    --profile           AWS profile name to use
+    --parallel          Number of zones to process in parallel (default: 4)
+    --rate              Maximum Route53 requests per second (default: 5)
+    --snapshot-db       SQLite snapshot store enabling incremental runs
+    --refresh-after     Hours after which unchanged zones are read again (default: 168)
+    --help              Show this help message and exit
+"""
+
+import argparse
+import logging
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import boto3
+from botocore.exceptions import ClientError
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'common'))
+from aws_clients import ClientFactory
+from inventory_writer import FORMAT_EXTENSIONS, write_rows
+from snapshot_store import SnapshotStore, fingerprint
+
+logger = logging.getLogger(__name__)
+
+ZONE_HEADER = [
+    'Zone ID', 'Zone Name', 'Private Zone', 'Record Count', 'Comment',
+    'NS Records', 'SOA Record', 'Tags'
+]
+RECORD_HEADER = ZONE_HEADER + [
+    'Record Name', 'Record Type', 'Record Value', 'Record TTL', 'Routing Policy'
+]
+
+# list_tags_for_resources accepts at most 10 hosted zones per request
+TAG_BATCH_SIZE = 10
+
+# Marks the end of a zone worker's output on the row queue
+_ZONE_DONE = object()
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Generate AWS Route53 hosted zones inventory')
+    parser.add_argument('-o', '--output', help='Output file (default: aws-route53-inventory_TIMESTAMP.csv)')
+    parser.add_argument('-d', '--details', action='store_true', help='Include record details')
+    parser.add_argument('--format', choices=list(FORMAT_EXTENSIONS),
+                        help='Output format (default: from the output file extension, else csv)')
+    parser.add_argument('--profile', help='AWS profile to use')
+    parser.add_argument('--parallel', type=int, default=4, help='Number of zones to process in parallel')
+    parser.add_argument('--rate', type=float, default=5, help='Maximum Route53 requests per second')
+    parser.add_argument('--snapshot-db', help='SQLite snapshot store enabling incremental runs')
+    parser.add_argument('--refresh-after', type=float, default=168,
+                        help='Hours after which unchanged zones are read again')
+    return parser.parse_args()
+
+
+def setup_logging():
+    """Log to the console and to a timestamped log file"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(f"route53_inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+        ]
+    )
+
+
+def list_hosted_zones(route53_client):
+    """
+    List all hosted zones
+
+    Args:
+        route53_client (boto3.client): Route53 client
+
+    Returns:
+        list: Hosted zone dictionaries
+    """
+    zones = []
+    kwargs = {}
+    while True:
+        response = route53_client.list_hosted_zones(**kwargs)
+        zones.extend(response['HostedZones'])
+        if not response.get('IsTruncated'):
+            break
+        kwargs['Marker'] = response['NextMarker']
+
+    logger.info(f"Found {len(zones)} hosted zones")
+    return zones
+
+
+def get_zone_tags(route53_client, zone_ids):
+    """
+    Get tags for hosted zones, 10 zones per call
+
+    Args:
+        route53_client (boto3.client): Route53 client
+        zone_ids (list): Hosted zone IDs without the /hostedzone/ prefix
+
+    Returns:
+        dict: Mapping of zone ID to formatted tags
+    """
+    tags = {}
+    for i in range(0, len(zone_ids), TAG_BATCH_SIZE):
+        batch = zone_ids[i:i + TAG_BATCH_SIZE]
+        try:
+            response = route53_client.list_tags_for_resources(ResourceType='hostedzone', ResourceIds=batch)
+        except ClientError as e:
+            logger.warning(f"Unable to get tags for {len(batch)} zones: {str(e)}")
+            continue
+        for tag_set in response['ResourceTagSets']:
+            tags[tag_set['ResourceId']] = ','.join(
+                f"{tag['Key']}={tag['Value']}" for tag in tag_set.get('Tags', [])
+            )
+    return tags
+
+
+def iter_record_sets(route53_client, zone_id):
+    """
+    Stream all record sets of a zone, one page at a time
+
+    Args:
+        route53_client (boto3.client): Route53 client
+        zone_id (str): Hosted zone ID
+
+    Yields:
+        dict: Resource record set dictionaries
+    """
+    kwargs = {'HostedZoneId': zone_id, 'MaxItems': '300'}
+    while True:
+        response = route53_client.list_resource_record_sets(**kwargs)
+        yield from response['ResourceRecordSets']
+        if not response.get('IsTruncated'):
+            return
+        kwargs['StartRecordName'] = response['NextRecordName']
+        kwargs['StartRecordType'] = response['NextRecordType']
+        if 'NextRecordIdentifier' in response:
+            kwargs['StartRecordIdentifier'] = response['NextRecordIdentifier']
+        else:
+            kwargs.pop('StartRecordIdentifier', None)
+
+
+def record_values(record_set):
+    """Return the values of a record set"""
+    return [record['Value'] for record in record_set.get('ResourceRecords', [])]
+
+
+def record_row(record_set):
+    """
+    Build the record columns of a detail row
+
+    Args:
+        record_set (dict): Resource record set dictionary
+
+    Returns:
+        list: Record Name, Record Type, Record Value, Record TTL, Routing Policy
+    """
+    values = record_values(record_set)
+    return [
+        record_set['Name'],
+        record_set['Type'],
+        values[0] if values else 'See Route53 Console',
+        record_set.get('TTL', 'N/A'),
+        'Traffic Policy' if record_set.get('TrafficPolicyInstanceId') else 'Simple'
+    ]
+
+
+def zone_row(zone, zone_id, ns_records, soa_record, tags):
+    """Build the zone columns shared by zone and detail rows"""
+    config = zone.get('Config', {})
+    return [
+        zone_id,
+        zone['Name'],
+        str(config.get('PrivateZone', False)).lower(),
+        zone.get('ResourceRecordSetCount', ''),
+        config.get('Comment') or 'N/A',
+        ns_records or 'None',
+        soa_record or 'None',
+        tags.get(zone_id, '')
+    ]
+
+
+def process_zone(route53_client, zone, tags, include_records, emit):
+    """
+    Read a zone's record sets once and emit its rows
+
+    The zone columns (NS and SOA) are only known once the apex records have
+    been read. Route53 returns apex records first, so detail rows are held
+    back only until then and streamed afterwards.
+
+    Args:
+        route53_client (boto3.client): Route53 client
+        zone (dict): Hosted zone dictionary
+        tags (dict): Mapping of zone ID to formatted tags
+        include_records (bool): Emit one row per record instead of one per zone
+        emit (callable): Called with every output row
+    """
+    zone_id = zone['Id'].split('/')[-1]
+    zone_name = zone['Name']
+    ns_records = None
+    soa_record = None
+    pending = []
+    zone_columns = None
+
+    for record_set in iter_record_sets(route53_client, zone_id):
+        if record_set['Name'] == zone_name and record_set['Type'] == 'NS':
+            ns_records = ','.join(record_values(record_set))
+        elif record_set['Name'] == zone_name and record_set['Type'] == 'SOA':
+            soa_record = ' '.join(record_values(record_set))
+
+        if not include_records:
+            if ns_records is not None and soa_record is not None:
+                break
+            continue
+
+        if zone_columns is None:
+            pending.append(record_set)
+            if ns_records is not None and soa_record is not None:
+                zone_columns = zone_row(zone, zone_id, ns_records, soa_record, tags)
+                for pending_set in pending:
+                    emit(zone_columns + record_row(pending_set))
+                pending = []
+        else:
+            emit(zone_columns + record_row(record_set))
+
+    zone_columns = zone_columns or zone_row(zone, zone_id, ns_records, soa_record, tags)
+    if include_records:
+        for pending_set in pending:
+            emit(zone_columns + record_row(pending_set))
+    else:
+        emit(zone_columns)
+    logger.info(f"Processed zone: {zone_name}")
+
+
+def collect_route53_inventory(route53_client, include_records=False, parallel=4, store=None):
+    """
+    Process all hosted zones concurrently and yield rows as they are produced
+
+    Route53 allows 5 requests per second per account, so the client should
+    come from a ClientFactory, which rate limits all of its calls together.
+
+    Args:
+        route53_client (boto3.client): Route53 client
+        include_records (bool): Yield one row per record instead of one per zone
+        parallel (int): Number of zones to process in parallel
+        store (SnapshotStore): Snapshot store for incremental runs, or None
+
+    Yields:
+        list: CSV rows matching RECORD_HEADER or ZONE_HEADER
+    """
+    zones = list_hosted_zones(route53_client)
+    zone_ids = [zone['Id'].split('/')[-1] for zone in zones]
+    tags = get_zone_tags(route53_client, zone_ids) if zones else {}
+
+    # Detail and summary rows of the same zone are stored separately
+    scope = 'details' if include_records else 'zones'
+    fingerprints = {}
+    if store is not None:
+        fingerprints = {
+            zone_id: fingerprint([zone, tags.get(zone_id)])
+            for zone_id, zone in zip(zone_ids, zones)
+        }
+        stale = store.stale('route53', scope, fingerprints)
+        yield from store.rows('route53', scope, [zone_id for zone_id in zone_ids if zone_id not in stale])
+        store.prune('route53', scope, fingerprints)
+        zones = [zone for zone_id, zone in zip(zone_ids, zones) if zone_id in stale]
+
+    if not zones:
+        return
+
+    # Bounded so that large zones cannot outrun the writer
+    rows = queue.Queue(maxsize=10000)
+    cancelled = threading.Event()
+
+    def emit(row):
+        if cancelled.is_set():
+            raise RuntimeError('Inventory cancelled')
+        rows.put(row)
+
+    def worker(zone):
+        zone_rows = []
+
+        def emit_and_keep(row):
+            emit(row)
+            zone_rows.append(row)
+
+        try:
+            process_zone(route53_client, zone, tags, include_records,
+                         emit if store is None else emit_and_keep)
+            if store is not None:
+                zone_id = zone['Id'].split('/')[-1]
+                store.save('route53', scope, zone_id, fingerprints[zone_id], zone_rows)
+        except Exception as e:
+            if not cancelled.is_set():
+                logger.error(f"Error processing zone {zone['Name']}: {str(e)}")
+        finally:
+            rows.put(_ZONE_DONE)
+
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        for zone in zones:
+            executor.submit(worker, zone)
+
+        remaining = len(zones)
+        try:
+            while remaining:
+                row = rows.get()
+                if row is _ZONE_DONE:
+                    remaining -= 1
+                else:
+                    yield row
+        finally:
+            # If the consumer stopped early, unblock the workers so they can exit
+            cancelled.set()
+            while remaining:
+                if rows.get() is _ZONE_DONE:
+                    remaining -= 1
+
+
+def write_output(rows, output_file, include_records=False, fmt=None):
+    """
+    Stream inventory rows to a CSV, JSONL, Parquet or SQLite file as they are produced
+
+    Args:
+        rows (iterable): Rows matching RECORD_HEADER or ZONE_HEADER
+        output_file (str): Output file path
+        include_records (bool): Whether rows include record details
+        fmt (str): Output format, detected from the file extension if None
+
+    Returns:
+        int: Number of rows written
+    """
+    return write_rows(rows, output_file, RECORD_HEADER if include_records else ZONE_HEADER, fmt)
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    setup_logging()
+    extension = FORMAT_EXTENSIONS[args.format or 'csv']
+    output_file = args.output or f"aws-route53-inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
+
+    logger.info("Starting Route53 inventory...")
+    session = boto3.Session(profile_name=args.profile)
+    factory = ClientFactory(session, rates={'route53': args.rate}, max_pool_connections=max(10, args.parallel))
+    route53_client = factory.client('route53')
+
+    store = SnapshotStore(args.snapshot_db, args.refresh_after * 3600) if args.snapshot_db else None
+    try:
+        rows = collect_route53_inventory(route53_client, args.details, args.parallel, store)
+        count = write_output(rows, output_file, args.details, args.format)
+    except ClientError as e:
+        logger.error(f"Error collecting Route53 inventory: {str(e)}")
+        return 1
+    finally:
+        if store is not None:
+            store.close()
+
+    logger.info(f"Inventory complete! {count} rows saved to: {output_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+S3 Inventory Collector
+
+This script generates the same CSV inventory as AWS-S3-inventory.sh, but runs
+the per-bucket probes (location, versioning, encryption, public access block
+and tagging) in a bounded thread pool:
+
+- The bucket location is looked up once, then every other probe goes to a
+  client for the bucket's own region so no call pays for a redirect
+- One client is kept per region and shared by all workers
+- Rows are streamed to the output file as each bucket finishes
+- With --snapshot-db, only new buckets and buckets whose listing changed are
+  probed again; the rows of every other bucket come from the snapshot store
+
+Usage:
+    python s3_inventory.py [--output FILE] [--profile PROFILE] [--parallel N]
+
+Options:
+    -o, --output        Output file (default: aws-s3-inventory_TIMESTAMP.csv)
+    --format            csv, jsonl, parquet or sqlite (default: from the output file extension)
+    --profile           AWS profile name to use
+    --parallel          Number of buckets to probe in parallel (default: 16)
+    --snapshot-db       SQLite snapshot store enabling incremental runs
+    --refresh-after     Hours after which unchanged buckets are probed again (default: 168)
+    --metrics-json      Write per-operation API call metrics to a JSON file
+    --metrics-prom      Write per-operation API call metrics to a Prometheus textfile
+    --help              Show this help message and exit
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'common'))
+from api_metrics import ApiMetrics
+from inventory_writer import FORMAT_EXTENSIONS, write_rows
+from snapshot_store import SnapshotStore, fingerprint
+
+logger = logging.getLogger(__name__)
+
+CSV_HEADER = [
+    'Bucket Name', 'Creation Date', 'Region', 'Versioning', 'Encryption',
+    'Public Access Blocked', 'Tags'
+]
+
+# Region used for list_buckets and get_bucket_location, which work from any region
+DEFAULT_REGION = 'us-east-1'
+
+# Legacy LocationConstraint values and what they map to
+LEGACY_LOCATIONS = {
+    None: 'us-east-1',
+    '': 'us-east-1',
+    'EU': 'eu-west-1'
+}
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Generate AWS S3 bucket inventory')
+    parser.add_argument('-o', '--output', help='Output file (default: aws-s3-inventory_TIMESTAMP.csv)')
+    parser.add_argument('--format', choices=list(FORMAT_EXTENSIONS),
+                        help='Output format (default: from the output file extension, else csv)')
+    parser.add_argument('--profile', help='AWS profile to use')
+    parser.add_argument('--parallel', type=int, default=16, help='Number of buckets to probe in parallel')
+    parser.add_argument('--snapshot-db', help='SQLite snapshot store enabling incremental runs')
+    parser.add_argument('--refresh-after', type=float, default=168,
+                        help='Hours after which unchanged buckets are probed again')
+    parser.add_argument('--metrics-json', help='Write per-operation API call metrics to a JSON file')
+    parser.add_argument('--metrics-prom', help='Write per-operation API call metrics to a Prometheus textfile')
+    return parser.parse_args()
+
+
+def setup_logging():
+    """Log to the console and to a timestamped log file"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(f"s3_inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+        ]
+    )
+
+
+class RegionalClients:
+    """
+    Thread-safe cache of one S3 client per region, created from one session
+
+    Args:
+        session (boto3.Session): Session used to create clients
+        max_pool_connections (int): Connection pool size of each client
+    """
+
+    def __init__(self, session, max_pool_connections=16):
+        self.session = session
+        self.config = Config(max_pool_connections=max_pool_connections)
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, region):
+        with self._lock:
+            if region not in self._clients:
+                self._clients[region] = self.session.client('s3', region_name=region, config=self.config)
+            return self._clients[region]
+
+
+def list_buckets(s3_client):
+    """
+    List all buckets in the account
+
+    Args:
+        s3_client (boto3.client): S3 client
+
+    Returns:
+        list: Bucket dictionaries with Name and CreationDate
+    """
+    if s3_client.can_paginate('list_buckets'):
+        buckets = []
+        for page in s3_client.get_paginator('list_buckets').paginate():
+            buckets.extend(page['Buckets'])
+        return buckets
+    return s3_client.list_buckets()['Buckets']
+
+
+def get_bucket_region(s3_client, bucket_name):
+    """Get the region a bucket lives in"""
+    location = s3_client.get_bucket_location(Bucket=bucket_name).get('LocationConstraint')
+    return LEGACY_LOCATIONS.get(location, location)
+
+
+def probe_bucket(bucket, get_client):
+    """
+    Run all probes for a single bucket
+
+    Args:
+        bucket (dict): Bucket dictionary with Name and CreationDate
+        get_client (callable): Returns the S3 client for a region
+
+    Returns:
+        list: CSV row matching CSV_HEADER
+    """
+    bucket_name = bucket['Name']
+    region = get_bucket_region(get_client(DEFAULT_REGION), bucket_name)
+    s3_client = get_client(region)
+
+    versioning = s3_client.get_bucket_versioning(Bucket=bucket_name).get('Status') or 'Disabled'
+
+    encryption = 'Disabled'
+    try:
+        s3_client.get_bucket_encryption(Bucket=bucket_name)
+        encryption = 'Enabled'
+    except ClientError:
+        pass
+
+    public_access = 'Enabled'
+    try:
+        s3_client.get_public_access_block(Bucket=bucket_name)
+    except ClientError:
+        public_access = 'Disabled'
+
+    tags = ''
+    try:
+        tag_set = s3_client.get_bucket_tagging(Bucket=bucket_name)['TagSet']
+        tags = ','.join(f"{tag['Key']}={tag['Value']}" for tag in tag_set)
+    except ClientError:
+        pass
+
+    creation_date = bucket.get('CreationDate')
+    return [
+        bucket_name,
+        creation_date.isoformat() if creation_date else '',
+        region,
+        versioning,
+        encryption,
+        public_access,
+        tags
+    ]
+
+
+def collect_s3_inventory(get_client, parallel=16, store=None):
+    """
+    Probe all buckets concurrently and yield rows as each bucket finishes
+
+    Args:
+        get_client (callable): Returns the S3 client for a region
+        parallel (int): Number of buckets to probe in parallel
+        store (SnapshotStore): Snapshot store for incremental runs, or None
+
+    Yields:
+        list: CSV rows matching CSV_HEADER, in completion order
+    """
+    buckets = list_buckets(get_client(DEFAULT_REGION))
+
+    fingerprints = {}
+    if store is not None:
+        fingerprints = {bucket['Name']: fingerprint(bucket) for bucket in buckets}
+        stale = store.stale('s3', 'global', fingerprints)
+        yield from store.rows('s3', 'global', [name for name in fingerprints if name not in stale])
+        store.prune('s3', 'global', fingerprints)
+        buckets = [bucket for bucket in buckets if bucket['Name'] in stale]
+
+    logger.info(f"Found {len(buckets)} buckets to probe, probing with {parallel} workers")
+
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        future_to_bucket = {
+            executor.submit(probe_bucket, bucket, get_client): bucket['Name']
+            for bucket in buckets
+        }
+        for future in as_completed(future_to_bucket):
+            bucket_name = future_to_bucket[future]
+            try:
+                row = future.result()
+            except Exception as e:
+                logger.error(f"Error probing bucket {bucket_name}: {str(e)}")
+                continue
+            if store is not None:
+                store.save('s3', 'global', bucket_name, fingerprints[bucket_name], [row])
+            yield row
+
+
+def write_output(rows, output_file, fmt=None):
+    """
+    Stream inventory rows to a CSV, JSONL, Parquet or SQLite file as they are produced
+
+    Args:
+        rows (iterable): Rows matching CSV_HEADER
+        output_file (str): Output file path
+        fmt (str): Output format, detected from the file extension if None
+
+    Returns:
+        int: Number of rows written
+    """
+    return write_rows(rows, output_file, CSV_HEADER, fmt,
+                      on_row=lambda row: logger.info(f"Processed bucket: {row[0]}"))
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    setup_logging()
+    extension = FORMAT_EXTENSIONS[args.format or 'csv']
+    output_file = args.output or f"aws-s3-inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
+
+    logger.info("Starting S3 bucket inventory...")
+    session = boto3.Session(profile_name=args.profile)
+    metrics = ApiMetrics('s3_inventory')
+    metrics.attach(session)
+    get_client = RegionalClients(session, max_pool_connections=args.parallel)
+    store = SnapshotStore(args.snapshot_db, args.refresh_after * 3600) if args.snapshot_db else None
+
+    try:
+        count = write_output(collect_s3_inventory(get_client, args.parallel, store), output_file, args.format)
+    except ClientError as e:
+        logger.error(f"Error collecting S3 inventory: {str(e)}")
+        return 1
+    finally:
+        if store is not None:
+            store.close()
+        metrics.log_summary()
+        metrics.write(args.metrics_json, args.metrics_prom)
+
+    logger.info(f"Inventory complete! {count} buckets saved to: {output_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Offline Benchmark for the AWS Python Tools
+
+This script runs the EC2, S3, ELB, RDS and Route53 inventories,
+downgrade_instances.py and restart_containers.py against the in-memory
+backend in fake_aws.py and reports, per tool and fleet size:
+
+- API calls, in total and per operation
+- Wall time, with the injected per-call latency
+- Peak memory (maximum resident set size)
+
+Every tool and fleet size runs in its own Python process, so peak memory is
+measured per run and module-level state does not leak between runs. Fixed
+waits in the tools (poll intervals, the 5 second spacing of the restart
+script) are shortened by --sleep-scale so that runs are dominated by API
+calls. With --baseline, the results are compared with a previous --output
+file and the exit code is non-zero if a run regressed beyond the limits.
+
+Usage:
+    python benchmark.py [--tools TOOL ...] [--sizes N ...] [--output FILE] [--baseline FILE]
+
+Options:
+    -t, --tools             Tools to benchmark (default: all)
+    -n, --sizes             Fleet sizes (default: 10 1000 10000)
+    --latency               Milliseconds added to every API call (default: 20)
+    --latency-per-item      Milliseconds added per item an API call returns (default: 0.02)
+    --sleep-scale           Factor applied to fixed waits in the tools (default: 0.01)
+    --timeout               Seconds before a single run is aborted (default: 900)
+    -o, --output            Write the results to a JSON file
+    --baseline              Compare with the results of a previous --output file
+    --max-call-increase     Allowed increase in API calls, in percent (default: 0)
+    --max-time-increase     Allowed increase in wall time, in percent (default: 25)
+    --max-memory-increase   Allowed increase in peak memory, in percent (default: 25)
+    --help                  Show this help message and exit
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.append(os.path.join(SCRIPTS_DIR, '..', '..', 'common'))
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [10, 1000, 10000]
+
+# Differences below these are treated as noise when checking regressions
+MIN_TIME_INCREASE = 0.5
+MIN_MEMORY_INCREASE = 5.0
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Benchmark the AWS Python tools against an in-memory AWS backend')
+    parser.add_argument('-t', '--tools', nargs='+', choices=list(TOOLS), default=list(TOOLS), help='Tools to benchmark')
+    parser.add_argument('-n', '--sizes', nargs='+', type=int, default=DEFAULT_SIZES, help='Fleet sizes')
+    parser.add_argument('--latency', type=float, default=20, help='Milliseconds added to every API call')
+    parser.add_argument('--latency-per-item', type=float, default=0.02,
+                        help='Milliseconds added per item an API call returns')
+    parser.add_argument('--sleep-scale', type=float, default=0.01, help='Factor applied to fixed waits in the tools')
+    parser.add_argument('--timeout', type=int, default=900, help='Seconds before a single run is aborted')
+    parser.add_argument('-o', '--output', help='Write the results to a JSON file')
+    parser.add_argument('--baseline', help='Compare with the results of a previous --output file')
+    parser.add_argument('--max-call-increase', type=float, default=0, help='Allowed increase in API calls, in percent')
+    parser.add_argument('--max-time-increase', type=float, default=25, help='Allowed increase in wall time, in percent')
+    parser.add_argument('--max-memory-increase', type=float, default=25,
+                        help='Allowed increase in peak memory, in percent')
+    parser.add_argument('--worker', nargs=3, metavar=('TOOL', 'SIZE', 'RESULT_FILE'), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def setup_logging():
+    """Log to the console"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def load_module(name, relative_path):
+    """Load a tool module from the scripts directory"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPTS_DIR, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class ScaledTime:
+    """Stand-in for the time module of a tool that shortens every sleep"""
+
+    def __init__(self, scale):
+        self.scale = scale
+
+    def sleep(self, seconds):
+        time.sleep(seconds * self.scale)
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+def run_ec2_inventory(backend, session, output_dir, sleep_scale):
+    from aws_clients import ClientFactory
+    module = load_module('ec2_inventory', 'EC2/ec2-inventory/ec2_inventory.py')
+    rows = module.collect_ec2_inventory(ClientFactory(session).client('ec2'))
+    return module.write_output(rows, os.path.join(output_dir, 'ec2.csv'))
+
+
+def run_s3_inventory(backend, session, output_dir, sleep_scale):
+    module = load_module('s3_inventory', 'S3/s3_inventory.py')
+    get_client = module.RegionalClients(session)
+    return module.write_output(module.collect_s3_inventory(get_client), os.path.join(output_dir, 's3.csv'))
+
+
+def run_elb_inventory(backend, session, output_dir, sleep_scale):
+    from aws_clients import ClientFactory
+    module = load_module('elb_inventory', 'ELB/elb_inventory.py')
+    rows = module.collect_elb_inventory(ClientFactory(session).client('elbv2'))
+    return module.write_output(rows, os.path.join(output_dir, 'elb.csv'))
+
+
+def run_rds_inventory(backend, session, output_dir, sleep_scale):
+    from aws_clients import ClientFactory
+    module = load_module('rds_inventory', 'RDS/rds_inventory.py')
+    rows = module.collect_rds_inventory(ClientFactory(session).client('rds'))
+    return module.write_output(rows, os.path.join(output_dir, 'rds.csv'))
+
+
+def run_route53_inventory(backend, session, output_dir, sleep_scale):
+    from aws_clients import ClientFactory
+    module = load_module('route53_inventory', 'Route53/route53_inventory.py')
+    rows = module.collect_route53_inventory(ClientFactory(session).client('route53'))
+    return module.write_output(rows, os.path.join(output_dir, 'route53.csv'))
+
+
+def run_downgrade_instances(backend, session, output_dir, sleep_scale):
+    module = load_module('downgrade_instances', 'EC2/ec2-jplatform-downgrade/downgrade_instances.py')
+    module.time = ScaledTime(sleep_scale)
+    ec2_client = module.get_ec2_client(region=session.region_name)
+    backend.install(ec2_client.meta.events)
+    targets = module.get_target_instances(ec2_client, module.InstanceSelector.parse(module.DEFAULT_SELECTOR))
+    results = module.process_instances(ec2_client, targets, mode='batch')
+    if results['failed']:
+        raise RuntimeError(f"{results['failed']} instances failed to downgrade")
+    return results['total']
+
+
+def run_restart_containers(backend, session, output_dir, sleep_scale):
+    os.environ.update(TARGET_TAG_KEY='Category', TARGET_TAG_VALUE='Jplatform', WAVE_SIZE='50')
+    module = load_module('restart_containers', 'lambda/restart-script/restart_containers.py')
+    module.time = ScaledTime(sleep_scale)
+    sys.modules['ssm_poller'].time = ScaledTime(sleep_scale)
+    logging.getLogger().setLevel(logging.WARNING)
+    backend.install(module.ec2.meta.events)
+    backend.install(module.ssm.meta.events)
+    response = module.lambda_handler({}, None)
+    if response['statusCode'] != 200:
+        raise RuntimeError(json.loads(response['body'])['error'])
+    results = json.loads(response['body'])['results'] or {'successful': [], 'failed': []}
+    if results['failed']:
+        raise RuntimeError(f"{len(results['failed'])} restarts failed")
+    return len(results['successful'])
+
+
+# Benchmarked tools. Every runner receives the backend, a session whose
+# clients are answered by the backend, an output directory and the sleep
+# scale, and returns the number of rows or instances processed.
+TOOLS = {
+    'ec2_inventory': run_ec2_inventory,
+    's3_inventory': run_s3_inventory,
+    'elb_inventory': run_elb_inventory,
+    'rds_inventory': run_rds_inventory,
+    'route53_inventory': run_route53_inventory,
+    'downgrade_instances': run_downgrade_instances,
+    'restart_containers': run_restart_containers
+}
+
+
+def peak_memory_mb():
+    """Return the peak resident set size of this process in MiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_worker(tool, size, result_file, args):
+    """
+    Run one tool against a fresh backend and write the measurements to a JSON file
+
+    Runs in its own process, started by run_benchmark().
+    """
+    import boto3
+    from fake_aws import REGION, FakeAWS
+
+    # Credentials are only needed to sign requests, which never leave the process
+    for name in ('AWS_PROFILE', 'AWS_DEFAULT_PROFILE', 'AWS_SESSION_TOKEN'):
+        os.environ.pop(name, None)
+    os.environ.update(AWS_ACCESS_KEY_ID='benchmark', AWS_SECRET_ACCESS_KEY='benchmark', AWS_DEFAULT_REGION=REGION)
+
+    logging.basicConfig(level=logging.WARNING)
+    backend = FakeAWS(size, args.latency / 1000, args.latency_per_item / 1000)
+    session = boto3.Session(region_name=REGION)
+    backend.install(session.events)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        # Some tools write log files into the working directory
+        os.chdir(output_dir)
+        start = time.perf_counter()
+        processed = TOOLS[tool](backend, session, output_dir, args.sleep_scale)
+        wall_time = time.perf_counter() - start
+        os.chdir(BENCHMARK_DIR)
+
+    operations = backend.summary()
+    result = {
+        'tool': tool,
+        'size': size,
+        'processed': processed,
+        'calls': sum(operations.values()),
+        'wall_seconds': round(wall_time, 3),
+        'peak_memory_mb': round(peak_memory_mb(), 1),
+        'operations': operations
+    }
+    with open(result_file, 'w') as f:
+        json.dump(result, f)
+
+
+def run_benchmark(tool, size, args):
+    """
+    Run one tool and fleet size in a separate process
+
+    Returns:
+        dict: Measurements, or a dictionary with an error
+    """
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        result_file = f.name
+    command = [
+        sys.executable, os.path.abspath(__file__), '--worker', tool, str(size), result_file,
+        '--latency', str(args.latency), '--latency-per-item', str(args.latency_per_item),
+        '--sleep-scale', str(args.sleep_scale)
+    ]
+    try:
+        subprocess.run(command, check=True, timeout=args.timeout,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        with open(result_file) as f:
+            return json.load(f)
+    except subprocess.CalledProcessError as e:
+        error = (e.stderr or b'').decode(errors='replace').strip().splitlines()
+        return {'tool': tool, 'size': size, 'error': error[-1] if error else f"exit code {e.returncode}"}
+    except subprocess.TimeoutExpired:
+        return {'tool': tool, 'size': size, 'error': f"Timed out after {args.timeout} seconds"}
+    finally:
+        os.remove(result_file)
+
+
+def increase(current, previous):
+    """Relative increase in percent"""
+    if not previous:
+        return 0.0 if not current else float('inf')
+    return (current - previous) / previous * 100
+
+
+def find_regressions(results, baseline, args):
+    """
+    Compare results with a baseline
+
+    Args:
+        results (list): Results of this run
+        baseline (list): Results of a previous run
+        args (argparse.Namespace): Regression limits
+
+    Returns:
+        list: Descriptions of every limit that was exceeded
+    """
+    previous = {(r['tool'], r['size']): r for r in baseline if 'error' not in r}
+    regressions = []
+    for result in results:
+        before = previous.get((result['tool'], result['size']))
+        if before is None or 'error' in result:
+            continue
+        label = f"{result['tool']} ({result['size']})"
+
+        calls = increase(result['calls'], before['calls'])
+        if calls > args.max_call_increase:
+            regressions.append(f"{label}: API calls {before['calls']} -> {result['calls']} (+{calls:.1f}%)")
+            for operation, count in result['operations'].items():
+                if count > before['operations'].get(operation, 0):
+                    regressions.append(f"    {operation}: {before['operations'].get(operation, 0)} -> {count}")
+
+        wall = increase(result['wall_seconds'], before['wall_seconds'])
+        if wall > args.max_time_increase and result['wall_seconds'] - before['wall_seconds'] > MIN_TIME_INCREASE:
+            regressions.append(f"{label}: wall time {before['wall_seconds']:.2f}s -> "
+                               f"{result['wall_seconds']:.2f}s (+{wall:.1f}%)")
+
+        memory = increase(result['peak_memory_mb'], before['peak_memory_mb'])
+        if (memory > args.max_memory_increase
+                and result['peak_memory_mb'] - before['peak_memory_mb'] > MIN_MEMORY_INCREASE):
+            regressions.append(f"{label}: peak memory {before['peak_memory_mb']:.1f} MiB -> "
+                               f"{result['peak_memory_mb']:.1f} MiB (+{memory:.1f}%)")
+    return regressions
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    if args.worker:
+        tool, size, result_file = args.worker
+        run_worker(tool, int(size), result_file, args)
+        return 0
+
+    setup_logging()
+    logger.info(f"Benchmarking {len(args.tools)} tools with fleets of {', '.join(map(str, args.sizes))} "
+                f"resources, {args.latency:g}ms latency per call")
+
+    results = []
+    for tool in args.tools:
+        for size in args.sizes:
+            result = run_benchmark(tool, size, args)
+            if 'error' in result:
+                logger.error(f"{tool} ({size}) failed: {result['error']}")
+            else:
+                logger.info(f"{tool} ({size}): {result['calls']} calls, {result['wall_seconds']:.2f}s, "
+                            f"{result['peak_memory_mb']:.1f} MiB")
+            results.append(result)
+
+    logger.info("=" * 70)
+    logger.info(f"{'Tool':<22} {'Size':>6} {'Calls':>8} {'Wall (s)':>10} {'Peak (MiB)':>11}")
+    logger.info("=" * 70)
+    for result in results:
+        if 'error' in result:
+            logger.info(f"{result['tool']:<22} {result['size']:>6} {'FAILED':>8}")
+        else:
+            logger.info(f"{result['tool']:<22} {result['size']:>6} {result['calls']:>8} "
+                        f"{result['wall_seconds']:>10.2f} {result['peak_memory_mb']:>11.1f}")
+    logger.info("=" * 70)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'created': datetime.now().isoformat(),
+                'latency_ms': args.latency,
+                'latency_per_item_ms': args.latency_per_item,
+                'sleep_scale': args.sleep_scale,
+                'results': results
+            }, f, indent=2)
+        logger.info(f"Results saved to: {args.output}")
+
+    failed = [r for r in results if 'error' in r]
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f)['results'], args)
+        for regression in regressions:
+            logger.error(f"Regression: {regression}")
+        if not regressions:
+            logger.info(f"No regressions against {args.baseline}")
+
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+In-Memory AWS Backend for Benchmarks
+
+Answers the API calls made by the inventory, downgrade and restart tools from
+a synthetic fleet held in memory, so they can be benchmarked without an AWS
+account or network access:
+
+- Calls are answered from botocore's before-call event, after parameter
+  validation and serialization but before signing and sending, the same way
+  botocore's Stubber works
+- Every call sleeps for an injected latency (a fixed part with jitter plus a
+  part per returned item), so concurrency and pagination show up in wall time
+- Page sizes, batch limits and pagination tokens follow the real APIs, so call
+  counts match what the tools would make against AWS
+- Instance state changes (stop, start, type change) and SSM commands are
+  simulated, and complete the next time they are described
+- Calls are counted per service and operation
+
+Operations that are not modelled fail with an UnsupportedOperation error
+instead of reaching AWS.
+
+Example:
+    backend = FakeAWS(size=1000, latency=0.02)
+    backend.install(session.events)  # before creating clients from the session
+"""
+
+import fnmatch
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from botocore.awsrequest import AWSResponse
+
+REGION = 'eu-west-1'
+ACCOUNT_ID = '123456789012'
+
+# Instance types of the synthetic fleet and their memory in MiB
+INSTANCE_TYPES = {
+    'r5a.large': 16384,
+    'r5a.xlarge': 32768,
+    'r5a.2xlarge': 65536,
+    'm5.large': 8192,
+    't3.medium': 4096
+}
+
+# Regions the synthetic buckets are spread over
+BUCKET_REGIONS = [None, 'eu-west-1', 'EU', 'us-west-2', 'ap-southeast-1']
+
+# Page size used when a request does not set one, and the largest allowed
+PAGE_SIZES = {
+    'DescribeInstances': (1000, 1000),
+    'DescribeVolumes': (500, 500),
+    'DescribeInstanceTypes': (100, 100),
+    'ListBuckets': (10000, 10000),
+    'DescribeLoadBalancers': (400, 400),
+    'DescribeTargetGroups': (400, 400),
+    'DescribeListeners': (100, 400),
+    'DescribeDBInstances': (100, 100),
+    'ListHostedZones': (100, 100),
+    'ListResourceRecordSets': (300, 300),
+    'ListCommandInvocations': (50, 50)
+}
+
+# describe_instances filters the backend evaluates and the instance fields they match
+INSTANCE_FILTER_FIELDS = {
+    'instance-id': ('InstanceId',),
+    'instance-type': ('InstanceType',),
+    'instance-state-name': ('State', 'Name'),
+    'vpc-id': ('VpcId',),
+    'subnet-id': ('SubnetId',)
+}
+
+BASE_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeAPIError(Exception):
+    """Error returned to the client as an AWS error response"""
+
+    def __init__(self, code, message, status=400):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+
+
+class FakeAWS:
+    """
+    Synthetic AWS account answering API calls from memory
+
+    Args:
+        size (int): Number of resources of each kind (instances, buckets,
+            load balancers, DB instances, hosted zones)
+        latency (float): Seconds added to every call
+        latency_per_item (float): Seconds added per item a call returns
+        jitter (float): Fraction by which the fixed latency varies randomly
+        seed (int): Random seed, so every run sees the same fleet and latencies
+    """
+
+    def __init__(self, size, latency=0.02, latency_per_item=0.00002, jitter=0.2, seed=0):
+        self.size = size
+        self.latency = latency
+        self.latency_per_item = latency_per_item
+        self.jitter = jitter
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._commands = {}
+        self._build_fleet()
+
+    def _build_fleet(self):
+        types = list(INSTANCE_TYPES)
+        self.instances = {}
+        self.volumes = []
+        for i in range(self.size):
+            instance_id = f"i-{i:017x}"
+            self.instances[instance_id] = {
+                'InstanceId': instance_id,
+                'InstanceType': types[i % len(types)],
+                'State': {'Name': 'stopped' if i % 10 == 9 else 'running'},
+                'PrivateIpAddress': f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+                'PublicIpAddress': f"52.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" if i % 3 == 0 else None,
+                'VpcId': 'vpc-0benchmark',
+                'SubnetId': f"subnet-{i % 6:017x}",
+                'CpuOptions': {'CoreCount': 2},
+                'LaunchTime': BASE_TIME + timedelta(minutes=i),
+                'Tags': [
+                    # The downgrade tool targets jplatform-isbasi-61 to 134
+                    {'Key': 'Name', 'Value': f"jplatform-isbasi-{i + 61}"},
+                    {'Key': 'Category', 'Value': 'Jplatform'},
+                    {'Key': 'CostCenter', 'Value': f"cc-{i % 7}"}
+                ]
+            }
+            for v in range(1 + i % 2):
+                self.volumes.append({
+                    'VolumeId': f"vol-{i:015x}{v:02x}",
+                    'Size': 50 * (v + 1),
+                    'Attachments': [{'InstanceId': instance_id, 'State': 'attached'}]
+                })
+
+        self.buckets = [
+            {'Name': f"benchmark-bucket-{i:05d}", 'CreationDate': BASE_TIME + timedelta(hours=i)}
+            for i in range(self.size)
+        ]
+        self.bucket_index = {bucket['Name']: i for i, bucket in enumerate(self.buckets)}
+
+        self.load_balancers = [
+            {
+                'LoadBalancerArn': f"arn:aws:elasticloadbalancing:{REGION}:{ACCOUNT_ID}:loadbalancer/app/lb-{i:05d}/{i:016x}",
+                'LoadBalancerName': f"lb-{i:05d}",
+                'Type': 'application' if i % 4 else 'network',
+                'Scheme': 'internet-facing' if i % 2 else 'internal',
+                'VpcId': 'vpc-0benchmark',
+                'State': {'Code': 'active'},
+                'DNSName': f"lb-{i:05d}.{REGION}.elb.amazonaws.com",
+                'CreatedTime': BASE_TIME + timedelta(hours=i),
+                'AvailabilityZones': [{'ZoneName': f"{REGION}a"}, {'ZoneName': f"{REGION}b"}],
+                'SecurityGroups': [f"sg-{i:017x}"]
+            }
+            for i in range(self.size)
+        ]
+        self.target_groups = [
+            {
+                'TargetGroupArn': f"arn:aws:elasticloadbalancing:{REGION}:{ACCOUNT_ID}:targetgroup/tg-{i:05d}/{i:016x}",
+                'TargetGroupName': f"tg-{i:05d}",
+                'LoadBalancerArns': [lb['LoadBalancerArn']]
+            }
+            for i, lb in enumerate(self.load_balancers)
+        ]
+
+        self.db_instances = [
+            {
+                'DBInstanceIdentifier': f"db-{i:05d}",
+                'DBInstanceClass': 'db.r5.large',
+                'Engine': 'postgres',
+                'EngineVersion': '15.4',
+                'DBInstanceStatus': 'available',
+                'StorageType': 'gp3',
+                'AllocatedStorage': 100,
+                'MultiAZ': i % 2 == 0,
+                'PubliclyAccessible': False,
+                'Endpoint': {'Address': f"db-{i:05d}.abc.{REGION}.rds.amazonaws.com", 'Port': 5432},
+                'InstanceCreateTime': BASE_TIME + timedelta(hours=i),
+                'BackupRetentionPeriod': 7,
+                'TagList': [{'Key': 'CostCenter', 'Value': f"cc-{i % 7}"}]
+            }
+            for i in range(self.size)
+        ]
+
+        self.hosted_zones = [
+            {
+                'Id': f"/hostedzone/Z{i:012d}",
+                'Name': f"zone-{i:05d}.example.com.",
+                'Config': {'PrivateZone': i % 5 == 0, 'Comment': ''},
+                'ResourceRecordSetCount': 5
+            }
+            for i in range(self.size)
+        ]
+        self.zone_index = {zone['Id'].split('/')[-1]: zone for zone in self.hosted_zones}
+
+    def install(self, events):
+        """
+        Answer every call made through an event emitter
+
+        Args:
+            events (botocore.hooks.BaseEventHooks): Session or client event emitter
+        """
+        events.register('before-parameter-build', self._capture_params)
+        events.register('before-call', self._handle)
+
+    @staticmethod
+    def _capture_params(params, context, **kwargs):
+        # before-call only sees the serialized request, so keep the API parameters
+        context['fake_params'] = dict(params)
+
+    def _handle(self, model, context, **kwargs):
+        service = model.service_model.service_name
+        operation = model.name
+        with self._lock:
+            self.calls[f"{service}.{operation}"] += 1
+
+        handler = getattr(self, f"_{service}_{operation}", None)
+        try:
+            if handler is None:
+                raise FakeAPIError('UnsupportedOperation', f"{service}.{operation} is not modelled by the benchmark backend")
+            parsed, items = handler(context.get('fake_params', {}))
+            status = 200
+        except FakeAPIError as e:
+            parsed, items, status = {'Error': {'Code': e.code, 'Message': str(e)}}, 0, e.status
+
+        with self._lock:
+            factor = 1 + self._random.uniform(-self.jitter, self.jitter)
+        time.sleep(self.latency * factor + self.latency_per_item * items)
+
+        parsed['ResponseMetadata'] = {'HTTPStatusCode': status, 'RetryAttempts': 0}
+        return AWSResponse(f"https://{service}.{REGION}.amazonaws.com/", status, {}, None), parsed
+
+    def summary(self):
+        """Return the number of calls per service and operation"""
+        with self._lock:
+            return dict(sorted(self.calls.items()))
+
+    @staticmethod
+    def _page(items, params, operation, size_key, token_key):
+        """Return one page of items and the token of the next page, if any"""
+        default, maximum = PAGE_SIZES[operation]
+        size = int(params.get(size_key) or default)
+        if size > maximum:
+            raise FakeAPIError('InvalidParameterValue', f"{size_key} must not exceed {maximum}")
+        start = int(params.get(token_key) or 0)
+        end = start + size
+        return items[start:end], (str(end) if end < len(items) else None)
+
+    # EC2
+
+    @staticmethod
+    def _filter_matches(value, patterns):
+        """Match a value against filter values, which may contain * and ? wildcards"""
+        return value is not None and any(fnmatch.fnmatchcase(value, pattern) for pattern in patterns)
+
+    def _instance_matches(self, instance, filters, instance_ids):
+        if instance_ids and instance['InstanceId'] not in instance_ids:
+            return False
+        for flt in filters:
+            name, values = flt['Name'], flt['Values']
+            if name in INSTANCE_FILTER_FIELDS:
+                value = instance
+                for field in INSTANCE_FILTER_FIELDS[name]:
+                    value = (value or {}).get(field)
+                if not self._filter_matches(value, values):
+                    return False
+            elif name.startswith('tag:'):
+                key = name[4:]
+                if not any(tag['Key'] == key and self._filter_matches(tag['Value'], values) for tag in instance['Tags']):
+                    return False
+            else:
+                raise FakeAPIError('InvalidParameterValue', f"The filter '{name}' is not supported by the benchmark backend")
+        return True
+
+    def _ec2_DescribeInstances(self, params):
+        filters = params.get('Filters', [])
+        for flt in filters:
+            if len(flt['Values']) > 200:
+                raise FakeAPIError('InvalidParameterValue', f"The filter {flt['Name']} accepts at most 200 values")
+        instance_ids = set(params.get('InstanceIds', []))
+        with self._lock:
+            matching = [i for i in self.instances.values() if self._instance_matches(i, filters, instance_ids)]
+            page, token = self._page(matching, params, 'DescribeInstances', 'MaxResults', 'NextToken')
+            reservations = []
+            for instance in page:
+                described = {key: value for key, value in instance.items() if value is not None}
+                described['State'] = dict(instance['State'])
+                described['Tags'] = [dict(tag) for tag in instance['Tags']]
+                reservations.append({'ReservationId': f"r-{instance['InstanceId'][2:]}", 'Instances': [described]})
+                # Transitions started by stop/start complete by the next describe
+                state = instance['State']['Name']
+                if state == 'stopping':
+                    instance['State'] = {'Name': 'stopped'}
+                elif state == 'pending':
+                    instance['State'] = {'Name': 'running'}
+        response = {'Reservations': reservations}
+        if token:
+            response['NextToken'] = token
+        return response, len(reservations)
+
+    def _change_states(self, params, from_state, to_state, key):
+        changes = []
+        with self._lock:
+            for instance_id in params['InstanceIds']:
+                if instance_id not in self.instances:
+                    raise FakeAPIError('InvalidInstanceID.NotFound', f"The instance ID '{instance_id}' does not exist")
+            for instance_id in params['InstanceIds']:
+                instance = self.instances[instance_id]
+                previous = instance['State']['Name']
+                if previous == from_state:
+                    instance['State'] = {'Name': to_state}
+                changes.append({'InstanceId': instance_id, 'PreviousState': {'Name': previous},
+                                'CurrentState': dict(instance['State'])})
+        return {key: changes}, len(changes)
+
+    def _ec2_StopInstances(self, params):
+        return self._change_states(params, 'running', 'stopping', 'StoppingInstances')
+
+    def _ec2_StartInstances(self, params):
+        return self._change_states(params, 'stopped', 'pending', 'StartingInstances')
+
+    def _ec2_ModifyInstanceAttribute(self, params):
+        with self._lock:
+            instance = self.instances.get(params['InstanceId'])
+            if instance is None:
+                raise FakeAPIError('InvalidInstanceID.NotFound', f"The instance ID '{params['InstanceId']}' does not exist")
+            if 'InstanceType' in params:
+                if instance['State']['Name'] != 'stopped':
+                    raise FakeAPIError('IncorrectInstanceState', f"The instance '{params['InstanceId']}' is not in the 'stopped' state")
+                instance['InstanceType'] = params['InstanceType']['Value']
+        return {}, 0
+
+    def _ec2_DescribeVolumes(self, params):
+        attached_to = None
+        for flt in params.get('Filters', []):
+            if flt['Name'] == 'attachment.instance-id':
+                attached_to = set(flt['Values'])
+        volumes = [v for v in self.volumes
+                   if attached_to is None or v['Attachments'][0]['InstanceId'] in attached_to]
+        page, token = self._page(volumes, params, 'DescribeVolumes', 'MaxResults', 'NextToken')
+        response = {'Volumes': page}
+        if token:
+            response['NextToken'] = token
+        return response, len(page)
+
+    def _ec2_DescribeInstanceTypes(self, params):
+        requested = params.get('InstanceTypes') or list(INSTANCE_TYPES)
+        if len(requested) > 100:
+            raise FakeAPIError('InvalidParameterValue', 'At most 100 instance types can be described at once')
+        unknown = [t for t in requested if t not in INSTANCE_TYPES]
+        if unknown:
+            raise FakeAPIError('InvalidInstanceType', f"The following supplied instance types do not exist: {unknown}")
+        types = [{'InstanceType': t, 'MemoryInfo': {'SizeInMiB': INSTANCE_TYPES[t]}} for t in requested]
+        return {'InstanceTypes': types}, len(types)
+
+    # S3
+
+    def _bucket(self, params):
+        index = self.bucket_index.get(params['Bucket'])
+        if index is None:
+            raise FakeAPIError('NoSuchBucket', 'The specified bucket does not exist', 404)
+        return index
+
+    def _s3_ListBuckets(self, params):
+        page, token = self._page(self.buckets, params, 'ListBuckets', 'MaxBuckets', 'ContinuationToken')
+        response = {'Buckets': page, 'Owner': {'ID': ACCOUNT_ID}}
+        if token:
+            response['ContinuationToken'] = token
+        return response, len(page)
+
+    def _s3_GetBucketLocation(self, params):
+        return {'LocationConstraint': BUCKET_REGIONS[self._bucket(params) % len(BUCKET_REGIONS)]}, 1
+
+    def _s3_GetBucketVersioning(self, params):
+        return ({'Status': 'Enabled'} if self._bucket(params) % 2 else {}), 1
+
+    def _s3_GetBucketEncryption(self, params):
+        if self._bucket(params) % 3 == 0:
+            raise FakeAPIError('ServerSideEncryptionConfigurationNotFoundError',
+                               'The server side encryption configuration was not found', 404)
+        rule = {'ApplyServerSideEncryptionByDefault': {'SSEAlgorithm': 'AES256'}}
+        return {'ServerSideEncryptionConfiguration': {'Rules': [rule]}}, 1
+
+    def _s3_GetPublicAccessBlock(self, params):
+        if self._bucket(params) % 4 == 0:
+            raise FakeAPIError('NoSuchPublicAccessBlockConfiguration',
+                               'The public access block configuration was not found', 404)
+        return {'PublicAccessBlockConfiguration': {'BlockPublicAcls': True, 'IgnorePublicAcls': True,
+                                                   'BlockPublicPolicy': True, 'RestrictPublicBuckets': True}}, 1
+
+    def _s3_GetBucketTagging(self, params):
+        index = self._bucket(params)
+        if index % 2 == 0:
+            raise FakeAPIError('NoSuchTagSet', 'The TagSet does not exist', 404)
+        return {'TagSet': [{'Key': 'CostCenter', 'Value': f"cc-{index % 7}"}]}, 1
+
+    # ELBv2
+
+    def _elbv2_DescribeLoadBalancers(self, params):
+        page, token = self._page(self.load_balancers, params, 'DescribeLoadBalancers', 'PageSize', 'Marker')
+        response = {'LoadBalancers': page}
+        if token:
+            response['NextMarker'] = token
+        return response, len(page)
+
+    def _elbv2_DescribeTags(self, params):
+        arns = params['ResourceArns']
+        if len(arns) > 20:
+            raise FakeAPIError('ValidationError', 'At most 20 resource ARNs can be described at once')
+        descriptions = [{'ResourceArn': arn, 'Tags': [{'Key': 'Name', 'Value': arn.split('/')[-2]}]} for arn in arns]
+        return {'TagDescriptions': descriptions}, len(descriptions)
+
+    def _elbv2_DescribeTargetGroups(self, params):
+        page, token = self._page(self.target_groups, params, 'DescribeTargetGroups', 'PageSize', 'Marker')
+        response = {'TargetGroups': page}
+        if token:
+            response['NextMarker'] = token
+        return response, len(page)
+
+    def _elbv2_DescribeListeners(self, params):
+        listeners = [{'Protocol': 'HTTP', 'Port': 80}, {'Protocol': 'HTTPS', 'Port': 443}]
+        return {'Listeners': listeners}, len(listeners)
+
+    # RDS
+
+    def _rds_DescribeDBInstances(self, params):
+        page, token = self._page(self.db_instances, params, 'DescribeDBInstances', 'MaxRecords', 'Marker')
+        response = {'DBInstances': page}
+        if token:
+            response['Marker'] = token
+        return response, len(page)
+
+    # Route53
+
+    def _route53_ListHostedZones(self, params):
+        page, token = self._page(self.hosted_zones, params, 'ListHostedZones', 'MaxItems', 'Marker')
+        response = {'HostedZones': page, 'IsTruncated': token is not None, 'MaxItems': str(len(page))}
+        if token:
+            response['NextMarker'] = token
+        return response, len(page)
+
+    def _route53_ListTagsForResources(self, params):
+        zone_ids = params['ResourceIds']
+        if len(zone_ids) > 10:
+            raise FakeAPIError('InvalidInput', 'At most 10 resources can be listed at once')
+        tag_sets = [{'ResourceType': 'hostedzone', 'ResourceId': zone_id,
+                     'Tags': [{'Key': 'Team', 'Value': 'platform'}]} for zone_id in zone_ids]
+        return {'ResourceTagSets': tag_sets}, len(tag_sets)
+
+    def _route53_ListResourceRecordSets(self, params):
+        zone = self.zone_index.get(params['HostedZoneId'])
+        if zone is None:
+            raise FakeAPIError('NoSuchHostedZone', f"No hosted zone found with ID: {params['HostedZoneId']}", 404)
+        name = zone['Name']
+        record_sets = [
+            {'Name': name, 'Type': 'NS', 'TTL': 172800,
+             'ResourceRecords': [{'Value': f"ns-{n}.awsdns-{n}.com."} for n in range(4)]},
+            {'Name': name, 'Type': 'SOA', 'TTL': 900,
+             'ResourceRecords': [{'Value': 'ns-0.awsdns-0.com. hostmaster.example.com. 1 7200 900 1209600 86400'}]},
+            {'Name': f"www.{name}", 'Type': 'A', 'TTL': 300, 'ResourceRecords': [{'Value': '192.0.2.10'}]},
+            {'Name': f"api.{name}", 'Type': 'A', 'TTL': 300, 'ResourceRecords': [{'Value': '192.0.2.11'}]},
+            {'Name': f"mail.{name}", 'Type': 'MX', 'TTL': 300, 'ResourceRecords': [{'Value': '10 mail.example.com.'}]}
+        ]
+        return {'ResourceRecordSets': record_sets, 'IsTruncated': False, 'MaxItems': params.get('MaxItems', '300')}, len(record_sets)
+
+    # SSM
+
+    def _ssm_SendCommand(self, params):
+        instance_ids = params.get('InstanceIds', [])
+        if len(instance_ids) > 50:
+            raise FakeAPIError('ValidationException', 'At most 50 instance IDs can be targeted at once')
+        with self._lock:
+            number = len(self._commands) + 1
+            command_id = f"{number:08x}-0000-4000-8000-{number:012x}"
+            requested = datetime.now(timezone.utc)
+            self._commands[command_id] = [
+                {
+                    'CommandId': command_id,
+                    'InstanceId': instance_id,
+                    'RequestedDateTime': requested,
+                    'Status': 'Success',
+                    'CommandPlugins': [{'Name': 'aws:runShellScript', 'Output': 'jplatform restarted'}]
+                }
+                for instance_id in instance_ids
+            ]
+        return {'Command': {'CommandId': command_id, 'InstanceIds': instance_ids, 'Status': 'Pending'}}, 1
+
+    def _ssm_ListCommandInvocations(self, params):
+        with self._lock:
+            if params.get('CommandId'):
+                invocations = list(self._commands.get(params['CommandId'], []))
+            else:
+                invocations = [invocation for command in self._commands.values() for invocation in command]
+        page, token = self._page(invocations, params, 'ListCommandInvocations', 'MaxResults', 'NextToken')
+        response = {'CommandInvocations': page}
+        if token:
+            response['NextToken'] = token
+        return response, len(page)
+
+    # STS
+
+    def _sts_GetCallerIdentity(self, params):
+        return {'Account': ACCOUNT_ID, 'Arn': f"arn:aws:iam::{ACCOUNT_ID}:user/benchmark", 'UserId': 'BENCHMARK'}, 1
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Parallel AWS Inventory Orchestrator
+
+This script runs the individual service inventories at the same time instead
+of one after another like AWS-inventory-all.sh:
+
+- Every (service, region) pair is a job in a bounded worker pool
+- Python collectors share one boto3 session and a pooled, rate-limited
+  client per service and region from the shared client factory
+- Global services (S3, Route53) are collected once, regardless of how many
+  regions are requested
+- With --snapshot-db, incremental collectors (S3, ELB, Route53) only make
+  their detail calls for resources that are new or changed since the last run
+- Every API call of the Python collectors is measured; the slowest operations
+  are listed in the summary and --metrics-json / --metrics-prom save them all
+- With --accounts or --all-accounts, a role is assumed in every account and
+  the whole account x service x region matrix runs in the same worker pool,
+  with credentials cached and refreshed per account
+
+A full account sweep takes about as long as the slowest collector rather than
+the sum of all collectors across all regions.
+
+Usage:
+    python aws_inventory_all.py (--region REGION [REGION ...] | --all-regions)
+                                [--accounts ID [ID ...] | --all-accounts] [options]
+
+Options:
+    -r, --region        One or more AWS regions (space or comma separated)
+    --all-regions       Inventory every region enabled for the account
+    -s, --services      Services to inventory (default: EC2 RDS S3 ELB Route53)
+    -o, --output-dir    Output directory (default: aws-inventory_TIMESTAMP)
+    --format            csv, jsonl, parquet or sqlite (default: csv)
+    --profile           AWS profile name to use
+    --accounts          Accounts to inventory by assuming a role in each (space or comma separated)
+    --all-accounts      Inventory every active account of the organization
+    --role-name         Role assumed in every account (default: OrganizationAccountAccessRole)
+    --external-id       External ID required by the role's trust policy
+    --parallel          Maximum number of collectors running at once (default: 8)
+    --snapshot-db       SQLite snapshot store enabling incremental runs
+    --refresh-after     Hours after which unchanged resources are fetched again (default: 168)
+    --metrics-json      Write per-operation API call metrics to a JSON file
+    --metrics-prom      Write per-operation API call metrics to a Prometheus textfile
+    --help              Show this help message and exit
+"""
+
+import argparse
+import functools
+import importlib.util
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import boto3
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'common'))
+from api_metrics import ApiMetrics
+from aws_accounts import DEFAULT_ROLE_NAME, AccountSessionPool, list_accounts
+from inventory_writer import FORMAT_EXTENSIONS
+from snapshot_store import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Collector registry. Every collector module exposes collect_<service>_inventory(client)
+# and write_output(rows, output_file). Routed collectors receive a callable
+# returning the client for any region instead.
+# Incremental collectors accept a store=SnapshotStore keyword argument.
+COLLECTORS = {
+    'EC2': {
+        'global': False,
+        'module': 'EC2/ec2-inventory/ec2_inventory.py',
+        'client': 'ec2',
+        'collect': 'collect_ec2_inventory'
+    },
+    'RDS': {
+        'global': False,
+        'module': 'RDS/rds_inventory.py',
+        'client': 'rds',
+        'collect': 'collect_rds_inventory'
+    },
+    'S3': {
+        'global': True,
+        'module': 'S3/s3_inventory.py',
+        'client': 's3',
+        'collect': 'collect_s3_inventory',
+        'routed': True,
+        'incremental': True
+    },
+    'ELB': {
+        'global': False,
+        'module': 'ELB/elb_inventory.py',
+        'client': 'elbv2',
+        'collect': 'collect_elb_inventory',
+        'incremental': True
+    },
+    'Route53': {
+        'global': True,
+        'module': 'Route53/route53_inventory.py',
+        'client': 'route53',
+        'collect': 'collect_route53_inventory',
+        'incremental': True
+    }
+}
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Generate comprehensive AWS inventory across services and regions')
+    region_group = parser.add_mutually_exclusive_group(required=True)
+    region_group.add_argument('-r', '--region', nargs='+', help='AWS region(s), space or comma separated')
+    region_group.add_argument('--all-regions', action='store_true', help='Inventory all regions enabled for the account')
+    parser.add_argument('-s', '--services', nargs='+', choices=list(COLLECTORS), default=list(COLLECTORS),
+                        help='Services to inventory')
+    parser.add_argument('-o', '--output-dir', help='Output directory (default: aws-inventory_TIMESTAMP)')
+    parser.add_argument('--format', choices=list(FORMAT_EXTENSIONS), default='csv',
+                        help='Output format of Python collectors')
+    parser.add_argument('--profile', help='AWS profile to use')
+    account_group = parser.add_mutually_exclusive_group()
+    account_group.add_argument('--accounts', nargs='+',
+                               help='Accounts to inventory by assuming a role in each, space or comma separated')
+    account_group.add_argument('--all-accounts', action='store_true',
+                               help='Inventory every active account of the organization')
+    parser.add_argument('--role-name', default=DEFAULT_ROLE_NAME, help='Role assumed in every account')
+    parser.add_argument('--external-id', help="External ID required by the role's trust policy")
+    parser.add_argument('--parallel', type=int, default=8, help='Maximum number of collectors running at once')
+    parser.add_argument('--snapshot-db', help='SQLite snapshot store enabling incremental runs')
+    parser.add_argument('--refresh-after', type=float, default=168,
+                        help='Hours after which unchanged resources are fetched again')
+    parser.add_argument('--metrics-json', help='Write per-operation API call metrics to a JSON file')
+    parser.add_argument('--metrics-prom', help='Write per-operation API call metrics to a Prometheus textfile')
+    return parser.parse_args()
+
+
+def setup_logging(output_dir):
+    """Log to the console and to a timestamped log file in the output directory"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(os.path.join(output_dir, f"aws_inventory_all_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"))
+        ]
+    )
+
+
+def get_enabled_regions(client_pool):
+    """
+    Get all regions enabled for the account
+
+    Args:
+        client_pool (ClientFactory): Shared rate-limited client factory
+
+    Returns:
+        list: Region names
+    """
+    ec2_client = client_pool.client('ec2', client_pool.session.region_name or 'us-east-1')
+    response = ec2_client.describe_regions(AllRegions=False)
+    return sorted(region['RegionName'] for region in response['Regions'])
+
+
+def load_module(service, relative_path):
+    """
+    Load a collector module from its script directory
+
+    Args:
+        service (str): Service name, used as the module name
+        relative_path (str): Path of the module relative to the scripts directory
+
+    Returns:
+        module: Loaded Python module
+    """
+    spec = importlib.util.spec_from_file_location(f"{service.lower()}_collector", os.path.join(SCRIPTS_DIR, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def get_account_regions(account_pool, accounts, parallel=8):
+    """
+    Get the regions enabled in every account, looking them up in parallel
+
+    Args:
+        account_pool (AccountSessionPool): Cross-account session pool
+        accounts (list): AWS account IDs
+        parallel (int): Maximum number of lookups running at once
+
+    Returns:
+        tuple: (dict of account ID to region names, dict of account ID to the
+            error of accounts whose regions could not be listed)
+    """
+    def lookup(factory, account_id, region):
+        return get_enabled_regions(factory)
+
+    regions, errors = {}, {}
+    for account_id, _, result, error in account_pool.run(lookup, accounts, [None], parallel):
+        if error:
+            errors[account_id] = error
+        else:
+            regions[account_id] = result
+    return regions, errors
+
+
+def build_jobs(services, regions, output_dir, fmt='csv', account=None):
+    """
+    Build the list of (service, region, output file) jobs of an account
+
+    Global services get a single job; regional services get one job per region.
+
+    Args:
+        services (list): Service names
+        regions (list): Region names
+        output_dir (str): Output directory of the account
+        fmt (str): Output format of the collectors
+        account (str): AWS account ID, or None for the account of the base session
+
+    Returns:
+        list: Job dictionaries
+    """
+    jobs = []
+    for service in services:
+        extension = FORMAT_EXTENSIONS[fmt]
+        if COLLECTORS[service]['global']:
+            jobs.append({
+                'service': service,
+                'account': account,
+                'region': regions[0],
+                'output_file': os.path.join(output_dir, f"{service.lower()}-inventory{extension}")
+            })
+        else:
+            for region in regions:
+                jobs.append({
+                    'service': service,
+                    'account': account,
+                    'region': region,
+                    'output_file': os.path.join(output_dir, f"{service.lower()}-inventory_{region}{extension}")
+                })
+    return jobs
+
+
+def run_python_collector(job, module, client_pool, store=None):
+    """Run a Python collector with a client from the account's client factory"""
+    collector = COLLECTORS[job['service']]
+    if collector.get('routed'):
+        client = functools.partial(client_pool.client, collector['client'])
+    else:
+        client = client_pool.client(collector['client'], job['region'])
+    kwargs = {'store': store} if store is not None and collector.get('incremental') else {}
+    rows = getattr(module, collector['collect'])(client, **kwargs)
+    module.write_output(rows, job['output_file'])
+
+
+def run_job(job, modules, account_pool, store=None):
+    """
+    Run a single inventory job
+
+    Args:
+        job (dict): Job dictionary
+        modules (dict): Loaded Python collector modules by service
+        account_pool (AccountSessionPool): Pool of rate-limited client factories per account
+        store (SnapshotStore): Snapshot store for incremental collectors, or None
+
+    Returns:
+        dict: Job result with duration and error, if any
+    """
+    label = job['service'] if COLLECTORS[job['service']]['global'] else f"{job['service']} ({job['region']})"
+    if job['account'] is not None:
+        label = f"{job['account']} {label}"
+        if store is not None:
+            store = store.scoped(job['account'])
+    result = {'job': label, 'output_file': job['output_file'], 'success': False, 'error': None}
+    start = time.monotonic()
+
+    try:
+        logger.info(f"Running {label} inventory...")
+        run_python_collector(job, modules[job['service']], account_pool.factory(job['account']), store)
+        result['success'] = True
+    except Exception as e:
+        result['error'] = str(e)
+
+    result['duration'] = time.monotonic() - start
+    if result['success']:
+        logger.info(f"{label} inventory completed in {result['duration']:.1f}s")
+    else:
+        logger.error(f"{label} inventory failed after {result['duration']:.1f}s: {result['error']}")
+    return result
+
+
+def run_inventory(services, account_regions, output_dir, account_pool, parallel=8, store=None, fmt='csv'):
+    """
+    Run all inventory jobs of every account concurrently
+
+    Args:
+        services (list): Service names
+        account_regions (dict): Region names by AWS account ID; the key None
+            stands for the account of the base session, whose output is
+            written directly into output_dir instead of a subdirectory
+        output_dir (str): Output directory
+        account_pool (AccountSessionPool): Pool of rate-limited client factories per account
+        parallel (int): Maximum number of jobs running at once
+        store (SnapshotStore): Snapshot store for incremental collectors, or None
+        fmt (str): Output format of the collectors
+
+    Returns:
+        list: Job results in completion order
+    """
+    modules = {service: load_module(service, COLLECTORS[service]['module']) for service in services}
+    jobs = []
+    for account, regions in account_regions.items():
+        account_dir = output_dir if account is None else os.path.join(output_dir, account)
+        os.makedirs(account_dir, exist_ok=True)
+        jobs.extend(build_jobs(services, regions, account_dir, fmt, account))
+    logger.info(f"Running {len(jobs)} inventory jobs with up to {parallel} in parallel")
+
+    results = []
+    with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix='inventory') as executor:
+        futures = [executor.submit(run_job, job, modules, account_pool, store) for job in jobs]
+        for future in as_completed(futures):
+            results.append(future.result())
+    return results
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    output_dir = args.output_dir or f"aws-inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    os.makedirs(output_dir, exist_ok=True)
+    setup_logging(output_dir)
+
+    session = boto3.Session(profile_name=args.profile)
+    metrics = ApiMetrics('aws_inventory_all')
+    account_pool = AccountSessionPool(session, role_name=args.role_name, external_id=args.external_id,
+                                      max_pool_connections=max(16, args.parallel), metrics=metrics)
+    start = time.monotonic()
+
+    if args.all_accounts:
+        try:
+            accounts = [account['Id'] for account in list_accounts(account_pool.base.client('organizations'))]
+        except Exception as e:
+            logger.error(f"Failed to list the accounts of the organization: {str(e)}")
+            return 1
+        logger.info(f"Found {len(accounts)} active accounts in the organization")
+    elif args.accounts:
+        accounts = sorted({a.strip() for value in args.accounts for a in value.split(',') if a.strip()})
+    else:
+        accounts = [None]
+
+    lookup_errors = {}
+    if args.all_regions and accounts != [None]:
+        account_regions, lookup_errors = get_account_regions(account_pool, accounts, args.parallel)
+        logger.info(f"Found enabled regions in {len(account_regions)} of {len(accounts)} accounts")
+    elif args.all_regions:
+        account_regions = {None: get_enabled_regions(account_pool.base)}
+        logger.info(f"Found {len(account_regions[None])} enabled regions")
+    else:
+        regions = [r.strip() for value in args.region for r in value.split(',') if r.strip()]
+        account_regions = {account: regions for account in accounts}
+
+    regions = sorted({region for account_region_list in account_regions.values() for region in account_region_list})
+    logger.info(f"Starting comprehensive AWS inventory for regions: {', '.join(regions)}"
+                + (f" in {len(accounts)} accounts" if accounts != [None] else ''))
+    store = SnapshotStore(args.snapshot_db, args.refresh_after * 3600) if args.snapshot_db else None
+    try:
+        results = run_inventory(args.services, account_regions, output_dir, account_pool, args.parallel, store,
+                                args.format)
+    finally:
+        if store is not None:
+            store.close()
+    results.extend(
+        {'job': f"{account} regions", 'success': False, 'error': error, 'duration': 0}
+        for account, error in lookup_errors.items()
+    )
+    failed = [r for r in results if not r['success']]
+
+    logger.info("=" * 50)
+    logger.info("SUMMARY")
+    logger.info("=" * 50)
+    for result in sorted(results, key=lambda r: r['job']):
+        status = 'OK' if result['success'] else 'FAILED'
+        logger.info(f"{result['job']:<30} {status:<7} {result['duration']:.1f}s")
+    logger.info(f"Total wall time: {time.monotonic() - start:.1f}s")
+    logger.info(f"Inventory complete! Output saved to: {output_dir}")
+    logger.info("=" * 50)
+    logger.info("SLOWEST API OPERATIONS")
+    metrics.log_summary()
+    metrics.write(args.metrics_json, args.metrics_prom)
+
+    if failed:
+        logger.warning(f"{len(failed)} inventory job(s) failed. See log for details.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,90 +1,33 @@
-import boto3
 import json
 import logging
 import os
+import sys
 import time  # Add import for time.sleep
 from datetime import datetime
 
+# ssm_poller.py, aws_clients.py, api_metrics.py, instance_selector.py and run_journal.py are deployed next to
+# this file in the Lambda package; when run from the repository they are loaded from the shared common directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', '..', 'common'))
+from api_metrics import ApiMetrics
+from aws_clients import ClientFactory
+from instance_selector import Condition, InstanceSelector
+from run_journal import DONE, FAILED, PENDING, STARTED, open_journal
+from ssm_poller import SSMCommandPoller
+
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-ssm = boto3.client('ssm')
-ec2 = boto3.client('ec2')
-
-def get_running_instances():
-    """Get running EC2 instances based on configuration"""
-    try:
-        # Check for specific instance IDs in environment variable
-        specific_instances = os.environ.get('TARGET_INSTANCE_IDS', '')
-        if specific_instances:
-            instance_ids = [id.strip() for id in specific_instances.split(',')]
-            logger.info(f"Filtering for specific instances: {instance_ids}")
-            return instance_ids
-            
-        # Check for instance tags in environment variables
-        target_tag_key = os.environ.get('TARGET_TAG_KEY', '')
-        target_tag_value = os.environ.get('TARGET_TAG_VALUE', '')
-        
-        if target_tag_key and target_tag_value:
-            filters = [
-                {'Name': 'instance-state-name', 'Values': ['running']},
-                {'Name': f'tag:{target_tag_key}', 'Values': [target_tag_value]}
-            ]
-            
-            logger.info(f"Filtering instances by tag {target_tag_key}={target_tag_value}")
-            
-            instances = []
-            paginator = ec2.get_paginator('describe_instances')
-            for page in paginator.paginate(Filters=filters):
-                for reservation in page['Reservations']:
-                    instances.extend(reservation['Instances'])
-            
-            instance_ids = [inst['InstanceId'] for inst in instances]
-            logger.info(f"Found {len(instance_ids)} matching instances")
-            return instance_ids
-        
-        # If neither specific instances nor tags are provided, raise an error
-        raise ValueError(
-            "No target instances specified. Please set either TARGET_INSTANCE_IDS "
-            "or both TARGET_TAG_KEY and TARGET_TAG_VALUE environment variables."
-        )
-        
-    except Exception as e:
-        logger.error(f"Error getting instances: {str(e)}")
-        raise
-
-def get_command_output(command_id, instance_id):
-    """Get the command output from SSM for a specific instance"""
-    try:
-        # Wait briefly for command to complete
-        time.sleep(2)
-        response = ssm.get_command_invocation(
-            CommandId=command_id,
-            InstanceId=instance_id
-        )
-        return {
-            'Status': response['Status'],
-            'Output': response.get('StandardOutputContent', ''),
-            'Error': response.get('StandardErrorContent', '')
-        }
-    except Exception as e:
-        logger.error(f"Failed to get command output for instance {instance_id}: {str(e)}")
-        return {
-            'Status': 'Failed',
-            'Output': '',
-            'Error': f"Failed to get command output: {str(e)}"
-        }
+# Initialize rate-limited AWS clients; throttled calls are retried with
+# adaptive backoff instead of being reported as failed restarts. Every call is
+# measured and reported as CloudWatch embedded metrics at the end of each invocation.
+metrics = ApiMetrics('restart_containers')
+clients = ClientFactory(metrics=metrics)
+ssm = clients.client('ssm')
+ec2 = clients.client('ec2')
 
-def restart_containers(instance_ids):
-    """Restart Docker containers on specified instances"""
-    if not instance_ids:
-        logger.info("No running instances found")
-        return
-    
-    # Command to restart Docker containers with minimal state logging
-    command = """
+# Command to restart Docker containers with minimal state logging
+RESTART_COMMAND = """
         #!/bin/bash
         
         # Get current timestamp
@@ -113,50 +56,164 @@ def restart_containers(instance_ids):
             echo "No jplatform container found running"
             exit 1
         fi
-    """
+"""
+
+# send_command accepts at most 50 instance IDs per call
+MAX_INSTANCES_PER_COMMAND = 50
+
+def get_running_instances():
+    """Get running EC2 instances based on configuration"""
+    try:
+        # Check for specific instance IDs in environment variable
+        specific_instances = os.environ.get('TARGET_INSTANCE_IDS', '')
+        if specific_instances:
+            instance_ids = [id.strip() for id in specific_instances.split(',')]
+            logger.info(f"Filtering for specific instances: {instance_ids}")
+            return instance_ids
+            
+        # Check for an instance selector or instance tags in environment variables
+        target_selector = os.environ.get('TARGET_SELECTOR', '')
+        target_tag_key = os.environ.get('TARGET_TAG_KEY', '')
+        target_tag_value = os.environ.get('TARGET_TAG_VALUE', '')
+        
+        if target_selector:
+            selector = InstanceSelector.parse(target_selector)
+        elif target_tag_key and target_tag_value:
+            selector = InstanceSelector([Condition(f'tag:{target_tag_key}', [target_tag_value])])
+        else:
+            # If neither specific instances, a selector nor tags are provided, raise an error
+            raise ValueError(
+                "No target instances specified. Please set either TARGET_INSTANCE_IDS, "
+                "TARGET_SELECTOR or both TARGET_TAG_KEY and TARGET_TAG_VALUE environment variables."
+            )
+        
+        # Containers can only be restarted on running instances
+        selector = selector.with_default('state', ['running'])
+        logger.info(f"Filtering instances by selector {selector}")
+        
+        instance_ids = [inst['InstanceId'] for inst in selector.describe(ec2)]
+        logger.info(f"Found {len(instance_ids)} matching instances")
+        return instance_ids
+        
+    except Exception as e:
+        logger.error(f"Error getting instances: {str(e)}")
+        raise
+
+def open_run_journal():
+    """Open the journal configured in JOURNAL_LOCATION, or return None if none is configured"""
+    location = os.environ.get('JOURNAL_LOCATION', '')
+    if not location:
+        return None
+    # A journal written for other targets is discarded
+    params = {name: os.environ.get(name, '')
+              for name in ('TARGET_INSTANCE_IDS', 'TARGET_SELECTOR', 'TARGET_TAG_KEY', 'TARGET_TAG_VALUE')}
+    return open_journal(location, 'restart_containers', params, s3_client=clients.client('s3'))
+
+def track_started(poller, journal):
+    """Track the commands an earlier invocation sent but did not see finish"""
+    commands = {}
+    for instance_id in journal.ids(STARTED):
+        commands.setdefault(journal.get(instance_id)['command_id'], []).append(instance_id)
+    for command_id, instance_ids in commands.items():
+        logger.info(f"Resuming results of command {command_id} on {len(instance_ids)} instances")
+        poller.track(command_id, instance_ids)
+
+def hand_off(event, context, made_progress):
+    """Invoke this function again to continue with the instances that are left"""
+    if context is None or os.environ.get('HANDOFF_INVOKE', 'true').lower() != 'true':
+        logger.info("The remaining instances will be resumed from the journal by the next scheduled invocation")
+        return False
+    if not made_progress:
+        logger.error("No instance finished in this invocation, not invoking again; "
+                     "the next scheduled invocation resumes from the journal")
+        return False
+    clients.client('lambda').invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType='Event',
+        Payload=json.dumps(event).encode()
+    )
+    logger.info("Handed off the remaining instances to a new invocation")
+    return True
+
+def log_command_output(result):
+    """Log the final output of a command on one instance"""
+    logger.info(f"Command output for instance {result['InstanceId']}:")
+    logger.info(f"Status: {result['Status']}")
+    if result['Output']:
+        logger.info(f"Output:\n{result['Output']}")
+    if result['Error']:
+        logger.info(f"Error:\n{result['Error']}")
+
+def collect_results(results, poller, timeout, journal=None, deadline=None):
+    """Wait for all tracked commands and add their final statuses to results"""
+    expire = True
+    if deadline is not None and deadline - time.monotonic() < timeout:
+        # Leave the commands that are still running to the next invocation
+        timeout = max(0, deadline - time.monotonic())
+        expire = False
+    
+    for (command_id, instance_id), command_output in poller.wait(timeout, expire).items():
+        if journal:
+            journal.record(instance_id, DONE if command_output['Status'] == 'Success' else FAILED,
+                           status=command_output['Status'])
+        if command_output['Status'] == 'Success':
+            results['successful'].append({
+                'instance_id': instance_id,
+                'command_id': command_id,
+                'status': command_output['Status'],
+                'output': command_output['Output']
+            })
+        else:
+            results['failed'].append({
+                'instance_id': instance_id,
+                'command_id': command_id,
+                'status': command_output['Status'],
+                'error': f"Command failed with status {command_output['Status']}: "
+                         f"{command_output['Error'] or command_output['Output']}"
+            })
+
+def restart_containers(instance_ids, timeout=120, journal=None, deadline=None):
+    """Restart Docker containers on specified instances"""
+    if not instance_ids and not (journal and journal.ids(STARTED)):
+        logger.info("No running instances found")
+        return
     
     results = {
         'successful': [],
         'failed': []
     }
     
+    # Results of every command are collected in bulk as soon as they finish
+    poller = SSMCommandPoller(ssm, on_result=log_command_output)
+    if journal:
+        track_started(poller, journal)
+    
     # Process instances one by one with delay
     for i, instance_id in enumerate(instance_ids):
+        if deadline is not None and time.monotonic() >= deadline:
+            logger.warning(f"Stopping before the Lambda timeout with {len(instance_ids) - i} instances left")
+            break
         try:
             # Add 5-second delay between instances (except for the first one)
             if i > 0:
                 logger.info("Waiting 5 seconds before processing next instance...")
                 time.sleep(5)
+                poller.poll_once()
             
             logger.info(f"Processing instance: {instance_id}")
             response = ssm.send_command(
                 InstanceIds=[instance_id],
                 DocumentName='AWS-RunShellScript',
-                Parameters={'commands': [command]},
+                Parameters={'commands': [RESTART_COMMAND]},
                 TimeoutSeconds=3600
             )
             
             command_id = response['Command']['CommandId']
             logger.info(f"Initiated jplatform container restart on instance {instance_id} with command ID: {command_id}")
-            
-            # Get command output
-            command_output = get_command_output(command_id, instance_id)
-            logger.info(f"Command output for instance {instance_id}:")
-            logger.info(f"Status: {command_output['Status']}")
-            if command_output['Output']:
-                logger.info(f"Output:\n{command_output['Output']}")
-            if command_output['Error']:
-                logger.info(f"Error:\n{command_output['Error']}")
-            
-            if command_output['Status'] in ['Success', 'InProgress']:
-                results['successful'].append({
-                    'instance_id': instance_id,
-                    'command_id': command_id,
-                    'status': command_output['Status'],
-                    'output': command_output['Output']
-                })
-            else:
-                raise Exception(f"Command failed with status {command_output['Status']}: {command_output['Error']}")
+            poller.track(command_id, [instance_id])
+            if journal:
+                journal.record(instance_id, STARTED, command_id=command_id)
+                journal.flush()
             
         except Exception as e:
             error_msg = f"Failed to process instance {instance_id}: {str(e)}"
@@ -165,7 +222,103 @@ def restart_containers(instance_ids):
                 'instance_id': instance_id,
                 'error': str(e)
             })
+            if journal:
+                journal.record(instance_id, FAILED, error=str(e))
+            continue
+    
+    # Wait for the commands that are still running
+    collect_results(results, poller, timeout, journal, deadline)
+    
+    # Log summary
+    logger.info(f"Processing complete. Successfully processed {len(results['successful'])} instances, "
+                f"Failed to process {len(results['failed'])} instances")
+    
+    if results['failed']:
+        logger.error("Failed instances:")
+        for failure in results['failed']:
+            logger.error(f"Instance {failure['instance_id']}: {failure['error']}")
+    
+    return results
+
+def error_budget(max_errors, total):
+    """Convert a MaxErrors value (count or percentage) into an absolute count"""
+    if max_errors.endswith('%'):
+        return int(total * float(max_errors[:-1]) / 100)
+    return int(max_errors)
+
+def restart_containers_in_waves(instance_ids, wave_size, max_concurrency='100%', max_errors='0', wave_timeout=600,
+                                journal=None, deadline=None):
+    """Restart Docker containers in rolling waves of multi-instance SSM commands"""
+    if not instance_ids and not (journal and journal.ids(STARTED)):
+        logger.info("No running instances found")
+        return
+    
+    results = {
+        'successful': [],
+        'failed': []
+    }
+    
+    wave_size = min(wave_size, MAX_INSTANCES_PER_COMMAND)
+    # A resumed run keeps the error budget of the whole run
+    budget = error_budget(max_errors, len(journal.ids()) if journal else len(instance_ids))
+    failed_before = len(journal.ids(FAILED)) if journal else 0
+    
+    # Finish the wave an earlier invocation left running
+    if journal and journal.ids(STARTED):
+        poller = SSMCommandPoller(ssm, on_result=log_command_output, initial_delay=2)
+        track_started(poller, journal)
+        collect_results(results, poller, wave_timeout, journal, deadline)
+    
+    waves = [instance_ids[i:i + wave_size] for i in range(0, len(instance_ids), wave_size)]
+    logger.info(f"Restarting {len(instance_ids)} instances in {len(waves)} waves of up to {wave_size} "
+                f"(MaxConcurrency={max_concurrency}, MaxErrors={max_errors})")
+    
+    for wave_number, wave in enumerate(waves, start=1):
+        # Stop rolling out once the error budget is exhausted
+        if failed_before + len(results['failed']) > budget:
+            logger.error(f"Error budget of {budget} exhausted, skipping remaining waves")
+            for instance_id in [i for w in waves[wave_number - 1:] for i in w]:
+                results['failed'].append({
+                    'instance_id': instance_id,
+                    'status': 'Skipped',
+                    'error': 'Not attempted because the error budget was exhausted'
+                })
+                if journal:
+                    journal.record(instance_id, FAILED, status='Skipped')
+            break
+        
+        if deadline is not None and time.monotonic() >= deadline:
+            logger.warning(f"Stopping before the Lambda timeout with {len(waves) - wave_number + 1} waves left")
+            break
+        
+        logger.info(f"Processing wave {wave_number}/{len(waves)}: {wave}")
+        try:
+            response = ssm.send_command(
+                InstanceIds=wave,
+                DocumentName='AWS-RunShellScript',
+                Parameters={'commands': [RESTART_COMMAND]},
+                TimeoutSeconds=3600,
+                MaxConcurrency=max_concurrency,
+                MaxErrors=max_errors
+            )
+        except Exception as e:
+            logger.error(f"Failed to send command for wave {wave_number}: {str(e)}")
+            for instance_id in wave:
+                results['failed'].append({'instance_id': instance_id, 'status': 'Failed', 'error': str(e)})
+                if journal:
+                    journal.record(instance_id, FAILED, error=str(e))
             continue
+        
+        command_id = response['Command']['CommandId']
+        logger.info(f"Initiated jplatform container restart on wave {wave_number} with command ID: {command_id}")
+        if journal:
+            for instance_id in wave:
+                journal.record(instance_id, STARTED, command_id=command_id)
+            journal.flush()
+        
+        poller = SSMCommandPoller(ssm, on_result=log_command_output, initial_delay=2)
+        poller.track(command_id, wave)
+        collect_results(results, poller, wave_timeout, journal, deadline)
     
     # Log summary
     logger.info(f"Processing complete. Successfully processed {len(results['successful'])} instances, "
@@ -180,19 +333,67 @@ def restart_containers(instance_ids):
 
 def lambda_handler(event, context):
     """Main Lambda handler"""
+    metrics.reset()
+    journal = None
     try:
-        # Get all running EC2 instances
-        instance_ids = get_running_instances()
-        logger.info(f"Found {len(instance_ids)} running instances")
+        # With a journal, stop sending commands before the Lambda times out
+        # and continue with the remaining instances in another invocation
+        journal = open_run_journal()
+        deadline = None
+        if journal and context is not None:
+            reserve = int(os.environ.get('HANDOFF_RESERVE_SECONDS', '60'))
+            deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000 - reserve
+        
+        if journal and journal.resumed:
+            instance_ids = journal.ids(PENDING)
+            logger.info(f"Resuming from journal: {len(instance_ids)} pending and "
+                        f"{len(journal.ids(STARTED))} started instances")
+        else:
+            # Get all running EC2 instances
+            instance_ids = get_running_instances()
+            logger.info(f"Found {len(instance_ids)} running instances")
+            if journal:
+                for instance_id in instance_ids:
+                    journal.add(instance_id)
+                journal.flush()
+        unfinished = len(journal.ids(PENDING, STARTED)) if journal else 0
         
-        # Restart containers on all instances
-        results = restart_containers(instance_ids)
+        # Restart containers on all instances, in rolling waves if configured
+        wave_size = int(os.environ.get('WAVE_SIZE', '0'))
+        if wave_size > 0:
+            results = restart_containers_in_waves(
+                instance_ids,
+                wave_size,
+                max_concurrency=os.environ.get('MAX_CONCURRENCY', '100%'),
+                max_errors=os.environ.get('MAX_ERRORS', '0'),
+                wave_timeout=int(os.environ.get('WAVE_TIMEOUT_SECONDS', '600')),
+                journal=journal,
+                deadline=deadline
+            )
+        else:
+            results = restart_containers(
+                instance_ids,
+                timeout=int(os.environ.get('RESULT_TIMEOUT_SECONDS', '120')),
+                journal=journal,
+                deadline=deadline
+            )
+        
+        remaining = 0
+        if journal:
+            remaining = len(journal.ids(PENDING, STARTED))
+            if remaining:
+                logger.info(f"{remaining} instances left for the next invocation")
+                journal.flush()
+                hand_off(event, context, made_progress=remaining < unfinished)
+            else:
+                journal.complete()
         
         return {
             'statusCode': 200,
             'body': json.dumps({
                 'message': 'Container restart initiated successfully',
                 'results': results,
+                'remaining': remaining,
                 'timestamp': datetime.now().isoformat()
             })
         }
@@ -205,4 +406,11 @@ def lambda_handler(event, context):
                 'error': str(e),
                 'timestamp': datetime.now().isoformat()
             })
-        } 
\ No newline at end of file
+        }
+    finally:
+        if journal:
+            try:
+                journal.close()
+            except Exception as e:
+                logger.error(f"Failed to save journal: {str(e)}")
+        metrics.print_emf(os.environ.get('METRICS_NAMESPACE', 'CloudPlatformScripts')) 
\ No newline at end of file
@@ -24,6 +24,17 @@ show_progress() {
     echo "[$(date '+%Y-%m-%d %H:%M:%S')] $1"
 }
 
+# Function to write a CSV row, quoting every field and doubling embedded quotes
+csv_row() {
+    local first=1 field
+    for field in "$@"; do
+        (( first )) || printf ','
+        printf '"%s"' "${field//\"/\"\"}"
+        first=0
+    done
+    printf '\n'
+}
+
 # Parse command line arguments
 output_file=""
 project_filter=""
@@ -64,8 +75,9 @@ fi
 
 show_progress "Found ${#projects[@]} accessible projects"
 
-# Create CSV header
-echo "project,bucket_name,location,storage_class,versioning,lifecycle_rules,retention_policy,public_access,labels,creation_time" > "$output_file"
+# Create CSV header and keep the output file open for all rows
+exec 3>"$output_file"
+echo "project,bucket_name,location,storage_class,versioning,lifecycle_rules,retention_policy,public_access,labels,creation_time" >&3
 
 # Process each project
 for project in "${projects[@]}"; do
@@ -86,30 +98,29 @@ for project in "${projects[@]}"; do
     # Get buckets in the project
     show_progress "Fetching buckets for project: $project"
     
-    while IFS=, read -r bucket_name location storage_class versioning lifecycle retention public_access labels creation_time; do
-        # Skip if no buckets found or header line
-        if [[ -n "$bucket_name" && "$bucket_name" != "name" ]]; then
+    # Fields are separated by | because labels can contain commas
+    while IFS='|' read -r bucket_name location storage_class versioning lifecycle retention public_access labels creation_time; do
+        # Skip if no buckets found
+        if [[ -n "$bucket_name" ]]; then
             # Clean up labels string (remove brackets and quotes)
             labels=$(echo "$labels" | tr -d '[]"' | sed 's/:/=/g')
             
-            # Format lifecycle rules count
-            if [[ "$lifecycle" == "[]" ]]; then
-                lifecycle="0"
-            else
-                lifecycle=$(echo "$lifecycle" | tr -cd '[' | wc -c)
-            fi
+            # Lifecycle rules are listed as a count
+            lifecycle=${lifecycle:-0}
             
             # Clean up retention policy (yes/no)
-            if [[ "$retention" == "null" ]]; then
+            if [[ -z "$retention" ]]; then
                 retention="no"
             else
                 retention="yes"
             fi
             
-            echo "$project,$bucket_name,$location,$storage_class,$versioning,$lifecycle,$retention,$public_access,$labels,$creation_time" >> "$output_file"
+            csv_row "$project" "$bucket_name" "$location" "$storage_class" "$versioning" "$lifecycle" \
+                "$retention" "$public_access" "$labels" "$creation_time" >&3
         fi
-    done < <(gsutil ls -p "$project" -L -b 2>/dev/null | \
-        gcloud storage buckets list --project="$project" --format="csv[no-heading](name,location,storageClass,versioning.enabled,lifecycle.rule,retentionPolicy,iamConfiguration.publicAccessPrevention,labels,timeCreated)")
+    done < <(gcloud storage buckets list --project="$project" --format="csv[no-heading,separator='|'](name,location,storageClass,versioning.enabled,lifecycle.rule.len(),retentionPolicy.retentionPeriod,iamConfiguration.publicAccessPrevention,labels,timeCreated)")
 done
 
+exec 3>&-
+
 show_progress "Storage Inventory complete! Output saved to: $output_file" 
\ No newline at end of file
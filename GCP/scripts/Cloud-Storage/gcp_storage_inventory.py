@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+GCP Cloud Storage Inventory Collector
+
+This script generates the same CSV inventory as Cloud-Storage-inventory.sh
+through the shared project scheduler:
+
+- Projects are listed once and processed concurrently, without a separate
+  gcloud projects describe call per project
+- Projects where the Cloud Storage API is not enabled are skipped using a
+  cached index of enabled APIs instead of a gcloud services list call per
+  project on every run
+- Each project's buckets come from a single gcloud storage buckets list call
+- Rows are written to the output file as each project finishes
+
+Usage:
+    python gcp_storage_inventory.py [--output FILE] [--filter FILTER] [--parallel N]
+
+Options:
+    -o, --output    Output file (default: gcp-buckets-all-projects_TIMESTAMP.csv)
+    -f, --filter    Filter projects (e.g., 'name:prod-*' or 'labels.env=prod')
+    --format        csv, jsonl, parquet or sqlite (default: from the output file extension)
+    --parallel      Number of projects to process in parallel (default: 8)
+    --api-cache     Enabled API index file (default: ~/.cache/gcp-enabled-apis.json)
+    --api-cache-ttl Hours after which enabled APIs are looked up again (default: 24)
+    --help          Show this help message and exit
+"""
+
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'common'))
+from gcp_projects import DEFAULT_API_CACHE_FILE, EnabledApiIndex, ProjectScheduler, list_projects, run_gcloud
+from inventory_writer import FORMAT_EXTENSIONS, InventoryWriter
+
+logger = logging.getLogger(__name__)
+
+CSV_HEADER = [
+    'project', 'bucket_name', 'location', 'storage_class', 'versioning', 'lifecycle_rules',
+    'retention_policy', 'public_access', 'labels', 'creation_time'
+]
+
+# Services that make the collector run in a project
+APIS = ['storage-api.googleapis.com', 'storage.googleapis.com']
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Generate GCP Cloud Storage inventory across projects')
+    parser.add_argument('-o', '--output', help='Output file (default: gcp-buckets-all-projects_TIMESTAMP.csv)')
+    parser.add_argument('-f', '--filter', help="Filter projects (e.g., 'name:prod-*' or 'labels.env=prod')")
+    parser.add_argument('--format', choices=list(FORMAT_EXTENSIONS),
+                        help='Output format (default: from the output file extension, else csv)')
+    parser.add_argument('--parallel', type=int, default=8, help='Number of projects to process in parallel')
+    parser.add_argument('--api-cache', default=DEFAULT_API_CACHE_FILE, help='Enabled API index file')
+    parser.add_argument('--api-cache-ttl', type=float, default=24,
+                        help='Hours after which enabled APIs are looked up again')
+    return parser.parse_args()
+
+
+def setup_logging():
+    """Log to the console and to a timestamped log file"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(f"storage_inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+        ]
+    )
+
+
+def build_row(project, bucket):
+    """
+    Build a CSV row for a bucket
+
+    Args:
+        project (str): Project ID
+        bucket (dict): Bucket resource from gcloud storage buckets list --raw
+
+    Returns:
+        list: CSV row matching CSV_HEADER
+    """
+    return [
+        project,
+        bucket['name'],
+        bucket.get('location', ''),
+        bucket.get('storageClass', ''),
+        bucket.get('versioning', {}).get('enabled', False),
+        len(bucket.get('lifecycle', {}).get('rule', [])),
+        'yes' if bucket.get('retentionPolicy') else 'no',
+        bucket.get('iamConfiguration', {}).get('publicAccessPrevention', ''),
+        ';'.join(f"{key}={value}" for key, value in sorted(bucket.get('labels', {}).items())),
+        bucket.get('timeCreated', '')
+    ]
+
+
+def collect_project(project):
+    """
+    Collect the inventory rows of one project
+
+    Args:
+        project (str): Project ID
+
+    Returns:
+        list: CSV rows matching CSV_HEADER
+    """
+    # --raw returns the API field names (storageClass, iamConfiguration, ...)
+    buckets = run_gcloud(['storage', 'buckets', 'list', '--project', project, '--raw'])
+    return [build_row(project, bucket) for bucket in buckets]
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    setup_logging()
+    extension = FORMAT_EXTENSIONS[args.format or 'csv']
+    output_file = args.output or f"gcp-buckets-all-projects_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
+
+    logger.info("Fetching list of accessible projects...")
+    try:
+        projects = list_projects(args.filter)
+    except RuntimeError as e:
+        logger.error(f"Error listing projects: {str(e)}")
+        return 1
+    if not projects:
+        logger.error("No accessible projects found")
+        return 1
+    logger.info(f"Found {len(projects)} accessible projects")
+
+    api_index = EnabledApiIndex(args.api_cache, args.api_cache_ttl * 3600)
+    scheduler = ProjectScheduler(api_index, args.parallel)
+    try:
+        with InventoryWriter(output_file, CSV_HEADER, args.format) as writer:
+            for _, _, rows in scheduler.run(projects, {'Storage': {'apis': APIS, 'collect': collect_project}}):
+                writer.write_many(rows)
+    finally:
+        api_index.save()
+
+    logger.info(f"Storage Inventory complete! {writer.count} buckets saved to: {output_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
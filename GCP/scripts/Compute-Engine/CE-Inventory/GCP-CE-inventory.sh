@@ -24,6 +24,17 @@ show_progress() {
     echo "[$(date '+%Y-%m-%d %H:%M:%S')] $1"
 }
 
+# Function to write a CSV row, quoting every field and doubling embedded quotes
+csv_row() {
+    local first=1 field
+    for field in "$@"; do
+        (( first )) || printf ','
+        printf '"%s"' "${field//\"/\"\"}"
+        first=0
+    done
+    printf '\n'
+}
+
 # Parse command line arguments
 output_file=""
 project_filter=""
@@ -64,8 +75,9 @@ fi
 
 show_progress "Found ${#projects[@]} accessible projects"
 
-# Create CSV header
-echo "project,name,zone,machine_type,vcpu,memory_gb,status,network_ip,external_ip,disk_name,disk_size_gb,creation_timestamp,tags,labels" > "$output_file"
+# Create CSV header and keep the output file open for all rows
+exec 3>"$output_file"
+echo "project,name,zone,machine_type,vcpu,memory_gb,status,network_ip,external_ip,disk_name,disk_size_gb,creation_timestamp,tags,labels" >&3
 
 # Initialize machine type cache
 declare -A machine_type_cache
@@ -83,12 +95,9 @@ for project in "${projects[@]}"; do
     # Get instances and their zones
     show_progress "Fetching instances for project: $project"
     
-    while IFS=, read -r instance zone machine_type rest; do
-        # Skip header line
-        if [[ $instance != "name" ]]; then
-            # Extract zone from full zone path
-            zone=$(echo "$zone" | cut -d'/' -f9)
-            
+    # Fields are separated by | because tags, labels and disk names can contain commas
+    while IFS='|' read -r instance zone machine_type status network_ip external_ip disk_names disk_size creation_timestamp tags labels; do
+        if [[ -n "$instance" ]]; then
             # Use cached machine details if available
             cache_key="${project}_${zone}_${machine_type}"
             if [[ -z "${machine_type_cache[$cache_key]:-}" ]]; then
@@ -105,10 +114,13 @@ for project in "${projects[@]}"; do
             memory_gb=$(awk -v mem="$memory_mb" 'BEGIN {printf "%.1f", mem/1024}')
 
             # Output all details
-            echo "$project,$instance,$zone,$machine_type,$vcpu,$memory_gb,$rest" >> "$output_file"
+            csv_row "$project" "$instance" "$zone" "$machine_type" "$vcpu" "$memory_gb" "$status" "$network_ip" \
+                "$external_ip" "$disk_names" "$disk_size" "$creation_timestamp" "$tags" "$labels" >&3
         fi
     done < <(gcloud compute instances list --project "$project" \
-        --format="csv(name,zone,machine_type.basename(),status,networkInterfaces[0].networkIP,networkInterfaces[0].accessConfigs[0].natIP,disks.deviceName,disks[0].diskSizeGb,creationTimestamp,tags.items,labels)")
+        --format="csv[no-heading,separator='|'](name,zone.basename(),machine_type.basename(),status,networkInterfaces[0].networkIP,networkInterfaces[0].accessConfigs[0].natIP,disks.deviceName,disks[0].diskSizeGb,creationTimestamp,tags.items,labels)")
 done
 
+exec 3>&-
+
 show_progress "Inventory complete! Output saved to: $output_file"
\ No newline at end of file
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+GCP Compute Engine Inventory Collector
+
+This script generates the same CSV inventory as GCP-CE-inventory.sh for many
+projects in minutes instead of hours:
+
+- Projects are processed concurrently by the shared project scheduler,
+  without a separate gcloud projects describe call per project, and skipped
+  when the Compute Engine API is not enabled (from a cached API index)
+- Instances are listed with one aggregated call per project across all zones
+- Machine types are preloaded in bulk, one call per project for every zone
+  that is not cached yet, into an on-disk cache that is shared between runs
+  and expires after --cache-ttl hours
+- Rows are written to the output file as each project finishes
+
+Usage:
+    python gcp_ce_inventory.py [--output FILE] [--filter FILTER] [--parallel N]
+
+Options:
+    -o, --output    Output file (default: gcp-instances-all-projects_TIMESTAMP.csv)
+    -f, --filter    Filter projects (e.g., 'name:prod-*' or 'labels.env=prod')
+    --format        csv, jsonl, parquet or sqlite (default: from the output file extension)
+    --parallel      Number of projects to process in parallel (default: 8)
+    --cache-file    Machine type cache file (default: ~/.cache/gcp-machine-types.json)
+    --cache-ttl     Hours after which cached machine types are fetched again (default: 168)
+    --api-cache     Enabled API index file (default: ~/.cache/gcp-enabled-apis.json)
+    --api-cache-ttl Hours after which enabled APIs are looked up again (default: 24)
+    --help          Show this help message and exit
+"""
+
+import argparse
+import functools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', '..', 'common'))
+from gcp_projects import DEFAULT_API_CACHE_FILE, EnabledApiIndex, ProjectScheduler, list_projects, run_gcloud
+from inventory_writer import FORMAT_EXTENSIONS, InventoryWriter
+
+logger = logging.getLogger(__name__)
+
+CSV_HEADER = [
+    'project', 'name', 'zone', 'machine_type', 'vcpu', 'memory_gb', 'status',
+    'network_ip', 'external_ip', 'disk_name', 'disk_size_gb', 'creation_timestamp',
+    'tags', 'labels'
+]
+
+# Services that make the collector run in a project
+APIS = ['compute.googleapis.com']
+
+DEFAULT_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'gcp-machine-types.json')
+
+# Custom machine types encode their size in the name, e.g. n2-custom-4-16384
+CUSTOM_TYPE_PATTERN = re.compile(r'custom-(\d+)-(\d+)(-ext)?$')
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Generate GCP Compute Engine inventory across projects')
+    parser.add_argument('-o', '--output', help='Output file (default: gcp-instances-all-projects_TIMESTAMP.csv)')
+    parser.add_argument('-f', '--filter', help="Filter projects (e.g., 'name:prod-*' or 'labels.env=prod')")
+    parser.add_argument('--format', choices=list(FORMAT_EXTENSIONS),
+                        help='Output format (default: from the output file extension, else csv)')
+    parser.add_argument('--parallel', type=int, default=8, help='Number of projects to process in parallel')
+    parser.add_argument('--cache-file', default=DEFAULT_CACHE_FILE, help='Machine type cache file')
+    parser.add_argument('--cache-ttl', type=float, default=168,
+                        help='Hours after which cached machine types are fetched again')
+    parser.add_argument('--api-cache', default=DEFAULT_API_CACHE_FILE, help='Enabled API index file')
+    parser.add_argument('--api-cache-ttl', type=float, default=24,
+                        help='Hours after which enabled APIs are looked up again')
+    return parser.parse_args()
+
+
+def setup_logging():
+    """Log to the console and to a timestamped log file"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(f"inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+        ]
+    )
+
+
+class MachineTypeCache:
+    """
+    On-disk cache of machine type sizes, shared by all projects and runs
+
+    Predefined machine types have the same size in every project, so entries
+    are keyed by zone and machine type name. A zone's entries are fetched
+    again once they are older than the TTL.
+
+    Args:
+        path (str): JSON cache file
+        ttl (float): Seconds after which a zone's machine types expire
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._zones = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._zones = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable machine type cache {path}: {str(e)}")
+
+    def missing_zones(self, needed):
+        """
+        Find the zones that must be fetched to resolve machine types
+
+        Args:
+            needed (dict): Mapping of zone to the set of machine type names used there
+
+        Returns:
+            list: Zones that are not cached, expired, or lack a needed machine type
+        """
+        oldest = time.time() - self.ttl
+        with self._lock:
+            return sorted(
+                zone for zone, types in needed.items()
+                if zone not in self._zones
+                or self._zones[zone]['fetched_at'] < oldest
+                or any(t not in self._zones[zone]['types'] and not CUSTOM_TYPE_PATTERN.search(t) for t in types)
+            )
+
+    def preload(self, project, zones):
+        """
+        Fetch the machine types of several zones with one aggregated call
+
+        Args:
+            project (str): Project used for the call
+            zones (list): Zone names
+        """
+        if not zones:
+            return
+        machine_types = run_gcloud(['compute', 'machine-types', 'list', '--project', project,
+                                    f"--zones={','.join(zones)}"])
+        fetched = {zone: {'fetched_at': time.time(), 'types': {}} for zone in zones}
+        for machine_type in machine_types:
+            zone = machine_type['zone'].split('/')[-1]
+            if zone in fetched:
+                fetched[zone]['types'][machine_type['name']] = [machine_type['guestCpus'], machine_type['memoryMb']]
+        with self._lock:
+            self._zones.update(fetched)
+        logger.info(f"Cached machine types for {len(zones)} zones from project {project}")
+
+    def lookup(self, zone, name):
+        """
+        Get the size of a machine type
+
+        Args:
+            zone (str): Zone name
+            name (str): Machine type name
+
+        Returns:
+            tuple: (vCPU count, memory in MB), or ('', '') if unknown
+        """
+        match = CUSTOM_TYPE_PATTERN.search(name)
+        if match:
+            return int(match.group(1)), int(match.group(2))
+        with self._lock:
+            size = self._zones.get(zone, {}).get('types', {}).get(name)
+        return tuple(size) if size else ('', '')
+
+    def save(self):
+        """Write the cache to disk atomically"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_file = f"{self.path}.{os.getpid()}.tmp"
+        with self._lock:
+            with open(temp_file, 'w') as f:
+                json.dump(self._zones, f)
+        os.replace(temp_file, self.path)
+
+
+def build_row(project, instance, cache):
+    """
+    Build a CSV row for an instance
+
+    Args:
+        project (str): Project ID
+        instance (dict): Instance resource from gcloud compute instances list
+        cache (MachineTypeCache): Machine type cache
+
+    Returns:
+        list: CSV row matching CSV_HEADER
+    """
+    zone = instance['zone'].split('/')[-1]
+    machine_type = instance['machineType'].split('/')[-1]
+    vcpu, memory_mb = cache.lookup(zone, machine_type)
+
+    interfaces = instance.get('networkInterfaces', [{}])
+    access_configs = interfaces[0].get('accessConfigs', [{}]) if interfaces else [{}]
+    disks = instance.get('disks', [])
+
+    return [
+        project,
+        instance['name'],
+        zone,
+        machine_type,
+        vcpu,
+        f"{memory_mb / 1024:.1f}" if memory_mb != '' else '',
+        instance.get('status', ''),
+        interfaces[0].get('networkIP', '') if interfaces else '',
+        access_configs[0].get('natIP', '') if access_configs else '',
+        ';'.join(disk.get('deviceName', '') for disk in disks),
+        disks[0].get('diskSizeGb', '') if disks else '',
+        instance.get('creationTimestamp', ''),
+        ';'.join(instance.get('tags', {}).get('items', [])),
+        ';'.join(f"{key}={value}" for key, value in sorted(instance.get('labels', {}).items()))
+    ]
+
+
+def collect_project(project, cache):
+    """
+    Collect the inventory rows of one project
+
+    Args:
+        project (str): Project ID
+        cache (MachineTypeCache): Machine type cache
+
+    Returns:
+        list: CSV rows matching CSV_HEADER
+    """
+    # Without --zones, gcloud lists instances with one aggregated call across all zones
+    instances = run_gcloud(['compute', 'instances', 'list', '--project', project])
+
+    needed = {}
+    for instance in instances:
+        zone = instance['zone'].split('/')[-1]
+        needed.setdefault(zone, set()).add(instance['machineType'].split('/')[-1])
+    cache.preload(project, cache.missing_zones(needed))
+
+    return [build_row(project, instance, cache) for instance in instances]
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    setup_logging()
+    extension = FORMAT_EXTENSIONS[args.format or 'csv']
+    output_file = args.output or f"gcp-instances-all-projects_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
+
+    logger.info("Fetching list of accessible projects...")
+    try:
+        projects = list_projects(args.filter)
+    except RuntimeError as e:
+        logger.error(f"Error listing projects: {str(e)}")
+        return 1
+    if not projects:
+        logger.error("No accessible projects found")
+        return 1
+    logger.info(f"Found {len(projects)} accessible projects")
+
+    cache = MachineTypeCache(args.cache_file, args.cache_ttl * 3600)
+    api_index = EnabledApiIndex(args.api_cache, args.api_cache_ttl * 3600)
+    scheduler = ProjectScheduler(api_index, args.parallel)
+    tasks = {'CE': {'apis': APIS, 'collect': functools.partial(collect_project, cache=cache)}}
+    try:
+        with InventoryWriter(output_file, CSV_HEADER, args.format) as writer:
+            for _, _, rows in scheduler.run(projects, tasks):
+                writer.write_many(rows)
+    finally:
+        cache.save()
+        api_index.save()
+
+    logger.info(f"Inventory complete! {writer.count} instances saved to: {output_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,8 @@ TIMESTAMP=$(date '+%Y%m%d_%H%M%S')
 # Set script variables
 OUTPUT_FILE="gcp_instance_java-${TIMESTAMP}.csv"
 LOG_FILE="java_check-${TIMESTAMP}.log"
+JOBS=10
+export LOG_FILE
 
 # Function to log messages with timestamp
 log_message() {
@@ -16,9 +18,10 @@ log_message() {
 
 # Function to display usage
 usage() {
-    echo "Usage: $0 [-p PROJECT_ID] [-h]"
+    echo "Usage: $0 [-p PROJECT_ID] [-j JOBS] [-h]"
     echo "  -p PROJECT_ID    Specify a GCP project ID to check"
-    echo "  -h              Display this help message"
+    echo "  -j JOBS          Number of instances checked in parallel (default: 10)"
+    echo "  -h               Display this help message"
     echo
     echo "If no project is specified, script will check all accessible projects"
     exit 1
@@ -33,15 +36,23 @@ check_java() {
     log_message "Attempting to connect to instance $instance in zone $zone" >&2
 
     # Use the exact command that works
-    local java_output
-    java_output=$(gcloud compute ssh "$instance" \
-        --project="$project" \
-        --zone="$zone" \
-        --tunnel-through-iap \
-        --command="java -version 2>&1 || echo 'Java not installed'" \
-        2>/dev/null)
+    # The project is passed explicitly so parallel workers never touch the gcloud config.
+    # A failed first attempt is retried once, e.g. while a new SSH key propagates.
+    local java_output attempt rc
+    for attempt in 1 2; do
+        java_output=$(gcloud compute ssh "$instance" \
+            --project="$project" \
+            --zone="$zone" \
+            --tunnel-through-iap \
+            --quiet \
+            --command="java -version 2>&1 || echo 'Java not installed'" \
+            2>/dev/null)
+        rc=$?
+        [ $rc -eq 0 ] && break
+        [ $attempt -eq 1 ] && sleep 5
+    done
 
-    if [ $? -eq 0 ]; then
+    if [ $rc -eq 0 ]; then
         log_message "Successfully connected to instance $instance" >&2
         if [[ $java_output == *"version"* ]]; then
             # Extract version number
@@ -62,78 +73,70 @@ check_java() {
     fi
 }
 
-# Function to check Java versions for a specific project
-check_project() {
+# Function to check one instance and print its CSV row
+check_instance() {
+    local project=$1
+    local zone=$2
+    local instance_name=$3
+    local status version
+
+    log_message "Processing instance: $instance_name in zone: $zone" >&2
+
+    # Get Java status and version
+    IFS=, read -r status version <<< "$(check_java "$project" "$instance_name" "$zone")"
+
+    # Print the row in a single write so parallel workers never interleave lines
+    printf "%s,%s,%s,%s,%s\n" \
+        "$project" \
+        "$instance_name" \
+        "$zone" \
+        "${status:-Connection Failed}" \
+        "${version:-N/A}"
+}
+
+# Function to list the running instances of a project as "project zone instance" lines
+list_instances() {
     local project=$1
-    log_message "Starting check for project: $project"
-    
-    # Set the current project
-    log_message "Setting current project to $project"
-    gcloud config set project "$project" --quiet >/dev/null
-
-    # Get list of all instances in the project
-    log_message "Fetching list of instances in project $project"
+    log_message "Fetching list of instances in project $project" >&2
+
     local instance_list
     mapfile -t instance_list < <(gcloud compute instances list \
         --project="$project" \
-        --format="csv[no-heading](name,zone)" \
+        --format="csv[no-heading](name,zone.basename())" \
         --filter="status=RUNNING" 2>/dev/null)
-    
+
     if [ ${#instance_list[@]} -eq 0 ]; then
-        log_message "No instances found in project $project"
+        log_message "No instances found in project $project" >&2
         return
     fi
 
-    log_message "Found ${#instance_list[@]} instances in project $project"
+    log_message "Found ${#instance_list[@]} instances in project $project" >&2
 
-    # Debug: Print all instances
+    local instance_info name zone
     for instance_info in "${instance_list[@]}"; do
-        local name zone
         IFS=, read -r name zone <<< "$instance_info"
-        log_message "Found instance: $name in zone: $zone"
-    done
-
-    # Process each instance
-    for instance_info in "${instance_list[@]}"; do
-        local instance_name zone status version
-        IFS=, read -r instance_name zone <<< "$instance_info"
-        log_message "Processing instance: $instance_name in zone: $zone"
-        
-        # Get Java status and version
-        local java_check_output
-        java_check_output=$(check_java "$project" "$instance_name" "$zone")
-        IFS=, read -r status version <<< "$java_check_output"
-        
-        # Append to CSV file
-        printf "%s,%s,%s,%s,%s\n" \
-            "$project" \
-            "$instance_name" \
-            "$zone" \
-            "${status:-Connection Failed}" \
-            "${version:-N/A}" >> "$OUTPUT_FILE"
-        
-        # Add a small delay between instances
-        sleep 2
+        echo "$project $zone $name"
     done
-    
-    log_message "Completed checking project: $project"
 }
 
-# Function to check all projects
-check_all_projects() {
-    log_message "No project specified, checking all accessible projects"
+# Function to list the running instances of all accessible projects
+list_all_instances() {
+    log_message "No project specified, checking all accessible projects" >&2
+    local projects
     projects=$(gcloud projects list --format="value(projectId)")
-    
+
     if [ -z "$projects" ]; then
-        log_message "Error: No accessible projects found"
-        exit 1
+        log_message "Error: No accessible projects found" >&2
+        return 1
     fi
-    
+
     while read -r project; do
-        check_project "$project"
+        list_instances "$project"
     done <<< "$projects"
 }
 
+export -f log_message check_java check_instance
+
 # Initialize log file
 log_message "Starting Java version check script"
 
@@ -150,11 +153,14 @@ if ! gcloud auth list --filter=status:ACTIVE --format="value(account)" &> /dev/n
 fi
 
 # Parse command line arguments
-while getopts ":p:h" opt; do
+while getopts ":p:j:h" opt; do
     case ${opt} in
         p )
             PROJECT_ID=$OPTARG
             ;;
+        j )
+            JOBS=$OPTARG
+            ;;
         h )
             usage
             ;;
@@ -175,16 +181,35 @@ log_message "Creating output file: $OUTPUT_FILE"
     echo "Project ID,Instance Name,Zone,Java Status,Java Version"
 } > "$OUTPUT_FILE"
 
-# Execute based on arguments
+if ! [[ "$JOBS" =~ ^[1-9][0-9]*$ ]]; then
+    log_message "Error: -j requires a positive number"
+    usage
+fi
+
+# Verify project exists and is accessible
+if [ -n "$PROJECT_ID" ] && ! gcloud projects describe "$PROJECT_ID" &>/dev/null; then
+    log_message "Error: Project $PROJECT_ID not found or not accessible"
+    exit 1
+fi
+
+# Create the SSH key up front so parallel workers do not race to generate it
+if [ ! -f "$HOME/.ssh/google_compute_engine" ]; then
+    log_message "Creating SSH key $HOME/.ssh/google_compute_engine"
+    mkdir -p "$HOME/.ssh"
+    ssh-keygen -t rsa -N "" -q -f "$HOME/.ssh/google_compute_engine"
+fi
+
+# Instances are checked by up to JOBS workers as soon as their project is listed,
+# and each row is appended to the CSV as soon as its instance finishes
+log_message "Checking instances with $JOBS parallel workers"
 if [ -n "$PROJECT_ID" ]; then
-    # Verify project exists and is accessible
-    if ! gcloud projects describe "$PROJECT_ID" &>/dev/null; then
-        log_message "Error: Project $PROJECT_ID not found or not accessible"
-        exit 1
-    fi
-    check_project "$PROJECT_ID"
+    list_instances "$PROJECT_ID"
 else
-    check_all_projects
+    list_all_instances
+fi | xargs -n 3 -P "$JOBS" bash -c 'check_instance "$@"' _ >> "$OUTPUT_FILE"
+
+if [ "${PIPESTATUS[0]}" -ne 0 ]; then
+    exit 1
 fi
 
 log_message "Java version check completed. Results saved to $OUTPUT_FILE"
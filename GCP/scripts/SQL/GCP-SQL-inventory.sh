@@ -24,6 +24,17 @@ show_progress() {
     echo "[$(date '+%Y-%m-%d %H:%M:%S')] $1"
 }
 
+# Function to write a CSV row, quoting every field and doubling embedded quotes
+csv_row() {
+    local first=1 field
+    for field in "$@"; do
+        (( first )) || printf ','
+        printf '"%s"' "${field//\"/\"\"}"
+        first=0
+    done
+    printf '\n'
+}
+
 # Parse command line arguments
 output_file=""
 project_filter=""
@@ -64,8 +75,9 @@ fi
 
 show_progress "Found ${#projects[@]} accessible projects"
 
-# Create CSV header
-echo "project,instance_name,database_version,tier,region,availability_type,storage_size_gb,backup_enabled,private_ip,public_ip,state,creation_time,labels" > "$output_file"
+# Create CSV header and keep the output file open for all rows
+exec 3>"$output_file"
+echo "project,instance_name,database_version,tier,region,availability_type,storage_size_gb,backup_enabled,private_ip,public_ip,state,creation_time,labels" >&3
 
 # Process each project
 for project in "${projects[@]}"; do
@@ -86,16 +98,20 @@ for project in "${projects[@]}"; do
         continue
     fi
 
-    while IFS=, read -r instance_name database_version tier region availability_type storage_size backup_enabled private_ip public_ip state creation_time labels; do
+    # Fields are separated by | because labels can contain commas
+    while IFS='|' read -r instance_name database_version tier region availability_type storage_size backup_enabled private_ip public_ip state creation_time labels; do
         # Skip if no instances found
-        if [[ -n "$instance_name" && "$instance_name" != "name" ]]; then
+        if [[ -n "$instance_name" ]]; then
             # Clean up labels string (remove brackets and quotes)
             labels=$(echo "$labels" | tr -d '[]"' | sed 's/:/=/g')
             
-            echo "$project,$instance_name,$database_version,$tier,$region,$availability_type,$storage_size,$backup_enabled,$private_ip,$public_ip,$state,$creation_time,$labels" >> "$output_file"
+            csv_row "$project" "$instance_name" "$database_version" "$tier" "$region" "$availability_type" "$storage_size" \
+                "$backup_enabled" "$private_ip" "$public_ip" "$state" "$creation_time" "$labels" >&3
         fi
     done < <(gcloud sql instances list --project "$project" \
-        --format="csv[no-heading](name,databaseVersion,settings.tier,region,settings.availabilityType,settings.dataDiskSizeGb,settings.backupConfiguration.enabled,ipAddresses[0].ipAddress,ipAddresses[1].ipAddress,state,createTime,settings.userLabels)")
+        --format="csv[no-heading,separator='|'](name,databaseVersion,settings.tier,region,settings.availabilityType,settings.dataDiskSizeGb,settings.backupConfiguration.enabled,ipAddresses[0].ipAddress,ipAddresses[1].ipAddress,state,createTime,settings.userLabels)")
 done
 
+exec 3>&-
+
 show_progress "SQL Inventory complete! Output saved to: $output_file" 
\ No newline at end of file
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+GCP Cloud SQL Inventory Collector
+
+This script generates the same CSV inventory as GCP-SQL-inventory.sh through
+the shared project scheduler:
+
+- Projects are listed once and processed concurrently, without a separate
+  gcloud projects describe call per project
+- Projects where the Cloud SQL Admin API is not enabled are skipped using a
+  cached index of enabled APIs instead of a gcloud services list call per
+  project on every run
+- Rows are written to the output file as each project finishes
+
+Usage:
+    python gcp_sql_inventory.py [--output FILE] [--filter FILTER] [--parallel N]
+
+Options:
+    -o, --output    Output file (default: gcp-sql-instances-all-projects_TIMESTAMP.csv)
+    -f, --filter    Filter projects (e.g., 'name:prod-*' or 'labels.env=prod')
+    --format        csv, jsonl, parquet or sqlite (default: from the output file extension)
+    --parallel      Number of projects to process in parallel (default: 8)
+    --api-cache     Enabled API index file (default: ~/.cache/gcp-enabled-apis.json)
+    --api-cache-ttl Hours after which enabled APIs are looked up again (default: 24)
+    --help          Show this help message and exit
+"""
+
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'common'))
+from gcp_projects import DEFAULT_API_CACHE_FILE, EnabledApiIndex, ProjectScheduler, list_projects, run_gcloud
+from inventory_writer import FORMAT_EXTENSIONS, InventoryWriter
+
+logger = logging.getLogger(__name__)
+
+CSV_HEADER = [
+    'project', 'instance_name', 'database_version', 'tier', 'region', 'availability_type',
+    'storage_size_gb', 'backup_enabled', 'private_ip', 'public_ip', 'state', 'creation_time', 'labels'
+]
+
+# Services that make the collector run in a project
+APIS = ['sqladmin.googleapis.com']
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Generate GCP Cloud SQL instances inventory across projects')
+    parser.add_argument('-o', '--output', help='Output file (default: gcp-sql-instances-all-projects_TIMESTAMP.csv)')
+    parser.add_argument('-f', '--filter', help="Filter projects (e.g., 'name:prod-*' or 'labels.env=prod')")
+    parser.add_argument('--format', choices=list(FORMAT_EXTENSIONS),
+                        help='Output format (default: from the output file extension, else csv)')
+    parser.add_argument('--parallel', type=int, default=8, help='Number of projects to process in parallel')
+    parser.add_argument('--api-cache', default=DEFAULT_API_CACHE_FILE, help='Enabled API index file')
+    parser.add_argument('--api-cache-ttl', type=float, default=24,
+                        help='Hours after which enabled APIs are looked up again')
+    return parser.parse_args()
+
+
+def setup_logging():
+    """Log to the console and to a timestamped log file"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(f"sql_inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+        ]
+    )
+
+
+def build_row(project, instance):
+    """
+    Build a CSV row for a Cloud SQL instance
+
+    Args:
+        project (str): Project ID
+        instance (dict): Instance resource from gcloud sql instances list
+
+    Returns:
+        list: CSV row matching CSV_HEADER
+    """
+    settings = instance.get('settings', {})
+    addresses = {address.get('type'): address.get('ipAddress', '') for address in instance.get('ipAddresses', [])}
+
+    return [
+        project,
+        instance['name'],
+        instance.get('databaseVersion', ''),
+        settings.get('tier', ''),
+        instance.get('region', ''),
+        settings.get('availabilityType', ''),
+        settings.get('dataDiskSizeGb', ''),
+        settings.get('backupConfiguration', {}).get('enabled', ''),
+        addresses.get('PRIVATE', ''),
+        addresses.get('PRIMARY', ''),
+        instance.get('state', ''),
+        instance.get('createTime', ''),
+        ';'.join(f"{key}={value}" for key, value in sorted(settings.get('userLabels', {}).items()))
+    ]
+
+
+def collect_project(project):
+    """
+    Collect the inventory rows of one project
+
+    Args:
+        project (str): Project ID
+
+    Returns:
+        list: CSV rows matching CSV_HEADER
+    """
+    return [build_row(project, instance) for instance in run_gcloud(['sql', 'instances', 'list', '--project', project])]
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    setup_logging()
+    extension = FORMAT_EXTENSIONS[args.format or 'csv']
+    output_file = args.output or f"gcp-sql-instances-all-projects_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
+
+    logger.info("Fetching list of accessible projects...")
+    try:
+        projects = list_projects(args.filter)
+    except RuntimeError as e:
+        logger.error(f"Error listing projects: {str(e)}")
+        return 1
+    if not projects:
+        logger.error("No accessible projects found")
+        return 1
+    logger.info(f"Found {len(projects)} accessible projects")
+
+    api_index = EnabledApiIndex(args.api_cache, args.api_cache_ttl * 3600)
+    scheduler = ProjectScheduler(api_index, args.parallel)
+    try:
+        with InventoryWriter(output_file, CSV_HEADER, args.format) as writer:
+            for _, _, rows in scheduler.run(projects, {'SQL': {'apis': APIS, 'collect': collect_project}}):
+                writer.write_many(rows)
+    finally:
+        api_index.save()
+
+    logger.info(f"SQL Inventory complete! {writer.count} instances saved to: {output_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+GCP Inventory Orchestrator
+
+This script runs the Compute Engine, Cloud SQL and Cloud Storage inventories
+together through the shared project scheduler:
+
+- Projects are listed once for all services
+- The enabled APIs of every project are looked up once, from a cached index,
+  and decide which services run in which project
+- The per-project work of every service shares one bounded worker pool
+- Each service writes its own output file in the output directory
+
+Usage:
+    python gcp_inventory_all.py [--services CE SQL Storage] [--filter FILTER] [options]
+
+Options:
+    -s, --services    Services to inventory (default: CE SQL Storage)
+    -o, --output-dir  Output directory (default: gcp-inventory_TIMESTAMP)
+    -f, --filter      Filter projects (e.g., 'name:prod-*' or 'labels.env=prod')
+    --format          csv, jsonl, parquet or sqlite (default: csv)
+    --parallel        Maximum number of gcloud calls running at once (default: 8)
+    --api-cache       Enabled API index file (default: ~/.cache/gcp-enabled-apis.json)
+    --api-cache-ttl   Hours after which enabled APIs are looked up again (default: 24)
+    --cache-file      Machine type cache file (default: ~/.cache/gcp-machine-types.json)
+    --cache-ttl       Hours after which cached machine types are fetched again (default: 168)
+    --help            Show this help message and exit
+"""
+
+import argparse
+import functools
+import importlib.util
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+from gcp_projects import DEFAULT_API_CACHE_FILE, EnabledApiIndex, ProjectScheduler, list_projects
+from inventory_writer import FORMAT_EXTENSIONS, InventoryWriter
+
+logger = logging.getLogger(__name__)
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Collector registry. Every module exposes CSV_HEADER, APIS and
+# collect_project(project); collectors with 'machine_types' also take the
+# shared MachineTypeCache as a cache keyword argument.
+COLLECTORS = {
+    'CE': {
+        'module': 'Compute-Engine/CE-Inventory/gcp_ce_inventory.py',
+        'output': 'gcp-instances-all-projects',
+        'machine_types': True
+    },
+    'SQL': {
+        'module': 'SQL/gcp_sql_inventory.py',
+        'output': 'gcp-sql-instances-all-projects'
+    },
+    'Storage': {
+        'module': 'Cloud-Storage/gcp_storage_inventory.py',
+        'output': 'gcp-buckets-all-projects'
+    }
+}
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Generate GCP inventory across services and projects')
+    parser.add_argument('-s', '--services', nargs='+', choices=list(COLLECTORS), default=list(COLLECTORS),
+                        help='Services to inventory')
+    parser.add_argument('-o', '--output-dir', help='Output directory (default: gcp-inventory_TIMESTAMP)')
+    parser.add_argument('-f', '--filter', help="Filter projects (e.g., 'name:prod-*' or 'labels.env=prod')")
+    parser.add_argument('--format', choices=list(FORMAT_EXTENSIONS), default='csv', help='Output format')
+    parser.add_argument('--parallel', type=int, default=8, help='Maximum number of gcloud calls running at once')
+    parser.add_argument('--api-cache', default=DEFAULT_API_CACHE_FILE, help='Enabled API index file')
+    parser.add_argument('--api-cache-ttl', type=float, default=24,
+                        help='Hours after which enabled APIs are looked up again')
+    parser.add_argument('--cache-file', help='Machine type cache file (default: ~/.cache/gcp-machine-types.json)')
+    parser.add_argument('--cache-ttl', type=float, default=168,
+                        help='Hours after which cached machine types are fetched again')
+    return parser.parse_args()
+
+
+def setup_logging(output_dir):
+    """Log to the console and to a timestamped log file in the output directory"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(os.path.join(output_dir, f"gcp_inventory_all_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"))
+        ]
+    )
+
+
+def load_module(service, relative_path):
+    """
+    Load a collector module from its script directory
+
+    Args:
+        service (str): Service name, used as the module name
+        relative_path (str): Path of the module relative to the scripts directory
+
+    Returns:
+        module: Loaded Python module
+    """
+    spec = importlib.util.spec_from_file_location(f"{service.lower()}_collector", os.path.join(SCRIPTS_DIR, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_inventory(services, projects, output_dir, scheduler, fmt='csv', cache_file=None, cache_ttl=168 * 3600):
+    """
+    Run the per-project work of all services in the scheduler's pool
+
+    Rows are written from the calling thread, one open writer per service.
+
+    Args:
+        services (list): Service names
+        projects (list): Project IDs
+        output_dir (str): Output directory
+        scheduler (ProjectScheduler): Shared project scheduler
+        fmt (str): Output format
+        cache_file (str): Machine type cache file, or None for the collector's default
+        cache_ttl (float): Seconds after which cached machine types expire
+
+    Returns:
+        dict: Mapping of service name to the number of rows written
+    """
+    modules = {service: load_module(service, COLLECTORS[service]['module']) for service in services}
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    caches = []
+    tasks = {}
+    writers = {}
+    try:
+        for service, module in modules.items():
+            collect = module.collect_project
+            if COLLECTORS[service].get('machine_types'):
+                cache = module.MachineTypeCache(cache_file or module.DEFAULT_CACHE_FILE, cache_ttl)
+                caches.append(cache)
+                collect = functools.partial(collect, cache=cache)
+            tasks[service] = {'apis': module.APIS, 'collect': collect}
+            output_file = os.path.join(output_dir, f"{COLLECTORS[service]['output']}_{timestamp}{FORMAT_EXTENSIONS[fmt]}")
+            writers[service] = InventoryWriter(output_file, module.CSV_HEADER, fmt)
+
+        for service, _, rows in scheduler.run(projects, tasks):
+            writers[service].write_many(rows)
+    finally:
+        for writer in writers.values():
+            writer.close()
+        for cache in caches:
+            cache.save()
+
+    return {service: writer.count for service, writer in writers.items()}
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    output_dir = args.output_dir or f"gcp-inventory_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    os.makedirs(output_dir, exist_ok=True)
+    setup_logging(output_dir)
+
+    logger.info("Fetching list of accessible projects...")
+    try:
+        projects = list_projects(args.filter)
+    except RuntimeError as e:
+        logger.error(f"Error listing projects: {str(e)}")
+        return 1
+    if not projects:
+        logger.error("No accessible projects found")
+        return 1
+    logger.info(f"Found {len(projects)} accessible projects, collecting {', '.join(args.services)}")
+
+    api_index = EnabledApiIndex(args.api_cache, args.api_cache_ttl * 3600)
+    scheduler = ProjectScheduler(api_index, args.parallel)
+    start = time.monotonic()
+    try:
+        counts = run_inventory(args.services, projects, output_dir, scheduler, args.format,
+                               args.cache_file, args.cache_ttl * 3600)
+    finally:
+        api_index.save()
+
+    logger.info("=" * 50)
+    logger.info("SUMMARY")
+    logger.info("=" * 50)
+    for service, count in counts.items():
+        logger.info(f"{service:<10} {count} rows")
+    logger.info(f"Total wall time: {time.monotonic() - start:.1f}s")
+    logger.info(f"Inventory complete! Output saved to: {output_dir}")
+    logger.info("=" * 50)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared API Call Metrics
+
+Records every AWS API call a tool makes, per service and operation, through
+botocore event hooks on the boto3 session:
+
+- call count, errors, retries and throttling responses
+- latency of each call including retries, as percentiles and a histogram
+- request and response bytes
+
+The results can be written as a JSON summary, as a Prometheus textfile for the
+node_exporter textfile collector, or printed as CloudWatch Embedded Metric
+Format (EMF) records, which CloudWatch Logs turns into metrics when printed
+from a Lambda function.
+
+Shell collectors are measured with instrument.sh, which logs every aws and
+gcloud command; this module turns that log into the same outputs.
+
+Example:
+    metrics = ApiMetrics('s3_inventory')
+    metrics.attach(session)  # or ClientFactory(session, metrics=metrics)
+    ...
+    metrics.log_summary()
+    metrics.write(json_path='metrics.json', prometheus_path='s3_inventory.prom')
+
+Command line (for instrument.sh logs):
+    python api_metrics.py --cli-log calls.tsv --tool AWS-S3-inventory --json metrics.json --prometheus out.prom
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Latency percentiles reported in the JSON summary and EMF records
+PERCENTILES = (50, 90, 99)
+
+# Error codes AWS services use to signal throttling
+THROTTLING_ERROR_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'RequestLimitExceeded',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'BandwidthLimitExceeded',
+    'PriorRequestNotComplete',
+    'SlowDown',
+    'EC2ThrottledException'
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of a sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class OperationStats:
+    """Counters and latency samples of one service operation"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttles = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latencies = []
+
+    def summary(self):
+        """Return the counters and latency percentiles as a dictionary"""
+        latencies = sorted(self.latencies)
+        result = {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'throttles': self.throttles,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'latency_seconds': {
+                'total': round(sum(latencies), 6),
+                'max': round(latencies[-1], 6) if latencies else 0.0
+            }
+        }
+        for pct in PERCENTILES:
+            result['latency_seconds'][f"p{pct}"] = round(percentile(latencies, pct), 6)
+        return result
+
+
+class ApiMetrics:
+    """
+    Thread-safe recorder of API call metrics, per service and operation
+
+    Args:
+        tool (str): Name of the tool, used as a label in every output
+    """
+
+    def __init__(self, tool):
+        self.tool = tool
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Discard everything recorded so far, e.g. at the start of a Lambda invocation"""
+        with self._lock:
+            self._operations = {}
+            self.started = time.time()
+
+    def _stats(self, service, operation):
+        key = (service, operation)
+        if key not in self._operations:
+            self._operations[key] = OperationStats()
+        return self._operations[key]
+
+    def record(self, service, operation, latency, error=False, retries=0, throttles=0,
+               bytes_sent=0, bytes_received=0):
+        """
+        Record one completed call
+
+        Args:
+            service (str): Service name, e.g. ec2
+            operation (str): Operation name, e.g. DescribeInstances
+            latency (float): Seconds from the start of the call to its final response
+            error (bool): Whether the call failed
+            retries (int): Number of retried attempts
+            throttles (int): Number of throttling responses
+            bytes_sent (int): Request body bytes
+            bytes_received (int): Response body bytes
+        """
+        with self._lock:
+            stats = self._stats(service, operation)
+            stats.calls += 1
+            stats.errors += int(error)
+            stats.retries += retries
+            stats.throttles += throttles
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+            stats.latencies.append(latency)
+
+    def attach(self, session):
+        """
+        Record every call made by clients created from a session afterwards
+
+        Args:
+            session (boto3.Session): Session whose future clients are measured
+        """
+        self._register(session.events)
+
+    def instrument(self, client):
+        """
+        Record every call made by an existing client
+
+        Args:
+            client (boto3.client): Client to measure
+        """
+        self._register(client.meta.events)
+
+    def _register(self, events):
+        """Hook the recorder into an event emitter's request lifecycle"""
+        def before_call(context, **kwargs):
+            context['metrics'] = {'start': time.monotonic(), 'bytes_sent': 0, 'throttles': 0}
+
+        def before_send(request, **kwargs):
+            call = request.context.get('metrics')
+            if call is not None and isinstance(request.body, (bytes, str)):
+                call['bytes_sent'] += len(request.body)
+
+        def needs_retry(response=None, request_dict=None, **kwargs):
+            call = (request_dict or {}).get('context', {}).get('metrics')
+            if call is not None and response is not None:
+                if response[1].get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+                    call['throttles'] += 1
+
+        def after_call(event_name, http_response, parsed, context, **kwargs):
+            call = context.get('metrics')
+            if call is None:
+                return
+            _, service, operation = event_name.split('.', 2)
+            metadata = parsed.get('ResponseMetadata', {})
+            self.record(
+                service, operation, time.monotonic() - call['start'],
+                error=http_response.status_code >= 300,
+                retries=metadata.get('RetryAttempts', 0),
+                throttles=call['throttles'],
+                bytes_sent=call['bytes_sent'],
+                bytes_received=int(http_response.headers.get('content-length') or 0)
+            )
+
+        def after_call_error(event_name, context, **kwargs):
+            call = context.get('metrics')
+            if call is not None:
+                _, service, operation = event_name.split('.', 2)
+                self.record(service, operation, time.monotonic() - call['start'], error=True,
+                            throttles=call['throttles'], bytes_sent=call['bytes_sent'])
+
+        events.register('before-call', before_call)
+        events.register('before-send', before_send)
+        events.register('needs-retry', needs_retry)
+        events.register('after-call', after_call)
+        events.register('after-call-error', after_call_error)
+
+    def load_cli_log(self, path):
+        """
+        Record the calls logged by instrument.sh
+
+        Every line holds: service, operation, duration in seconds, exit code,
+        output bytes and 1 if the command was throttled, separated by tabs.
+
+        Args:
+            path (str): Call log written by instrument.sh
+        """
+        with open(path) as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) != 6:
+                    continue
+                service, operation, duration, exit_code, output_bytes, throttled = fields
+                self.record(service, operation, float(duration), error=exit_code != '0',
+                            throttles=int(throttled), bytes_received=int(output_bytes))
+
+    def summary(self):
+        """
+        Summarize the recorded calls
+
+        Returns:
+            dict: Tool, run start and duration, and per-operation statistics
+                keyed by "service.Operation", slowest total latency first
+        """
+        with self._lock:
+            operations = {f"{service}.{operation}": stats.summary()
+                          for (service, operation), stats in self._operations.items()}
+        return {
+            'tool': self.tool,
+            'started': self.started,
+            'duration_seconds': round(time.time() - self.started, 3),
+            'operations': dict(sorted(operations.items(),
+                                      key=lambda item: item[1]['latency_seconds']['total'], reverse=True))
+        }
+
+    def log_summary(self, top=10):
+        """Log the operations that took the most time in total"""
+        summary = self.summary()
+        for name, stats in list(summary['operations'].items())[:top]:
+            latency = stats['latency_seconds']
+            logger.info(f"{name}: {stats['calls']} calls, {latency['total']:.1f}s total, "
+                        f"p50 {latency['p50'] * 1000:.0f}ms, p99 {latency['p99'] * 1000:.0f}ms, "
+                        f"{stats['retries']} retries, {stats['throttles']} throttles, {stats['errors']} errors")
+
+    def prometheus(self):
+        """
+        Render the recorded calls in the Prometheus text exposition format
+
+        Returns:
+            str: Textfile collector contents
+        """
+        with self._lock:
+            operations = {key: (stats.calls, stats.errors, stats.retries, stats.throttles, stats.bytes_sent,
+                                stats.bytes_received, sorted(stats.latencies))
+                          for key, stats in self._operations.items()}
+
+        counters = [
+            ('calls', 'API calls made', 0),
+            ('errors', 'API calls that failed', 1),
+            ('retries', 'Retried API call attempts', 2),
+            ('throttles', 'Throttling responses received', 3),
+            ('bytes_sent', 'Request body bytes sent', 4),
+            ('bytes_received', 'Response body bytes received', 5)
+        ]
+        lines = []
+        for name, help_text, index in counters:
+            lines.append(f"# HELP cloud_api_{name}_total {help_text}")
+            lines.append(f"# TYPE cloud_api_{name}_total counter")
+            for (service, operation), values in sorted(operations.items()):
+                lines.append(f"cloud_api_{name}_total{{{self._labels(service, operation)}}} {values[index]}")
+
+        lines.append("# HELP cloud_api_latency_seconds API call latency including retries")
+        lines.append("# TYPE cloud_api_latency_seconds histogram")
+        for (service, operation), values in sorted(operations.items()):
+            labels = self._labels(service, operation)
+            latencies = values[6]
+            for bound in LATENCY_BUCKETS:
+                count = sum(1 for latency in latencies if latency <= bound)
+                lines.append(f'cloud_api_latency_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'cloud_api_latency_seconds_bucket{{{labels},le="+Inf"}} {len(latencies)}')
+            lines.append(f"cloud_api_latency_seconds_sum{{{labels}}} {sum(latencies):.6f}")
+            lines.append(f"cloud_api_latency_seconds_count{{{labels}}} {len(latencies)}")
+
+        lines.append("# HELP cloud_api_run_duration_seconds Wall time of the run")
+        lines.append("# TYPE cloud_api_run_duration_seconds gauge")
+        lines.append(f'cloud_api_run_duration_seconds{{tool="{self.tool}"}} {time.time() - self.started:.3f}')
+        lines.append("# HELP cloud_api_run_timestamp_seconds Start time of the run")
+        lines.append("# TYPE cloud_api_run_timestamp_seconds gauge")
+        lines.append(f'cloud_api_run_timestamp_seconds{{tool="{self.tool}"}} {self.started:.0f}')
+        return '\n'.join(lines) + '\n'
+
+    def _labels(self, service, operation):
+        return f'tool="{self.tool}",service="{service}",operation="{operation}"'
+
+    def emf_records(self, namespace='CloudPlatformScripts'):
+        """
+        Build one CloudWatch Embedded Metric Format record per operation
+
+        Args:
+            namespace (str): CloudWatch metric namespace
+
+        Returns:
+            list: EMF dictionaries with Tool and Operation dimensions
+        """
+        timestamp = int(time.time() * 1000)
+        records = []
+        for name, stats in self.summary()['operations'].items():
+            latency = stats['latency_seconds']
+            values = {
+                'Calls': (stats['calls'], 'Count'),
+                'Errors': (stats['errors'], 'Count'),
+                'Retries': (stats['retries'], 'Count'),
+                'Throttles': (stats['throttles'], 'Count'),
+                'BytesSent': (stats['bytes_sent'], 'Bytes'),
+                'BytesReceived': (stats['bytes_received'], 'Bytes'),
+                'LatencyTotal': (latency['total'] * 1000, 'Milliseconds'),
+                'LatencyMax': (latency['max'] * 1000, 'Milliseconds')
+            }
+            for pct in PERCENTILES:
+                values[f"LatencyP{pct}"] = (latency[f"p{pct}"] * 1000, 'Milliseconds')
+
+            record = {
+                '_aws': {
+                    'Timestamp': timestamp,
+                    'CloudWatchMetrics': [{
+                        'Namespace': namespace,
+                        'Dimensions': [['Tool', 'Operation']],
+                        'Metrics': [{'Name': metric, 'Unit': unit} for metric, (_, unit) in values.items()]
+                    }]
+                },
+                'Tool': self.tool,
+                'Operation': name
+            }
+            record.update({metric: value for metric, (value, _) in values.items()})
+            records.append(record)
+        return records
+
+    def print_emf(self, namespace='CloudPlatformScripts'):
+        """Print the EMF records to stdout, where Lambda sends them to CloudWatch Logs"""
+        for record in self.emf_records(namespace):
+            print(json.dumps(record), flush=True)
+
+    def write(self, json_path=None, prometheus_path=None):
+        """
+        Write the JSON summary and/or the Prometheus textfile
+
+        Both files are replaced atomically so collectors never read a partial file.
+
+        Args:
+            json_path (str): JSON summary file, or None
+            prometheus_path (str): Prometheus textfile, or None
+        """
+        if json_path:
+            _write_atomic(json_path, json.dumps(self.summary(), indent=2) + '\n')
+            logger.info(f"API metrics saved to: {json_path}")
+        if prometheus_path:
+            _write_atomic(prometheus_path, self.prometheus())
+            logger.info(f"Prometheus metrics saved to: {prometheus_path}")
+
+
+def _write_atomic(path, content):
+    temp_file = f"{path}.{os.getpid()}.tmp"
+    with open(temp_file, 'w') as f:
+        f.write(content)
+    os.replace(temp_file, path)
+
+
+def main():
+    """Convert an instrument.sh call log into the JSON summary and Prometheus textfile"""
+    parser = argparse.ArgumentParser(description='Summarize a CLI call log written by instrument.sh')
+    parser.add_argument('--cli-log', required=True, help='Call log written by instrument.sh')
+    parser.add_argument('--tool', required=True, help='Tool name used as a label')
+    parser.add_argument('--started', type=float, help='Start time of the run (epoch seconds)')
+    parser.add_argument('--json', help='JSON summary file')
+    parser.add_argument('--prometheus', help='Prometheus textfile')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    metrics = ApiMetrics(args.tool)
+    if args.started:
+        metrics.started = args.started
+    metrics.load_cli_log(args.cli_log)
+    metrics.log_summary()
+    metrics.write(args.json, args.prometheus)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
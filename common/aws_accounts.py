@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared Cross-Account Session Pool
+
+Lets one run work in many AWS accounts by assuming a role in each of them:
+
+- The role is assumed lazily, on the first call made in an account, with one
+  sts:AssumeRole call from the base session
+- Credentials are cached per account and refreshed automatically 15 minutes
+  before they expire, so runs longer than the role session keep working
+- Every account gets its own rate-limited client factory, so clients are
+  reused per account, service and region, and rate limits are tracked per
+  account like AWS applies them
+- The account of the base session is used directly, without assuming a role
+- run() fans a task out over the account x region matrix in one bounded
+  worker pool
+
+Example:
+    pool = AccountSessionPool(boto3.Session(profile_name='management'), role_name='InventoryReadOnly')
+    accounts = [account['Id'] for account in list_accounts(pool.base.client('organizations'))]
+    for account_id, region, result, error in pool.run(collect, accounts, ['eu-west-1', 'us-east-1']):
+        print(account_id, region, error or len(result))
+"""
+
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import boto3
+import botocore.session
+from botocore.credentials import DeferredRefreshableCredentials
+
+from aws_clients import ClientFactory
+
+logger = logging.getLogger(__name__)
+
+# Role created by AWS Organizations in every member account
+DEFAULT_ROLE_NAME = 'OrganizationAccountAccessRole'
+
+DEFAULT_SESSION_NAME = 'cloudplatform-scripts'
+
+# Seconds an assumed role session is valid. botocore refreshes credentials
+# 15 minutes before they expire, so shorter sessions would be renewed on
+# almost every call.
+DEFAULT_DURATION = 3600
+MIN_DURATION = 1800
+
+
+def list_accounts(organizations_client):
+    """
+    List the active accounts of the organization
+
+    Args:
+        organizations_client (boto3.client): Organizations client of the
+            management account or a delegated administrator
+
+    Returns:
+        list: Dictionaries with the Id and Name of every active account
+    """
+    accounts = []
+    for page in organizations_client.get_paginator('list_accounts').paginate():
+        for account in page['Accounts']:
+            if account.get('State', account.get('Status')) == 'ACTIVE':
+                accounts.append({'Id': account['Id'], 'Name': account.get('Name', '')})
+    return sorted(accounts, key=lambda account: account['Id'])
+
+
+class AccountSessionPool:
+    """
+    Thread-safe pool of role sessions and client factories, one per account
+
+    Args:
+        session (boto3.Session): Base session that assumes the roles, default session if None
+        role_name (str): Name (with path, if any) of the role assumed in every account
+        external_id (str): External ID required by the role's trust policy, or None
+        session_name (str): Role session name, shown in CloudTrail
+        duration (int): Seconds each role session is valid, at least MIN_DURATION
+        rates (dict): Overrides of the client factory's DEFAULT_RATES
+        max_attempts (int): Attempts per call, including adaptive retries
+        max_pool_connections (int): Connection pool size of each client
+        metrics (ApiMetrics): Recorder that measures every call in every account, or None
+    """
+
+    def __init__(self, session=None, role_name=DEFAULT_ROLE_NAME, external_id=None,
+                 session_name=DEFAULT_SESSION_NAME, duration=DEFAULT_DURATION, rates=None,
+                 max_attempts=10, max_pool_connections=10, metrics=None):
+        if duration < MIN_DURATION:
+            raise ValueError(f"Role session duration must be at least {MIN_DURATION} seconds")
+        self.role_name = role_name.strip('/')
+        self.external_id = external_id
+        self.session_name = session_name
+        self.duration = duration
+        self._factory_args = {
+            'rates': rates,
+            'max_attempts': max_attempts,
+            'max_pool_connections': max_pool_connections,
+            'metrics': metrics
+        }
+        self.base = ClientFactory(session, **self._factory_args)
+        self._base_account = None
+        self._factories = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_account(self):
+        """ID of the account the base session belongs to"""
+        with self._lock:
+            if self._base_account is None:
+                self._base_account = self.base.client('sts').get_caller_identity()['Account']
+            return self._base_account
+
+    def role_arn(self, account_id):
+        """
+        Get the ARN of the role assumed in an account
+
+        Args:
+            account_id (str): AWS account ID
+
+        Returns:
+            str: Role ARN
+        """
+        partition = self.base.session.get_partition_for_region(self.base.session.region_name or 'us-east-1')
+        return f"arn:{partition}:iam::{account_id}:role/{self.role_name}"
+
+    def _assume_role(self, account_id):
+        """Assume the role in an account and return credentials in botocore's refresh format"""
+        kwargs = {
+            'RoleArn': self.role_arn(account_id),
+            'RoleSessionName': self.session_name,
+            'DurationSeconds': self.duration
+        }
+        if self.external_id:
+            kwargs['ExternalId'] = self.external_id
+
+        credentials = self.base.client('sts').assume_role(**kwargs)['Credentials']
+        logger.debug(f"Assumed {kwargs['RoleArn']} until {credentials['Expiration'].isoformat()}")
+        return {
+            'access_key': credentials['AccessKeyId'],
+            'secret_key': credentials['SecretAccessKey'],
+            'token': credentials['SessionToken'],
+            'expiry_time': credentials['Expiration'].isoformat()
+        }
+
+    def _role_session(self, account_id):
+        """Create a session whose credentials come from the role and refresh themselves"""
+        credentials = DeferredRefreshableCredentials(
+            refresh_using=functools.partial(self._assume_role, account_id),
+            method='assume-role'
+        )
+        botocore_session = botocore.session.get_session()
+        botocore_session._credentials = credentials
+        return boto3.Session(botocore_session=botocore_session, region_name=self.base.session.region_name)
+
+    def factory(self, account_id):
+        """
+        Return the client factory of an account
+
+        Args:
+            account_id (str): AWS account ID, or None for the base account
+
+        Returns:
+            ClientFactory: Rate-limited client factory using the account's role session
+        """
+        if account_id is None or account_id == self.base_account:
+            return self.base
+        with self._lock:
+            if account_id not in self._factories:
+                self._factories[account_id] = ClientFactory(self._role_session(account_id), **self._factory_args)
+            return self._factories[account_id]
+
+    def client(self, account_id, service_name, region=None):
+        """
+        Return the shared client for an account, service and region
+
+        Args:
+            account_id (str): AWS account ID, or None for the base account
+            service_name (str): boto3 service name
+            region (str): AWS region, the base session's region if None
+
+        Returns:
+            boto3.client: Rate-limited client
+        """
+        return self.factory(account_id).client(service_name, region)
+
+    def run(self, task, accounts, regions, parallel=8):
+        """
+        Run a task for every account and region in one bounded worker pool
+
+        Args:
+            task (callable): Called with (factory, account_id, region), where
+                factory is the account's ClientFactory
+            accounts (list): AWS account IDs
+            regions (list): Region names
+            parallel (int): Maximum number of tasks running at once
+
+        Yields:
+            tuple: (account ID, region, result, error) as each task finishes,
+                where error is None or the message of the exception raised
+        """
+        def call(account_id, region):
+            return task(self.factory(account_id), account_id, region)
+
+        with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix='account') as executor:
+            futures = {
+                executor.submit(call, account_id, region): (account_id, region)
+                for account_id in accounts for region in regions
+            }
+            for future in as_completed(futures):
+                account_id, region = futures[future]
+                try:
+                    yield account_id, region, future.result(), None
+                except Exception as e:
+                    logger.error(f"Task failed in account {account_id} ({region}): {str(e)}")
+                    yield account_id, region, None, str(e)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared Rate-Limited boto3 Client Factory
+
+Creates boto3 clients that can be shared by many threads without tripping
+API rate limits:
+
+- Every client uses botocore's adaptive retry mode, so throttled calls are
+  retried with backoff instead of being reported as failures
+- Every request attempt first takes a token from a bucket per service, region
+  and API operation (services whose quota is account-wide, like Route53, use
+  one bucket for all operations)
+- A bucket halves its rate when the API answers with a throttling error and
+  recovers gradually as calls succeed again, so the tools settle at the
+  highest rate the API allows
+
+Example:
+    factory = ClientFactory(boto3.Session(profile_name='prod'), rates={'ec2.StopInstances': 5})
+    ec2_client = factory.client('ec2', 'eu-west-1')
+"""
+
+import logging
+import threading
+import time
+
+import boto3
+from botocore.config import Config
+
+from api_metrics import THROTTLING_ERROR_CODES
+
+logger = logging.getLogger(__name__)
+
+# Requests per second per bucket. Keys are boto3 service names, or
+# "service.Operation" for a single API.
+DEFAULT_RATES = {
+    'ec2': 20,
+    'ssm': 10,
+    'ssm.SendCommand': 5,
+    'elbv2': 10,
+    'rds': 10,
+    's3': 50,
+    'eks': 10,
+    'ecr': 10,
+    'route53': 5,
+    'resourcegroupstaggingapi': 5
+}
+
+# Rate of services and operations not listed above
+DEFAULT_RATE = 10
+
+# Services whose quota applies to all operations together
+SERVICE_WIDE_LIMITS = {'route53'}
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter that backs off when throttled
+
+    Args:
+        rate (float): Tokens added per second, also the maximum rate
+        capacity (float): Maximum number of tokens (burst size), defaults to rate
+        min_rate (float): Lowest rate reached by backing off, defaults to rate / 20
+    """
+
+    # Fraction of the maximum rate regained per successful call
+    RECOVERY_STEP = 0.02
+
+    def __init__(self, rate, capacity=None, min_rate=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 20
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                burst = max(1.0, self.capacity * self.rate / self.max_rate)
+                self._tokens = min(burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self):
+        """Halve the rate and drop any saved burst after a throttling error"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0)
+
+    def succeeded(self):
+        """Raise the rate a step towards the maximum after a successful call"""
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * self.RECOVERY_STEP)
+
+
+class ClientFactory:
+    """
+    Thread-safe cache of rate-limited boto3 clients created from one session
+
+    boto3 sessions are not safe to create clients from concurrently, so client
+    creation is serialized. Created clients are thread-safe and are shared by
+    every caller for the same service and region, together with their rate
+    limiters and connection pool.
+
+    Args:
+        session (boto3.Session): Session used to create clients, default session if None
+        rates (dict): Overrides of DEFAULT_RATES, keyed by service or "service.Operation"
+        max_attempts (int): Attempts per call, including adaptive retries
+        max_pool_connections (int): Connection pool size of each client
+        metrics (ApiMetrics): Recorder that measures every call of every client, or None
+    """
+
+    def __init__(self, session=None, rates=None, max_attempts=10, max_pool_connections=10, metrics=None):
+        self.session = session or boto3.Session()
+        self.metrics = metrics
+        self.rates = dict(DEFAULT_RATES, **(rates or {}))
+        self.config = Config(
+            max_pool_connections=max_pool_connections,
+            retries={'mode': 'adaptive', 'max_attempts': max_attempts}
+        )
+        self._clients = {}
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def client(self, service_name, region=None):
+        """
+        Return the shared client for a service and region
+
+        Args:
+            service_name (str): boto3 service name
+            region (str): AWS region, the session's region if None
+
+        Returns:
+            boto3.client: Rate-limited client for the service and region
+        """
+        key = (service_name, region)
+        with self._lock:
+            if key not in self._clients:
+                client = self.session.client(service_name, region_name=region, config=self.config)
+                self._register(client, service_name)
+                if self.metrics:
+                    self.metrics.instrument(client)
+                self._clients[key] = client
+            return self._clients[key]
+
+    def limiter(self, service_name, region, operation):
+        """
+        Return the token bucket that gates an API operation
+
+        Args:
+            service_name (str): boto3 service name
+            region (str): AWS region of the client
+            operation (str): API operation name, e.g. DescribeInstances
+
+        Returns:
+            TokenBucket: Shared limiter
+        """
+        if service_name in SERVICE_WIDE_LIMITS:
+            key = (service_name, None, None)
+        else:
+            key = (service_name, region, operation)
+        with self._lock:
+            if key not in self._limiters:
+                rate = self.rates.get(f"{service_name}.{operation}", self.rates.get(service_name, DEFAULT_RATE))
+                self._limiters[key] = TokenBucket(rate)
+            return self._limiters[key]
+
+    def _register(self, client, service_name):
+        """Hook the rate limiters into a client's request lifecycle"""
+        event_prefix = client.meta.service_model.service_id.hyphenize()
+        region = client.meta.region_name
+
+        def operation_limiter(event_name):
+            return self.limiter(service_name, region, event_name.rsplit('.', 1)[-1])
+
+        def before_send(event_name, **kwargs):
+            # Runs for every attempt, so retries are rate limited too
+            operation_limiter(event_name).acquire()
+
+        def needs_retry(event_name, response=None, **kwargs):
+            if response is None:
+                return
+            code = response[1].get('Error', {}).get('Code')
+            if code in THROTTLING_ERROR_CODES:
+                limiter = operation_limiter(event_name)
+                limiter.throttled()
+                logger.debug(f"{service_name} {event_name.rsplit('.', 1)[-1]} throttled ({code}), "
+                             f"rate lowered to {limiter.rate:.2f}/s")
+
+        def after_call(event_name, http_response=None, **kwargs):
+            if http_response is not None and http_response.status_code < 400:
+                operation_limiter(event_name).succeeded()
+
+        client.meta.events.register(f"before-send.{event_prefix}", before_send)
+        client.meta.events.register(f"needs-retry.{event_prefix}", needs_retry)
+        client.meta.events.register(f"after-call.{event_prefix}", after_call)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared GCP Project Scheduler
+
+Enumerates projects once and fans per-project work for several collectors out
+to one bounded worker pool:
+
+- Projects are listed with a single gcloud projects list call
+- The APIs enabled in every project are looked up with one gcloud services
+  list call per project and kept in an on-disk index with a TTL, so later
+  runs and other collectors do not pay for the check again
+- A collector only runs in projects where one of its APIs is enabled, and
+  the work of every collector shares the same pool
+
+Example:
+    index = EnabledApiIndex('~/.cache/gcp-enabled-apis.json', ttl=24 * 3600)
+    scheduler = ProjectScheduler(index, parallel=8)
+    tasks = {'SQL': {'apis': ['sqladmin.googleapis.com'], 'collect': collect_sql_project}}
+    for name, project, rows in scheduler.run(list_projects(), tasks):
+        print(name, project, len(rows))
+"""
+
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'gcp-enabled-apis.json')
+
+
+def run_gcloud(args):
+    """
+    Run a gcloud command and return its parsed JSON output
+
+    Args:
+        args (list): gcloud arguments, without --format
+
+    Returns:
+        list: Parsed JSON output
+
+    Raises:
+        RuntimeError: If gcloud exits with an error
+    """
+    completed = subprocess.run(['gcloud'] + args + ['--format=json'], capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip() or f"gcloud exited with code {completed.returncode}")
+    return json.loads(completed.stdout or '[]')
+
+
+def list_projects(project_filter=None):
+    """
+    List the IDs of all accessible projects
+
+    Args:
+        project_filter (str): gcloud filter expression, e.g. 'name:prod-*'
+
+    Returns:
+        list: Project IDs
+    """
+    args = ['projects', 'list']
+    if project_filter:
+        args.append(f"--filter={project_filter}")
+    return [project['projectId'] for project in run_gcloud(args)]
+
+
+class EnabledApiIndex:
+    """
+    On-disk index of the APIs enabled in every project
+
+    Args:
+        path (str): JSON index file
+        ttl (float): Seconds after which a project's APIs are looked up again
+    """
+
+    def __init__(self, path=DEFAULT_API_CACHE_FILE, ttl=24 * 3600):
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._projects = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self._projects = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable API index {self.path}: {str(e)}")
+
+    def enabled(self, project):
+        """
+        Get the APIs enabled in a project, from the index while it is fresh
+
+        Args:
+            project (str): Project ID
+
+        Returns:
+            set: Enabled service names, e.g. {'compute.googleapis.com'}
+        """
+        with self._lock:
+            entry = self._projects.get(project)
+        if entry and entry['fetched_at'] >= time.time() - self.ttl:
+            return set(entry['services'])
+
+        services = sorted(
+            service.get('config', {}).get('name') or service['name'].split('/')[-1]
+            for service in run_gcloud(['services', 'list', '--enabled', '--project', project])
+        )
+        with self._lock:
+            self._projects[project] = {'fetched_at': time.time(), 'services': services}
+        return set(services)
+
+    def save(self):
+        """Write the index to disk atomically"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_file = f"{self.path}.{os.getpid()}.tmp"
+        with self._lock:
+            with open(temp_file, 'w') as f:
+                json.dump(self._projects, f)
+        os.replace(temp_file, self.path)
+
+
+class ProjectScheduler:
+    """
+    Run per-project work for several collectors in one bounded worker pool
+
+    Args:
+        api_index (EnabledApiIndex): Index of enabled APIs
+        parallel (int): Maximum number of gcloud-bound tasks running at once
+    """
+
+    def __init__(self, api_index, parallel=8):
+        self.api_index = api_index
+        self.parallel = parallel
+
+    def run(self, projects, tasks):
+        """
+        Run every task in every project where one of its APIs is enabled
+
+        A project's API lookup and its collector tasks all run in the same
+        pool; tasks are submitted as soon as the project's APIs are known.
+
+        Args:
+            projects (list): Project IDs
+            tasks (dict): Mapping of task name to a dictionary with 'apis'
+                (service names, any of which enables the task) and 'collect'
+                (callable taking a project ID and returning rows)
+
+        Yields:
+            tuple: (task name, project ID, rows) as each task finishes
+        """
+        with ThreadPoolExecutor(max_workers=self.parallel, thread_name_prefix='project') as executor:
+            pending = {executor.submit(self.api_index.enabled, project): (None, project) for project in projects}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, project = pending.pop(future)
+                    if name is None:
+                        for task_name in self._runnable(project, tasks, future):
+                            future_task = executor.submit(tasks[task_name]['collect'], project)
+                            pending[future_task] = (task_name, project)
+                        continue
+                    try:
+                        rows = future.result()
+                    except Exception as e:
+                        logger.error(f"{name} failed in project {project}: {str(e)}")
+                        continue
+                    logger.info(f"{name}: processed project {project} ({len(rows)} rows)")
+                    yield name, project, rows
+
+    def _runnable(self, project, tasks, api_future):
+        """Return the names of the tasks whose APIs are enabled in a project"""
+        try:
+            enabled = api_future.result()
+        except Exception as e:
+            # Without access to the Service Usage API, try every task and let it fail on its own
+            logger.warning(f"Unable to list enabled APIs in project {project}: {str(e)}")
+            return list(tasks)
+
+        runnable = []
+        for name, task in tasks.items():
+            if enabled.intersection(task['apis']):
+                runnable.append(name)
+            else:
+                logger.info(f"{name}: API not enabled in project {project}, skipping")
+        return runnable
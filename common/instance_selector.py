@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared EC2 Instance Selector
+
+Selects EC2 instances with one declarative expression, such as:
+
+    tag:Category=Jplatform name=jplatform-isbasi-{61..134} type=r5a.xlarge,r5a.2xlarge state=running,stopped
+
+An expression is a list of whitespace-separated conditions. All of them must
+match (AND). A condition has the form KEY=VALUES or KEY!=VALUES, where VALUES
+is a comma-separated list of alternatives (OR). Values may contain the
+wildcards * and ?, and numeric ranges such as {61..134}. Quote a condition
+when a value contains spaces: "tag:Owner=Platform Team".
+
+Keys:
+    tag:KEY   Value of the tag KEY
+    name      Value of the Name tag
+    type      Instance type
+    state     Instance state name
+    id        Instance ID
+    az        Availability zone
+    vpc       VPC ID
+    subnet    Subnet ID
+    image     AMI ID
+
+The selector is compiled into describe_instances Filters wherever EC2 can
+evaluate the condition itself, so only the matching instances are returned.
+Ranges are expanded into the exact values when there are at most 200 of them
+and are otherwise sent as a * wildcard. Whatever EC2 cannot evaluate (!=
+conditions and ranges that were widened to a wildcard) is checked on the
+returned instances.
+
+Example:
+    selector = InstanceSelector.parse('tag:Category=Jplatform name=jplatform-isbasi-{61..134}')
+    instances = selector.describe(ec2_client)
+"""
+
+import logging
+import re
+import shlex
+
+logger = logging.getLogger(__name__)
+
+# Values accepted per describe_instances filter
+MAX_FILTER_VALUES = 200
+
+# Selector keys and the describe_instances filter each one is compiled into
+FILTER_NAMES = {
+    'name': 'tag:Name',
+    'type': 'instance-type',
+    'state': 'instance-state-name',
+    'id': 'instance-id',
+    'az': 'availability-zone',
+    'vpc': 'vpc-id',
+    'subnet': 'subnet-id',
+    'image': 'image-id'
+}
+
+# Where each non-tag key is found in a described instance
+INSTANCE_FIELDS = {
+    'type': ('InstanceType',),
+    'state': ('State', 'Name'),
+    'id': ('InstanceId',),
+    'az': ('Placement', 'AvailabilityZone'),
+    'vpc': ('VpcId',),
+    'subnet': ('SubnetId',),
+    'image': ('ImageId',)
+}
+
+CONDITION_PATTERN = re.compile(r'^([^=!]+)(!?=)(.*)$')
+RANGE_PATTERN = re.compile(r'\{(\d+)\.\.(\d+)\}')
+
+
+def get_tag(instance, key):
+    """
+    Get the value of a tag of a described instance
+
+    Args:
+        instance (dict): EC2 instance dictionary
+        key (str): Tag key
+
+    Returns:
+        str: Tag value, or None if the instance does not have the tag
+    """
+    for tag in instance.get('Tags') or []:
+        if tag['Key'] == key:
+            return tag['Value']
+    return None
+
+
+class ValuePattern:
+    """
+    One alternative of a condition, with EC2 wildcard and range semantics
+
+    Args:
+        text (str): Value, e.g. 'r5a.*' or 'jplatform-isbasi-{61..134}'
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.ranges = []
+        regex = ''
+        position = 0
+        for match in RANGE_PATTERN.finditer(text):
+            low, high = int(match.group(1)), int(match.group(2))
+            if low > high:
+                raise ValueError(f"Invalid range {match.group(0)} in '{text}'")
+            regex += self._wildcard_regex(text[position:match.start()]) + r'(\d+)'
+            self.ranges.append((low, high))
+            position = match.end()
+        regex += self._wildcard_regex(text[position:])
+        self._regex = re.compile(regex, re.DOTALL)
+
+    @staticmethod
+    def _wildcard_regex(text):
+        """Translate EC2 filter wildcards (* and ?) into a regular expression"""
+        return ''.join('.*' if char == '*' else '.' if char == '?' else re.escape(char) for char in text)
+
+    def expansion_size(self):
+        """Number of exact values the ranges of this pattern expand into"""
+        size = 1
+        for low, high in self.ranges:
+            size *= high - low + 1
+        return size
+
+    def expand(self):
+        """
+        Expand the ranges of this pattern into exact filter values
+
+        Returns:
+            list: Values with every range replaced by one of its numbers
+        """
+        values = [self.text]
+        for low, high in self.ranges:
+            values = [RANGE_PATTERN.sub(str(number), value, count=1)
+                      for value in values for number in range(low, high + 1)]
+        return values
+
+    def widen(self):
+        """Replace the ranges of this pattern with the * wildcard"""
+        return RANGE_PATTERN.sub('*', self.text)
+
+    def matches(self, value):
+        """
+        Check a value against this pattern
+
+        Args:
+            value (str): Value of the instance, or None if it has none
+
+        Returns:
+            bool: True if the value matches
+        """
+        if value is None:
+            return False
+        match = self._regex.fullmatch(value)
+        if not match:
+            return False
+        return all(low <= int(number) <= high for number, (low, high) in zip(match.groups(), self.ranges))
+
+
+class Condition:
+    """
+    One KEY=VALUES or KEY!=VALUES condition of a selector
+
+    Args:
+        key (str): Selector key, e.g. 'type' or 'tag:Category'
+        values (list): Alternatives, any of which must match
+        negate (bool): True for a != condition
+    """
+
+    def __init__(self, key, values, negate=False):
+        if key.startswith('tag:') and len(key) > 4:
+            self.filter_name = key
+        elif key in FILTER_NAMES:
+            self.filter_name = FILTER_NAMES[key]
+        else:
+            raise ValueError(f"Unknown selector key '{key}', expected tag:KEY or one of: {', '.join(FILTER_NAMES)}")
+        if not values or not all(values):
+            raise ValueError(f"Empty value in selector condition for '{key}'")
+        self.key = key
+        self.values = values
+        self.negate = negate
+        self.patterns = [ValuePattern(value) for value in values]
+
+    def __str__(self):
+        return f"{self.key}{'!=' if self.negate else '='}{','.join(self.values)}"
+
+    def value_of(self, instance):
+        """Get the value this condition is checked against from a described instance"""
+        if self.filter_name.startswith('tag:'):
+            return get_tag(instance, self.filter_name[4:])
+        value = instance
+        for field in INSTANCE_FIELDS[self.key]:
+            value = (value or {}).get(field)
+        return value
+
+    def matches(self, instance):
+        """
+        Check a described instance against this condition
+
+        Args:
+            instance (dict): EC2 instance dictionary
+
+        Returns:
+            bool: True if the instance satisfies the condition
+        """
+        value = self.value_of(instance)
+        matched = any(pattern.matches(value) for pattern in self.patterns)
+        return matched != self.negate
+
+    def compile(self):
+        """
+        Compile this condition into a describe_instances filter
+
+        Returns:
+            tuple: (filter, exact) where filter is the filter dictionary, or
+                None if EC2 cannot evaluate the condition, and exact tells
+                whether the filter alone is enough or the condition has to be
+                checked on the returned instances as well
+        """
+        if self.negate:
+            return None, False
+
+        if sum(pattern.expansion_size() for pattern in self.patterns) <= MAX_FILTER_VALUES:
+            values = [value for pattern in self.patterns for value in pattern.expand()]
+            exact = True
+        else:
+            values = [pattern.widen() for pattern in self.patterns]
+            exact = False
+
+        values = list(dict.fromkeys(values))
+        if len(values) > MAX_FILTER_VALUES:
+            return None, False
+        return {'Name': self.filter_name, 'Values': values}, exact
+
+
+class InstanceSelector:
+    """
+    Declarative EC2 instance selector compiled into describe_instances Filters
+
+    Args:
+        conditions (list): Condition objects, all of which must match
+    """
+
+    def __init__(self, conditions):
+        keys = [condition.key for condition in conditions if not condition.negate]
+        duplicates = sorted({key for key in keys if keys.count(key) > 1})
+        if duplicates:
+            raise ValueError(f"Selector key used more than once: {', '.join(duplicates)}")
+
+        self.conditions = conditions
+        self.filters = []
+        self.residue = []
+        for condition in conditions:
+            flt, exact = condition.compile()
+            if flt:
+                self.filters.append(flt)
+            if not exact:
+                self.residue.append(condition)
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Parse a selector expression
+
+        Args:
+            text (str): Expression, e.g. 'tag:Category=Jplatform type=r5a.xlarge,r5a.2xlarge'
+
+        Returns:
+            InstanceSelector: Parsed selector
+
+        Raises:
+            ValueError: If the expression is not valid
+        """
+        conditions = []
+        for term in shlex.split(text or ''):
+            match = CONDITION_PATTERN.match(term)
+            if not match:
+                raise ValueError(f"Invalid selector condition '{term}', expected KEY=VALUES or KEY!=VALUES")
+            key, operator, values = match.groups()
+            conditions.append(Condition(key.strip(), [value.strip() for value in values.split(',')], operator == '!='))
+        if not conditions:
+            raise ValueError("Empty selector")
+        return cls(conditions)
+
+    def __str__(self):
+        return ' '.join(shlex.quote(str(condition)) for condition in self.conditions)
+
+    def has_key(self, key):
+        """Check whether the selector has an = condition on the given key"""
+        return any(condition.key == key and not condition.negate for condition in self.conditions)
+
+    def with_default(self, key, values):
+        """
+        Add a condition unless the selector already has one on the key
+
+        Args:
+            key (str): Selector key, e.g. 'state'
+            values (list): Alternatives of the added condition
+
+        Returns:
+            InstanceSelector: This selector, or a new one with the condition added
+        """
+        if self.has_key(key):
+            return self
+        return InstanceSelector(self.conditions + [Condition(key, values)])
+
+    def matches(self, instance):
+        """
+        Check a described instance against every condition
+
+        Args:
+            instance (dict): EC2 instance dictionary
+
+        Returns:
+            bool: True if the instance is selected
+        """
+        return all(condition.matches(instance) for condition in self.conditions)
+
+    def describe(self, ec2_client):
+        """
+        Get the selected instances
+
+        Args:
+            ec2_client (boto3.client): EC2 client
+
+        Returns:
+            list: List of EC2 instance dictionaries
+        """
+        logger.info(f"Selecting instances with filters {self.filters}"
+                    + (f", checking {' '.join(str(c) for c in self.residue)} locally" if self.residue else ''))
+
+        instances = []
+        returned = 0
+        kwargs = {'Filters': self.filters} if self.filters else {}
+        for page in ec2_client.get_paginator('describe_instances').paginate(**kwargs):
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    returned += 1
+                    if all(condition.matches(instance) for condition in self.residue):
+                        instances.append(instance)
+
+        if self.residue:
+            logger.info(f"{len(instances)} of {returned} returned instances match the selector")
+        return instances
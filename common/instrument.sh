@@ -0,0 +1,203 @@
+#!/bin/bash
+
+# Measure every aws, gcloud and gsutil command a collector runs.
+#
+# The collector runs with shims for those CLIs first in its PATH. Each shim
+# times the real command and appends service, operation, duration, exit code,
+# output bytes and whether it was throttled to a call log. When the collector
+# finishes, api_metrics.py turns the log into the same JSON summary and
+# Prometheus textfile the Python tools write. Python tools that call gcloud
+# are measured the same way.
+#
+# When this script is invoked under the name of a CLI (through the shim
+# symlinks), it acts as the shim.
+
+# Error codes and messages that mean a call was throttled
+THROTTLE_PATTERN='Throttling|ThrottlingException|RequestLimitExceeded|TooManyRequestsException|SlowDown|Rate exceeded|RATE_LIMIT_EXCEEDED|Quota exceeded|rateLimitExceeded'
+
+# Command words that end a gcloud operation name, so resource names are not included
+GCLOUD_VERBS=' list describe create delete update get set add remove enable disable start stop reset ssh scp get-value '
+
+# Print the current time in seconds with microseconds
+now() {
+    if [[ -n "${EPOCHREALTIME:-}" ]]; then
+        echo "${EPOCHREALTIME/,/.}"
+    else
+        date +%s.%N
+    fi
+}
+
+# Print the service and operation of a CLI command, separated by a tab
+operation_name() {
+    local cli=$1
+    shift
+    local words=() skip=0 arg
+
+    for arg in "$@"; do
+        if [[ $skip -eq 1 ]]; then
+            skip=0
+            continue
+        fi
+        case "$arg" in
+            --profile|--region|--output|--endpoint-url|--query|--project|--format)
+                skip=1
+                ;;
+            -*)
+                [[ $cli == "gcloud" && ${#words[@]} -gt 0 ]] && break
+                ;;
+            *)
+                words+=("$arg")
+                if [[ $cli == "aws" && ${#words[@]} -eq 2 ]]; then
+                    break
+                fi
+                if [[ $cli != "aws" && ( $GCLOUD_VERBS == *" $arg "* || ${#words[@]} -eq 3 ) ]]; then
+                    break
+                fi
+                ;;
+        esac
+    done
+
+    if [[ $cli == "aws" ]]; then
+        printf '%s\t%s' "${words[0]:-aws}" "${words[1]:-}"
+    else
+        printf '%s\t%s' "$cli" "${words[*]:-}"
+    fi
+}
+
+# Run the real CLI, pass its output through and log the call
+run_shim() {
+    local cli=$1
+    shift
+    local real_var="INSTRUMENT_REAL_${cli^^}"
+    local real=${!real_var}
+    local out err start end rc bytes throttled=0
+
+    out=$(mktemp)
+    err=$(mktemp)
+    start=$(now)
+    "$real" "$@" >"$out" 2>"$err"
+    rc=$?
+    end=$(now)
+
+    cat "$out"
+    cat "$err" >&2
+    bytes=$(wc -c <"$out" | tr -d ' ')
+    if [[ $rc -ne 0 ]] && grep -qE "$THROTTLE_PATTERN" "$err"; then
+        throttled=1
+    fi
+    rm -f "$out" "$err"
+
+    # Lines are short enough to be appended atomically by parallel shims
+    printf '%s\t%s\t%s\t%s\t%s\n' "$(operation_name "$cli" "$@")" \
+        "$(awk -v s="$start" -v e="$end" 'BEGIN { printf "%.6f", e - s }')" "$rc" "$bytes" "$throttled" \
+        >>"$INSTRUMENT_LOG"
+    return $rc
+}
+
+case "$(basename "$0")" in
+    aws|gcloud|gsutil)
+        run_shim "$(basename "$0")" "$@"
+        exit $?
+        ;;
+esac
+
+set -euo pipefail
+
+# Function to display help message
+show_help() {
+    echo "Usage: $0 [OPTIONS] -- COMMAND [ARGS...]"
+    echo "Run a collector and measure the aws, gcloud and gsutil commands it runs"
+    echo ""
+    echo "Options:"
+    echo "  -h, --help             Show this help message"
+    echo "  -n, --name NAME        Tool name used as a metric label (default: command name)"
+    echo "  -j, --json FILE        Write the JSON summary to FILE"
+    echo "  -p, --prometheus FILE  Write the Prometheus textfile to FILE"
+    echo "  -l, --log FILE         Keep the raw call log in FILE (default: temporary)"
+    echo ""
+    echo "Example:"
+    echo "  $0 -j s3-metrics.json -p /var/lib/node_exporter/s3_inventory.prom -- ./AWS-S3-inventory.sh"
+    exit 0
+}
+
+name=""
+json_file=""
+prom_file=""
+log_file=""
+
+while [[ $# -gt 0 ]]; do
+    case $1 in
+        -h|--help)
+            show_help
+            ;;
+        -n|--name)
+            name="$2"
+            shift 2
+            ;;
+        -j|--json)
+            json_file="$2"
+            shift 2
+            ;;
+        -p|--prometheus)
+            prom_file="$2"
+            shift 2
+            ;;
+        -l|--log)
+            log_file="$2"
+            shift 2
+            ;;
+        --)
+            shift
+            break
+            ;;
+        *)
+            break
+            ;;
+    esac
+done
+
+if [[ $# -eq 0 ]]; then
+    echo "Error: No command given"
+    show_help
+fi
+
+script_dir=$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)
+name=${name:-$(basename "$1" .sh)}
+shim_dir=$(mktemp -d)
+keep_log=1
+if [[ -z "$log_file" ]]; then
+    log_file="$shim_dir/calls.tsv"
+    keep_log=0
+fi
+
+cleanup() {
+    if [[ $keep_log -eq 1 ]]; then
+        rm -f "$shim_dir"/aws "$shim_dir"/gcloud "$shim_dir"/gsutil
+        rmdir "$shim_dir"
+    else
+        rm -rf "$shim_dir"
+    fi
+}
+trap cleanup EXIT
+
+# Put a shim in front of every CLI that is installed
+for cli in aws gcloud gsutil; do
+    if real=$(command -v "$cli"); then
+        export "INSTRUMENT_REAL_${cli^^}=$real"
+        ln -s "$script_dir/instrument.sh" "$shim_dir/$cli"
+    fi
+done
+
+: >"$log_file"
+export INSTRUMENT_LOG="$log_file"
+started=$(now)
+
+rc=0
+PATH="$shim_dir:$PATH" "$@" || rc=$?
+
+summary_args=(--cli-log "$log_file" --tool "$name" --started "$started")
+[[ -n "$json_file" ]] && summary_args+=(--json "$json_file")
+[[ -n "$prom_file" ]] && summary_args+=(--prometheus "$prom_file")
+python3 "$script_dir/api_metrics.py" "${summary_args[@]}" >&2 || echo "Warning: Failed to summarize API calls" >&2
+
+exit $rc
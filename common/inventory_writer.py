@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared Streaming Inventory Writer
+
+Writes inventory rows to CSV, JSON Lines, Parquet or SQLite through one open
+file handle or connection, buffering rows instead of reopening the output for
+every row:
+
+- csv: written with the csv module, so commas, quotes and newlines inside
+  tags or labels are quoted correctly
+- jsonl: one JSON object per row, keyed by the header
+- parquet: row groups of batch_size rows, every column stored as a string
+  (requires pyarrow)
+- sqlite: one table with a column per header field, inserted in batches
+
+The format is taken from the output file extension unless given explicitly.
+
+Example:
+    with InventoryWriter('inventory.parquet', CSV_HEADER) as writer:
+        for row in rows:
+            writer.write(row)
+"""
+
+import csv
+import json
+import logging
+import os
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# Default file extension of every supported format
+FORMAT_EXTENSIONS = {
+    'csv': '.csv',
+    'jsonl': '.jsonl',
+    'parquet': '.parquet',
+    'sqlite': '.db'
+}
+
+# File extensions that select a format
+EXTENSION_FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.parquet': 'parquet',
+    '.db': 'sqlite',
+    '.sqlite': 'sqlite',
+    '.sqlite3': 'sqlite'
+}
+
+
+def detect_format(output_file):
+    """
+    Get the output format from a file name
+
+    Args:
+        output_file (str): Output file path
+
+    Returns:
+        str: Format name, 'csv' if the extension is not recognized
+    """
+    return EXTENSION_FORMATS.get(os.path.splitext(output_file)[1].lower(), 'csv')
+
+
+class InventoryWriter:
+    """
+    Stream inventory rows to a file in one of the supported formats
+
+    Args:
+        output_file (str): Output file path, replaced if it exists
+        header (list): Column names
+        fmt (str): csv, jsonl, parquet or sqlite; detected from the file
+            extension if None
+        table (str): Table name for SQLite output
+        batch_size (int): Rows buffered per Parquet row group or SQLite insert
+    """
+
+    def __init__(self, output_file, header, fmt=None, table='inventory', batch_size=1000):
+        self.output_file = output_file
+        self.header = list(header)
+        self.format = fmt or detect_format(output_file)
+        self.table = table
+        self.batch_size = batch_size
+        self.count = 0
+        self._batch = []
+
+        if self.format in ('csv', 'jsonl'):
+            self._file = open(output_file, 'w', newline='' if self.format == 'csv' else None, encoding='utf-8')
+            if self.format == 'csv':
+                self._csv = csv.writer(self._file)
+                self._csv.writerow(self.header)
+        elif self.format == 'parquet':
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise RuntimeError('Parquet output requires pyarrow (pip install pyarrow)')
+            self._pa = pyarrow
+            self._schema = pyarrow.schema([(name, pyarrow.string()) for name in self.header])
+            self._parquet = pyarrow.parquet.ParquetWriter(output_file, self._schema)
+        elif self.format == 'sqlite':
+            if os.path.exists(output_file):
+                os.remove(output_file)
+            self._conn = sqlite3.connect(output_file)
+            columns = ', '.join(f'"{name}" TEXT' for name in self.header)
+            self._conn.execute(f'CREATE TABLE "{table}" ({columns})')
+            self._insert = f'INSERT INTO "{table}" VALUES ({", ".join("?" for _ in self.header)})'
+        else:
+            raise ValueError(f"Unsupported output format: {self.format}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, row):
+        """
+        Write one row
+
+        Args:
+            row (list): Values in header order
+        """
+        self.count += 1
+        if self.format == 'csv':
+            self._csv.writerow(row)
+        elif self.format == 'jsonl':
+            self._file.write(json.dumps(dict(zip(self.header, row)), default=str) + '\n')
+        else:
+            self._batch.append([None if value is None else str(value) for value in row])
+            if len(self._batch) >= self.batch_size:
+                self._flush()
+
+    def write_many(self, rows):
+        """
+        Write every row of an iterable
+
+        Args:
+            rows (iterable): Rows in header order
+        """
+        for row in rows:
+            self.write(row)
+
+    def _flush(self):
+        if not self._batch:
+            return
+        if self.format == 'parquet':
+            columns = list(zip(*self._batch))
+            table = self._pa.Table.from_arrays(
+                [self._pa.array(column, type=self._pa.string()) for column in columns],
+                schema=self._schema
+            )
+            self._parquet.write_table(table)
+        else:
+            self._conn.executemany(self._insert, self._batch)
+            self._conn.commit()
+        self._batch = []
+
+    def close(self):
+        """Flush buffered rows and close the output"""
+        if self.format in ('csv', 'jsonl'):
+            self._file.close()
+            return
+        self._flush()
+        if self.format == 'parquet':
+            self._parquet.close()
+        else:
+            self._conn.close()
+
+
+def write_rows(rows, output_file, header, fmt=None, on_row=None):
+    """
+    Stream rows to an output file
+
+    Args:
+        rows (iterable): Rows in header order
+        output_file (str): Output file path
+        header (list): Column names
+        fmt (str): Output format, detected from the file extension if None
+        on_row (callable): Called with every row after it is written
+
+    Returns:
+        int: Number of rows written
+    """
+    with InventoryWriter(output_file, header, fmt) as writer:
+        for row in rows:
+            writer.write(row)
+            if on_row:
+                on_row(row)
+    return writer.count
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared Run Journal
+
+Records the state of every instance a long-running operation works on, so an
+interrupted run can be resumed instead of started over. Tools record each
+step as it completes (pending, stopped, modified, started, done or failed)
+and, when started again with the same journal, continue with the instances
+that are not finished yet.
+
+A journal holds one run. It is identified by the tool name and the
+parameters of the run (selector, target type, ...); if either differs from
+what the journal holds, the old entries are discarded and a new run starts.
+complete() removes the run once every instance is finished.
+
+Backends:
+    - A local SQLite database, for tools run from a workstation or server
+    - An S3 object (s3://bucket/key), for Lambda functions, whose local disk
+      does not survive between invocations
+
+Writes are batched: changed entries are written at most every flush_interval
+seconds and on flush() and close(). Tools that resume always check the
+actual state of an instance, so a step lost in the last interval is redone
+rather than skipped.
+
+Example:
+    journal = open_journal('downgrade.journal', 'downgrade_instances', {'selector': str(selector)})
+    for instance_id in instance_ids:
+        journal.add(instance_id, was_running=True)
+    journal.flush()
+    journal.record(instance_id, STOPPED)
+    ...
+    if not journal.ids(*OPEN_STATES):
+        journal.complete()
+    journal.close()
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+# Instance states recorded in the journal
+PENDING = 'pending'
+STOPPED = 'stopped'
+MODIFIED = 'modified'
+STARTED = 'started'
+DONE = 'done'
+FAILED = 'failed'
+
+# States of instances that are not finished, in the order they are reached
+OPEN_STATES = (PENDING, STOPPED, MODIFIED, STARTED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal_runs (
+    run TEXT PRIMARY KEY,
+    params TEXT NOT NULL,
+    started_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS journal_entries (
+    run TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (run, item_id)
+)
+"""
+
+
+class RunJournal(ABC):
+    """
+    Journal of the state of every instance of one run
+
+    Subclasses load and store the entries; this class keeps them in memory
+    and decides when to write. A subclass that does not implement every
+    backend method cannot be created.
+
+    Args:
+        run (str): Tool name the run belongs to
+        params (dict): Parameters of the run; a journal written with other
+            parameters is discarded
+        flush_interval (float): Seconds between writes of changed entries
+    """
+
+    def __init__(self, run, params=None, flush_interval=1):
+        self.run = run
+        self.params = params or {}
+        self.flush_interval = flush_interval
+        self.started_at = time.time()
+        self._entries = {}
+        self._dirty = set()
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+
+        stored = self._load()
+        if stored is None:
+            self.resumed = False
+        elif stored['params'] != json.loads(json.dumps(self.params)):
+            logger.warning(f"Journal {self} was written for other parameters, starting a new run")
+            self._clear()
+            self.resumed = False
+        else:
+            self._entries = stored['entries']
+            self.started_at = stored['started_at']
+            self.resumed = bool(self.ids(*OPEN_STATES))
+            if self.resumed:
+                logger.info(f"Resuming run of {self.run} started at "
+                            f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at))} "
+                            f"from journal {self}")
+            else:
+                # Every instance finished, but the run was not completed
+                self._entries = {}
+                self.started_at = time.time()
+                self._clear()
+
+    @abstractmethod
+    def _load(self):
+        """
+        Read the run from the backend
+
+        Returns:
+            dict: params, started_at and entries (item ID to entry, in the
+                order they were added), or None if the journal holds no run
+
+        Raises:
+            ValueError: If the backend holds the journal of another tool,
+                which must not be discarded
+        """
+
+    @abstractmethod
+    def _write(self, changed):
+        """Write the run parameters and the entries of the changed item IDs"""
+
+    @abstractmethod
+    def _clear(self):
+        """Remove the run from the backend"""
+
+    def get(self, item_id):
+        """
+        Get the journal entry of an instance
+
+        Args:
+            item_id (str): Instance ID
+
+        Returns:
+            dict: Copy of the entry with its state and details, or None if
+                the instance is not in the journal
+        """
+        with self._lock:
+            entry = self._entries.get(item_id)
+            return dict(entry) if entry else None
+
+    def ids(self, *states):
+        """
+        Get the instances in the given states, in the order they were added
+
+        Args:
+            *states (str): States to include, or none for every instance
+
+        Returns:
+            list: Instance IDs
+        """
+        with self._lock:
+            return [item_id for item_id, entry in self._entries.items() if not states or entry['state'] in states]
+
+    def add(self, item_id, **details):
+        """
+        Add an instance as pending unless it is already in the journal
+
+        Added instances are written with the next flush(); call it once
+        after adding many instances.
+
+        Args:
+            item_id (str): Instance ID
+            **details: Values to store with the entry, e.g. the original state
+        """
+        with self._lock:
+            if item_id not in self._entries:
+                self._entries[item_id] = dict(details, state=PENDING, updated_at=time.time())
+                self._dirty.add(item_id)
+
+    def record(self, item_id, state, **details):
+        """
+        Record that an instance reached a state
+
+        Args:
+            item_id (str): Instance ID
+            state (str): New state
+            **details: Values to store with the entry, e.g. a command ID or error
+        """
+        with self._lock:
+            entry = self._entries.setdefault(item_id, {})
+            entry.update(details, state=state, updated_at=time.time())
+            self._dirty.add(item_id)
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write every changed entry to the backend"""
+        with self._lock:
+            changed = self._dirty
+            self._dirty = set()
+            self._last_flush = time.monotonic()
+            if changed:
+                self._write(changed)
+
+    def complete(self):
+        """Remove the finished run, so the next run starts from the beginning"""
+        with self._lock:
+            logger.info(f"Run of {self.run} complete, clearing journal {self}")
+            self._entries = {}
+            self._dirty = set()
+            self.resumed = False
+            self._clear()
+
+    def close(self):
+        """Write pending changes and release the backend"""
+        self.flush()
+
+
+class SQLiteRunJournal(RunJournal):
+    """
+    Run journal in a local SQLite database
+
+    One database can hold the journals of several tools.
+
+    Args:
+        path (str): SQLite database file, created if it does not exist
+        run (str): Tool name the run belongs to
+        params (dict): Parameters of the run
+        flush_interval (float): Seconds between writes of changed entries
+    """
+
+    def __init__(self, path, run, params=None, flush_interval=1):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        super().__init__(run, params, flush_interval)
+
+    def __str__(self):
+        return self.path
+
+    def _load(self):
+        row = self._conn.execute('SELECT params, started_at FROM journal_runs WHERE run = ?', (self.run,)).fetchone()
+        if row is None:
+            return None
+        entries = {
+            item_id: json.loads(entry)
+            for item_id, entry in self._conn.execute(
+                'SELECT item_id, entry FROM journal_entries WHERE run = ? ORDER BY position', (self.run,))
+        }
+        return {'params': json.loads(row[0]), 'started_at': row[1], 'entries': entries}
+
+    def _write(self, changed):
+        positions = {item_id: position for position, item_id in enumerate(self._entries)}
+        with self._conn:
+            self._conn.execute('INSERT OR IGNORE INTO journal_runs (run, params, started_at) VALUES (?, ?, ?)',
+                               (self.run, json.dumps(self.params, sort_keys=True), self.started_at))
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO journal_entries (run, item_id, position, entry) VALUES (?, ?, ?, ?)',
+                [(self.run, item_id, positions[item_id], json.dumps(self._entries[item_id])) for item_id in changed]
+            )
+
+    def _clear(self):
+        with self._conn:
+            self._conn.execute('DELETE FROM journal_entries WHERE run = ?', (self.run,))
+            self._conn.execute('DELETE FROM journal_runs WHERE run = ?', (self.run,))
+
+    def close(self):
+        super().close()
+        self._conn.close()
+
+
+class S3RunJournal(RunJournal):
+    """
+    Run journal in an S3 object
+
+    The whole run is stored as one JSON document, which is rewritten on
+    every flush. An object holds the journal of one tool; opening it for
+    another tool fails instead of overwriting that tool's progress.
+
+    Args:
+        s3_client (boto3.client): S3 client
+        bucket (str): Bucket name
+        key (str): Object key
+        run (str): Tool name the run belongs to
+        params (dict): Parameters of the run
+        flush_interval (float): Seconds between writes of changed entries
+    """
+
+    def __init__(self, s3_client, bucket, key, run, params=None, flush_interval=5):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        super().__init__(run, params, flush_interval)
+
+    def __str__(self):
+        return f"s3://{self.bucket}/{self.key}"
+
+    def _load(self):
+        try:
+            document = json.loads(self.s3_client.get_object(Bucket=self.bucket, Key=self.key)['Body'].read())
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        if document.get('run') != self.run:
+            raise ValueError(f"Journal {self} holds a run of {document.get('run')}, not {self.run}; "
+                             f"use a separate key for every tool")
+        return document
+
+    def _write(self, changed):
+        document = {
+            'run': self.run,
+            'params': self.params,
+            'started_at': self.started_at,
+            'entries': self._entries
+        }
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=json.dumps(document).encode(),
+                                  ContentType='application/json')
+
+    def _clear(self):
+        self.s3_client.delete_object(Bucket=self.bucket, Key=self.key)
+
+
+def open_journal(location, run, params=None, s3_client=None):
+    """
+    Open the run journal at a location
+
+    Args:
+        location (str): s3://bucket/key for an S3 journal, otherwise the path
+            of a SQLite database
+        run (str): Tool name the run belongs to
+        params (dict): Parameters of the run
+        s3_client (boto3.client): S3 client for S3 journals (default: a new client)
+
+    Returns:
+        RunJournal: Opened journal
+    """
+    if location.startswith('s3://'):
+        bucket, _, key = location[5:].partition('/')
+        if not bucket or not key:
+            raise ValueError(f"Invalid S3 journal location '{location}', expected s3://bucket/key")
+        if s3_client is None:
+            import boto3
+            s3_client = boto3.client('s3')
+        return S3RunJournal(s3_client, bucket, key, run, params)
+    return SQLiteRunJournal(location, run, params)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared Inventory Snapshot Store
+
+Lets inventory collectors run incrementally. The output rows of every resource
+are kept in a local SQLite database together with a fingerprint of what the
+cheap list call returned for it. On the next run, only resources that are new,
+whose fingerprint changed, or whose snapshot is older than max_age need their
+expensive detail calls again; every other row is read back from the store.
+
+Snapshots are keyed by collector, scope (region, project or output mode) and
+resource ID, so one database can be shared by several collectors and by
+concurrent threads. scoped() gives a view whose scopes are prefixed, e.g. with
+an account ID, so runs over several accounts do not overwrite each other.
+
+Example:
+    store = SnapshotStore('inventory.db', max_age=7 * 24 * 3600)
+    fingerprints = {bucket['Name']: fingerprint(bucket) for bucket in buckets}
+    stale = store.stale('s3', 'global', fingerprints)
+    rows = store.rows('s3', 'global', [name for name in fingerprints if name not in stale])
+    for name in stale:
+        store.save('s3', 'global', name, fingerprints[name], [probe(name)])
+    store.prune('s3', 'global', fingerprints)
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    collector TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    rows TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (collector, scope, resource_id)
+)
+"""
+
+
+def fingerprint(item):
+    """
+    Fingerprint a resource as returned by a list call
+
+    Args:
+        item: JSON-serializable value; dates and other objects are converted with str()
+
+    Returns:
+        str: SHA-256 hex digest of the canonical JSON form of the item
+    """
+    canonical = json.dumps(item, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class SnapshotStore:
+    """
+    SQLite store of the last known output rows of every resource
+
+    Args:
+        path (str): SQLite database file, created if it does not exist
+        max_age (float): Seconds after which a snapshot is refreshed even if
+            its fingerprint did not change, or None to trust fingerprints only
+    """
+
+    def __init__(self, path, max_age=None):
+        self.path = path
+        self.max_age = max_age
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def stale(self, collector, scope, fingerprints):
+        """
+        Find the resources whose detail calls must run again
+
+        Args:
+            collector (str): Collector name
+            scope (str): Region, project or other scope of the listing
+            fingerprints (dict): Mapping of resource ID to its current fingerprint
+
+        Returns:
+            set: IDs of new, changed or expired resources
+        """
+        with self._lock:
+            known = {
+                resource_id: (stored, updated_at)
+                for resource_id, stored, updated_at in self._conn.execute(
+                    'SELECT resource_id, fingerprint, updated_at FROM snapshots WHERE collector = ? AND scope = ?',
+                    (collector, scope)
+                )
+            }
+
+        oldest = time.time() - self.max_age if self.max_age is not None else None
+        stale = set()
+        for resource_id, current in fingerprints.items():
+            stored = known.get(resource_id)
+            if stored is None or stored[0] != current or (oldest is not None and stored[1] < oldest):
+                stale.add(resource_id)
+
+        logger.info(f"{collector} ({scope}): {len(fingerprints) - len(stale)} unchanged, {len(stale)} to refresh")
+        return stale
+
+    def save(self, collector, scope, resource_id, resource_fingerprint, rows):
+        """
+        Store the output rows of a resource
+
+        Args:
+            collector (str): Collector name
+            scope (str): Region, project or other scope of the listing
+            resource_id (str): Resource ID
+            resource_fingerprint (str): Fingerprint the rows were built for
+            rows (list): Output rows of the resource
+        """
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?)',
+                (collector, scope, resource_id, resource_fingerprint, json.dumps(rows, default=str), time.time())
+            )
+            self._conn.commit()
+
+    def rows(self, collector, scope, resource_ids):
+        """
+        Read the stored rows of resources
+
+        Args:
+            collector (str): Collector name
+            scope (str): Region, project or other scope of the listing
+            resource_ids (iterable): Resource IDs, in the order rows are returned
+
+        Returns:
+            list: Output rows of every resource that has a snapshot
+        """
+        with self._lock:
+            stored = {
+                resource_id: json.loads(rows)
+                for resource_id, rows in self._conn.execute(
+                    'SELECT resource_id, rows FROM snapshots WHERE collector = ? AND scope = ?',
+                    (collector, scope)
+                )
+            }
+        return [row for resource_id in resource_ids for row in stored.get(resource_id, [])]
+
+    def prune(self, collector, scope, resource_ids):
+        """
+        Remove the snapshots of resources that no longer exist
+
+        Args:
+            collector (str): Collector name
+            scope (str): Region, project or other scope of the listing
+            resource_ids (iterable): IDs of every resource that still exists
+
+        Returns:
+            int: Number of snapshots removed
+        """
+        keep = set(resource_ids)
+        with self._lock:
+            known = [
+                resource_id for (resource_id,) in self._conn.execute(
+                    'SELECT resource_id FROM snapshots WHERE collector = ? AND scope = ?',
+                    (collector, scope)
+                )
+            ]
+            removed = [resource_id for resource_id in known if resource_id not in keep]
+            self._conn.executemany(
+                'DELETE FROM snapshots WHERE collector = ? AND scope = ? AND resource_id = ?',
+                [(collector, scope, resource_id) for resource_id in removed]
+            )
+            self._conn.commit()
+        return len(removed)
+
+    def scoped(self, prefix):
+        """
+        Get a view of this store whose scopes are prefixed
+
+        Args:
+            prefix (str): Prefix, e.g. an AWS account ID
+
+        Returns:
+            ScopedSnapshotStore: View storing scope SCOPE as PREFIX/SCOPE
+        """
+        return ScopedSnapshotStore(self, prefix)
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+class ScopedSnapshotStore:
+    """
+    View of a snapshot store with every scope prefixed
+
+    Collectors use it like a SnapshotStore; closing the view leaves the
+    underlying store open.
+
+    Args:
+        store (SnapshotStore): Underlying store
+        prefix (str): Prefix added to every scope
+    """
+
+    def __init__(self, store, prefix):
+        self.store = store
+        self.prefix = prefix
+
+    def _scope(self, scope):
+        return f"{self.prefix}/{scope}"
+
+    def stale(self, collector, scope, fingerprints):
+        return self.store.stale(collector, self._scope(scope), fingerprints)
+
+    def save(self, collector, scope, resource_id, resource_fingerprint, rows):
+        self.store.save(collector, self._scope(scope), resource_id, resource_fingerprint, rows)
+
+    def rows(self, collector, scope, resource_ids):
+        return self.store.rows(collector, self._scope(scope), resource_ids)
+
+    def prune(self, collector, scope, resource_ids):
+        return self.store.prune(collector, self._scope(scope), resource_ids)
+
+    def close(self):
+        pass
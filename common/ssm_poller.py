@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared SSM Command Result Poller
+
+Tracks many outstanding SSM Run Command IDs at once and collects their
+per-instance results in bulk with list_command_invocations(Details=True),
+instead of sleeping a fixed time and calling get_command_invocation once per
+instance.
+
+- With a few outstanding commands, each poll lists the invocations of every
+  command (one paginated call per command)
+- With many outstanding commands, each poll lists all invocations started
+  since the oldest tracked command in a single paginated call
+- The poll interval backs off while nothing finishes and tightens again as
+  soon as results arrive
+
+Results are available as soon as each instance finishes, through an
+on_result callback, the iter_results() generator or the async iterator
+returned by aiter_results().
+
+Example:
+    poller = SSMCommandPoller(ssm_client)
+    poller.track(command_id, instance_ids)
+    for result in poller.iter_results(timeout=600):
+        print(result['InstanceId'], result['Status'])
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+# Invocation statuses after which a result will not change any more
+TERMINAL_STATUSES = {'Success', 'Failed', 'Cancelled', 'TimedOut'}
+
+# Above this many outstanding commands, poll all recent invocations at once
+BULK_COMMAND_THRESHOLD = 3
+
+
+class SSMCommandPoller:
+    """
+    Collect per-instance results for many outstanding SSM commands
+
+    Args:
+        ssm_client (boto3.client): SSM client
+        on_result (callable): Called with every result as soon as it is final
+        initial_delay (float): First poll interval in seconds
+        max_delay (float): Longest poll interval in seconds
+        backoff (float): Factor applied to the interval after an idle poll
+    """
+
+    def __init__(self, ssm_client, on_result=None, initial_delay=1, max_delay=15, backoff=1.5):
+        self.ssm_client = ssm_client
+        self.on_result = on_result
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.delay = initial_delay
+        self._pending = {}
+        self._started = {}
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def track(self, command_id, instance_ids):
+        """
+        Start tracking a command sent to one or more instances
+
+        Args:
+            command_id (str): SSM command ID
+            instance_ids (list): Instance IDs the command was sent to
+        """
+        with self._lock:
+            self._pending.setdefault(command_id, set()).update(instance_ids)
+            self._started.setdefault(command_id, datetime.now(timezone.utc))
+        # New work arrived, so the next poll should not wait for the long interval
+        self.delay = self.initial_delay
+
+    @property
+    def outstanding(self):
+        """Number of instance results that are not final yet"""
+        with self._lock:
+            return sum(len(instances) for instances in self._pending.values())
+
+    @property
+    def results(self):
+        """Final results collected so far, keyed by (command ID, instance ID)"""
+        with self._lock:
+            return dict(self._results)
+
+    def _list_invocations(self, **kwargs):
+        paginator = self.ssm_client.get_paginator('list_command_invocations')
+        for page in paginator.paginate(Details=True, **kwargs):
+            yield from page['CommandInvocations']
+
+    def _complete(self, command_id, instance_id, result):
+        with self._lock:
+            if instance_id not in self._pending.get(command_id, ()):
+                return False
+            self._pending[command_id].discard(instance_id)
+            if not self._pending[command_id]:
+                del self._pending[command_id]
+                del self._started[command_id]
+            self._results[(command_id, instance_id)] = result
+
+        if self.on_result:
+            self.on_result(result)
+        return True
+
+    def poll_once(self):
+        """
+        Poll SSM once and record every invocation that has become final
+
+        Returns:
+            list: Results that became final during this poll
+        """
+        with self._lock:
+            pending = {command_id: set(instances) for command_id, instances in self._pending.items()}
+            oldest = min(self._started.values()) if self._started else None
+        if not pending:
+            return []
+
+        if len(pending) > BULK_COMMAND_THRESHOLD:
+            # One paginated call covers every command started since the oldest one
+            invoked_after = (oldest - timedelta(minutes=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
+            invocations = self._list_invocations(Filters=[{'key': 'InvokedAfter', 'value': invoked_after}])
+        else:
+            invocations = (
+                invocation
+                for command_id in pending
+                for invocation in self._list_invocations(CommandId=command_id)
+            )
+
+        finished = []
+        for invocation in invocations:
+            command_id = invocation['CommandId']
+            instance_id = invocation['InstanceId']
+            if instance_id not in pending.get(command_id, ()) or invocation['Status'] not in TERMINAL_STATUSES:
+                continue
+            result = build_result(invocation)
+            if self._complete(command_id, instance_id, result):
+                finished.append(result)
+
+        # Back off while nothing finishes, tighten again when results arrive
+        if finished:
+            self.delay = max(self.initial_delay, self.delay / self.backoff)
+        else:
+            self.delay = min(self.delay * self.backoff, self.max_delay)
+        return finished
+
+    def expire(self, timeout):
+        """
+        Report every outstanding instance as timed out
+
+        Args:
+            timeout (float): Seconds the caller waited, shown in the error of
+                every expired result
+
+        Returns:
+            list: Results of the expired instances
+        """
+        with self._lock:
+            pending = [(command_id, instance_id)
+                       for command_id, instances in self._pending.items() for instance_id in instances]
+        expired = []
+        for command_id, instance_id in pending:
+            result = {
+                'CommandId': command_id,
+                'InstanceId': instance_id,
+                'Status': 'TimedOut',
+                'Output': '',
+                'Error': f"No final status after waiting {timeout} seconds"
+            }
+            if self._complete(command_id, instance_id, result):
+                expired.append(result)
+        return expired
+
+    def iter_results(self, timeout=None, expire=True):
+        """
+        Yield results as instances finish until nothing is outstanding
+
+        Args:
+            timeout (float): Seconds to wait before reporting the remaining
+                instances as TimedOut, or None to wait indefinitely
+            expire (bool): If False, stop waiting after timeout without
+                reporting the remaining instances, which stay tracked
+
+        Yields:
+            dict: Result with CommandId, InstanceId, Status, Output and Error
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self.outstanding:
+            if deadline is not None and time.monotonic() >= deadline:
+                if expire:
+                    yield from self.expire(timeout)
+                return
+            wait = self.delay if deadline is None else min(self.delay, deadline - time.monotonic())
+            time.sleep(max(0, wait))
+            yield from self.poll_once()
+
+    async def aiter_results(self, timeout=None, expire=True):
+        """
+        Asynchronous version of iter_results()
+
+        SSM calls run in the default executor so the event loop is never
+        blocked while polling.
+
+        Args:
+            timeout (float): Seconds to wait before reporting the remaining
+                instances as TimedOut, or None to wait indefinitely
+            expire (bool): If False, stop waiting after timeout without
+                reporting the remaining instances, which stay tracked
+
+        Yields:
+            dict: Result with CommandId, InstanceId, Status, Output and Error
+        """
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        while self.outstanding:
+            if deadline is not None and loop.time() >= deadline:
+                if expire:
+                    for result in self.expire(timeout):
+                        yield result
+                return
+            wait = self.delay if deadline is None else min(self.delay, deadline - loop.time())
+            await asyncio.sleep(max(0, wait))
+            for result in await loop.run_in_executor(None, self.poll_once):
+                yield result
+
+    def wait(self, timeout=None, expire=True):
+        """
+        Block until every tracked instance has a final result
+
+        Args:
+            timeout (float): Seconds to wait before reporting the remaining
+                instances as TimedOut, or None to wait indefinitely
+            expire (bool): If False, stop waiting after timeout without
+                reporting the remaining instances, which stay tracked
+
+        Returns:
+            dict: All results keyed by (command ID, instance ID)
+        """
+        for _ in self.iter_results(timeout, expire):
+            pass
+        return self.results
+
+
+def build_result(invocation):
+    """
+    Build a result dictionary from a detailed command invocation
+
+    Args:
+        invocation (dict): Invocation returned by list_command_invocations(Details=True)
+
+    Returns:
+        dict: Result with CommandId, InstanceId, Status, Output and Error
+    """
+    plugins = invocation.get('CommandPlugins', [])
+    output = '\n'.join(plugin.get('Output', '') for plugin in plugins if plugin.get('Output'))
+    status = invocation['Status']
+    return {
+        'CommandId': invocation['CommandId'],
+        'InstanceId': invocation['InstanceId'],
+        'Status': status,
+        'Output': output,
+        'Error': '' if status == 'Success' else invocation.get('StatusDetails', status)
+    }